@@ -21,16 +21,57 @@ def create_app():
     app.config['UPLOAD_FOLDER'] = app.config.get('UPLOAD_FOLDER') or os.path.join(app.static_folder, 'uploads')
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+    # engine options and SQLite pragmas have to be in place before the engine is created
+    from . import database
+    database.init_app(app)
+
     db.init_app(app)
+    # first, so its before_request hook times everything the other modules' hooks do
+    from . import instrumentation
+    instrumentation.init_app(app)
+
+    from . import metrics
+    metrics.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
-    from .models import User
+    from . import visits
+    visits.init_app(app)
+
+    from . import cart_store
+    cart_store.init_app(app)
+
+    from . import cache
+    cache.init_app(app)
+
+    from . import search
+    search.init_app(app)
+
+    from . import sitemap
+    sitemap.init_app(app)
+
+    from . import images
+    images.init_app(app)
+
+    from . import sales
+    sales.init_app(app)
+
+    from . import outbox
+    outbox.init_app(app)
+
+    from . import campaigns
+    campaigns.init_app(app)
+
+    from . import user_cache
+    user_cache.init_app(app)
+
+    from . import bans
+    bans.init_app(app)
 
     @login_manager.user_loader
     def load_user(user_id):
         # Flask-Login uses this to reload the user object from the user ID stored in the session
-        return User.query.get(int(user_id))
+        return user_cache.user_cache.get(int(user_id))
 
     from .routes import main as main_blueprint
     app.register_blueprint(main_blueprint)
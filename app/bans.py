@@ -0,0 +1,97 @@
+"""Request-wide enforcement of ``User.is_banned``.
+
+`login()` refuses banned users, but a session opened before the ban stays
+valid until logout. A ``before_request`` hook closes that gap without a query
+per request: each worker holds the set of banned user ids and checks it
+against the logged-in user.
+
+The set is loaded once per worker and reloaded (one ``SELECT id`` over banned
+users) only when:
+- the ``bans`` version stamp (see app/cache.py) moved, which `bans_changed()`
+  arranges on commit for the admin ban, unban and delete routes; the check is
+  one stat() call, so a ban reaches every worker on its next request
+- BAN_REFRESH_INTERVAL seconds passed, which covers bans written outside the
+  app and hosts that do not share PAGE_CACHE_DIR
+"""
+import threading
+import time
+
+from flask import jsonify, redirect, request, url_for
+from flask_login import current_user, logout_user
+from sqlalchemy import event
+
+from app import db
+from app.cache import VersionStamp
+from app.cart_store import detach_cart
+from app.models import User
+
+
+class BanList:
+
+    def __init__(self):
+        self.refresh_interval = 30.0
+        self.stamp = VersionStamp('bans')
+        self._banned = frozenset()
+        self._version = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.refresh_interval = float(app.config.get('BAN_REFRESH_INTERVAL') or 30)
+        self.stamp.init_app(app)
+
+    def _stale(self, version, now):
+        return (self._loaded_at is None or version != self._version
+                or now - self._loaded_at > self.refresh_interval)
+
+    def banned_ids(self):
+        version = self.stamp.current()
+        now = time.monotonic()
+        if self._stale(version, now):
+            with self._lock:
+                if self._stale(version, now):
+                    self._banned = frozenset(i for (i,) in db.session.query(User.id).filter(User.is_banned.is_(True)))
+                    self._version = version
+                    self._loaded_at = now
+        return self._banned
+
+    def is_banned(self, user_id):
+        return user_id in self.banned_ids()
+
+
+ban_list = BanList()
+
+
+def bans_changed():
+    """Call when a transaction bans, unbans or deletes a user; every worker reloads its ban set after commit."""
+    db.session.info['bans_changed'] = True
+
+
+def _after_commit(session):
+    # a flag left over from a rolled-back transaction only costs one extra reload
+    if session.info.pop('bans_changed', False):
+        ban_list.stamp.bump()
+
+
+def init_app(app):
+    ban_list.init_app(app)
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'after_commit', _after_commit)
+
+    @app.before_request
+    def _enforce_bans():
+        if request.endpoint in (None, 'static', 'main.banned') or not current_user.is_authenticated:
+            return None
+        try:
+            if not ban_list.is_banned(current_user.id):
+                return None
+        except Exception:
+            db.session.rollback()
+            # never lock everyone out because the ban list could not be loaded
+            app.logger.exception('Failed to load the banned user list')
+            return None
+        logout_user()
+        detach_cart()
+        if request.is_json or request.accept_mimetypes.best == 'application/json':
+            return jsonify({'error': 'Your account has been banned.'}), 403
+        return redirect(url_for('main.banned'))
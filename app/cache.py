@@ -0,0 +1,125 @@
+"""Per-worker rendered page cache with a shared version stamp.
+
+Rendered HTML is kept in each gunicorn worker's memory. Invalidation has to
+reach every worker, so each cache namespace has a tiny version file under
+PAGE_CACHE_DIR (instance/cache by default). `invalidate()` rewrites the file;
+every `get()` stats it (one syscall, no DB query) and drops the local entries
+when the file changed. Entries also expire after PAGE_CACHE_TTL seconds as a
+safety net for writes that bypass the routes (scripts, shell sessions).
+"""
+import os
+import threading
+import time
+
+
+class VersionStamp:
+    """Cross-worker change marker backed by a file under the cache directory.
+
+    `current()` is a single stat() call; `bump()` atomically replaces the file,
+    which changes the inode and mtime seen by every other worker.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.cache_dir = None
+
+    def init_app(self, app):
+        self.cache_dir = app.config.get('PAGE_CACHE_DIR') or os.path.join(app.instance_path, 'cache')
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError:
+            app.logger.warning('Could not create cache directory %s', self.cache_dir)
+
+    @property
+    def path(self):
+        return os.path.join(self.cache_dir, f'{self.name}.version')
+
+    def current(self):
+        if not self.cache_dir:
+            return None
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns)
+
+    def bump(self):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as fh:
+                fh.write(str(time.time_ns()))
+            os.replace(tmp, self.path)
+        except OSError:
+            try:
+                from flask import current_app
+                current_app.logger.exception('Failed to bump %s version stamp', self.name)
+            except Exception:
+                pass
+
+
+class PageCache:
+
+    def __init__(self, namespace, max_entries=64):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = 300.0
+        self.stamp = VersionStamp(namespace)
+        self._entries = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        ttl = app.config.get('PAGE_CACHE_TTL')
+        self.ttl = float(ttl if ttl is not None else 300)
+        self.stamp.init_app(app)
+
+    def _shared_version(self):
+        return self.stamp.current()
+
+    def get(self, key):
+        if self.ttl <= 0:
+            return None
+        version = self._shared_version()
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if now - stored_at > self.ttl:
+                self._entries.pop(key, None)
+                return None
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        version = self._shared_version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                # drop the oldest entry (dicts keep insertion order)
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self):
+        """Drop this namespace's entries in every worker."""
+        with self._lock:
+            self._entries.clear()
+        self.stamp.bump()
+
+
+homepage_cache = PageCache('homepage')
+
+
+def init_app(app):
+    homepage_cache.init_app(app)
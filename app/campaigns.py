@@ -0,0 +1,312 @@
+"""Newsletter campaigns.
+
+An admin writes a campaign and starts it; `campaign_runner` then walks
+``newsletter_subscriber`` in id order (keyset, ``id > checkpoint``) and sends
+each batch of CAMPAIGN_BATCH_SIZE addresses (at most 1000) with one Brevo call
+that gives every recipient their own copy. Batches are paced to
+CAMPAIGN_RATE_LIMIT emails per second.
+
+Progress lives in the ``newsletter_campaign`` row:
+
+1. before a batch is sent its last subscriber id is stored as
+   ``inflight_last_id`` and committed;
+2. once Brevo accepts it, ``last_subscriber_id`` moves up to that id and
+   ``inflight_last_id`` is cleared in the same commit.
+
+A runner that dies between the two leaves ``inflight_last_id`` set. The
+runner that resumes the campaign cannot know whether Brevo got that batch, so
+it skips it (counted in ``skipped_count``) rather than risk sending anyone the
+campaign twice. Batches Brevo rejected with an error response are retried
+with backoff (CAMPAIGN_BACKOFF_BASE seconds doubling up to
+CAMPAIGN_BACKOFF_MAX, or a 429's Retry-After); after CAMPAIGN_MAX_FAILURES
+consecutive failures the campaign is paused.
+
+Runners claim a campaign with a lease (like the email outbox) that is renewed
+after every batch, so only one process sends a given campaign, and a campaign
+whose runner vanished is resumed by another once the lease expires.
+CAMPAIGN_WORKERS=0 keeps web workers out of it; run ``flask campaign-worker``
+instead.
+"""
+import atexit
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, or_, update
+
+from app import db
+from app.models import NewsletterCampaign, NewsletterSubscriber
+from app.outbox import retry_delay
+
+
+MAX_BATCH_SIZE = 1000  # Brevo accepts up to 1000 message versions per call
+
+
+class _Pacer:
+    """Spaces out batches so that on average no more than `rate` emails go out per second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._next = time.monotonic()
+
+    def wait(self, count, stop):
+        if self.rate <= 0:
+            return
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            stop.wait(delay)
+        self._next = max(self._next, time.monotonic()) + count / self.rate
+
+
+def _not_sent(error):
+    """True when Brevo answered with an error status or no connection was ever made."""
+    if getattr(error, 'status', None) is not None:
+        return True
+    try:
+        from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+    except ImportError:
+        return False
+    return isinstance(getattr(error, 'reason', error), (ConnectTimeoutError, NewConnectionError))
+
+
+class CampaignRunner:
+
+    def __init__(self):
+        self.app = None
+        self.workers = 1
+        self.batch_size = 500
+        self.rate_limit = 300.0
+        self.max_failures = 5
+        self.backoff_base = 2.0
+        self.backoff_max = 60.0
+        self.lease = 120.0
+        self.poll_interval = 10.0
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        cfg = app.config
+        self.workers = int(cfg.get('CAMPAIGN_WORKERS') if cfg.get('CAMPAIGN_WORKERS') is not None else 1)
+        self.batch_size = max(1, min(MAX_BATCH_SIZE, int(cfg.get('CAMPAIGN_BATCH_SIZE') or 500)))
+        self.rate_limit = float(cfg.get('CAMPAIGN_RATE_LIMIT') or 0)
+        self.max_failures = int(cfg.get('CAMPAIGN_MAX_FAILURES') or 5)
+        self.backoff_base = float(cfg.get('CAMPAIGN_BACKOFF_BASE') or 2.0)
+        self.backoff_max = float(cfg.get('CAMPAIGN_BACKOFF_MAX') or 60.0)
+        self.lease = float(cfg.get('CAMPAIGN_LEASE') or 120.0)
+        atexit.register(self._stop.set)
+
+    def wake(self):
+        """Start this process's runner threads if needed and look for queued campaigns now."""
+        if self.workers <= 0:
+            return
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._threads = []
+            self._pid = os.getpid()
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f'campaign-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while not self._stop.is_set():
+            ran = False
+            try:
+                with self.app.app_context():
+                    ran = self.run_next()
+            except Exception:
+                self.app.logger.exception('Campaign runner failed')
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _claimable(self, now):
+        return and_(NewsletterCampaign.status.in_(('queued', 'sending')),
+                    or_(NewsletterCampaign.locked_until.is_(None), NewsletterCampaign.locked_until < now))
+
+    def _renew(self, campaign_id, token, **values):
+        """Update the campaign if we still hold its lease. Returns False if the lease was lost."""
+        values.setdefault('locked_until', datetime.utcnow() + timedelta(seconds=self.lease))
+        result = db.session.execute(
+            update(NewsletterCampaign)
+            .where(NewsletterCampaign.id == campaign_id, NewsletterCampaign.claimed_by == token)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return bool(result.rowcount)
+
+    def claim(self):
+        """Take the lease on the oldest runnable campaign. Returns ``(campaign_id, token)`` or None."""
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        campaign_id = db.session.query(NewsletterCampaign.id).filter(self._claimable(now)) \
+            .order_by(NewsletterCampaign.id).limit(1).scalar()
+        if campaign_id is None:
+            db.session.rollback()
+            return None
+        result = db.session.execute(
+            update(NewsletterCampaign)
+            .where(NewsletterCampaign.id == campaign_id, self._claimable(now))
+            .values(status='sending', claimed_by=token, locked_until=now + timedelta(seconds=self.lease),
+                    started_at=db.func.coalesce(NewsletterCampaign.started_at, now))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return (campaign_id, token) if result.rowcount else None
+
+    def run_next(self):
+        """Claim one campaign and send it until done, paused or the lease is lost. Returns False if idle."""
+        claimed = self.claim()
+        if claimed is None:
+            return False
+        self.send(*claimed)
+        return True
+
+    def _recipients(self, after_id, limit):
+        return db.session.query(NewsletterSubscriber.id, NewsletterSubscriber.email) \
+            .filter(NewsletterSubscriber.id > after_id).order_by(NewsletterSubscriber.id).limit(limit).all()
+
+    def _skip_unconfirmed(self, campaign, token):
+        # a previous runner died mid-batch; Brevo may already have sent it
+        skipped = db.session.query(db.func.count(NewsletterSubscriber.id)).filter(
+            NewsletterSubscriber.id > campaign.last_subscriber_id,
+            NewsletterSubscriber.id <= campaign.inflight_last_id).scalar() or 0
+        self.app.logger.warning('Campaign %s: skipping %s recipient(s) of an unconfirmed batch (ids %s-%s)',
+                                campaign.id, skipped, campaign.last_subscriber_id + 1, campaign.inflight_last_id)
+        return self._renew(campaign.id, token, last_subscriber_id=campaign.inflight_last_id, inflight_last_id=None,
+                           skipped_count=NewsletterCampaign.skipped_count + skipped)
+
+    def send(self, campaign_id, token):
+        from app.email import deliver_batch
+
+        sender = self.app.config.get('MAIL_DEFAULT_SENDER') or self.app.config.get('MAIL_USERNAME')
+        pacer = _Pacer(self.rate_limit)
+        while not self._stop.is_set():
+            db.session.expire_all()
+            campaign = db.session.get(NewsletterCampaign, campaign_id)
+            if campaign is None or campaign.claimed_by != token:
+                # deleted or taken over by another runner
+                db.session.rollback()
+                return
+            if campaign.status != 'sending':
+                # paused by an admin; let it be claimed again as soon as it is restarted
+                self._renew(campaign_id, token, claimed_by=None, locked_until=None)
+                return
+            if campaign.inflight_last_id is not None:
+                if not self._skip_unconfirmed(campaign, token):
+                    return
+                continue
+
+            batch = self._recipients(campaign.last_subscriber_id, self.batch_size)
+            if not batch:
+                self._renew(campaign_id, token, status='completed', finished_at=datetime.utcnow(),
+                            claimed_by=None, locked_until=None)
+                self.app.logger.info('Campaign %s completed: %s sent, %s skipped',
+                                     campaign_id, campaign.sent_count, campaign.skipped_count)
+                return
+            last_id = batch[-1].id
+            subject, text_body, html_body = campaign.subject, campaign.text_body, campaign.html_body
+            if not self._renew(campaign_id, token, inflight_last_id=last_id):
+                return
+
+            pacer.wait(len(batch), self._stop)
+            try:
+                deliver_batch(self.app, subject, sender, [row.email for row in batch], text_body, html_body)
+            except Exception as e:
+                if not _not_sent(e):
+                    # the request may have reached Brevo; leave the batch unconfirmed
+                    self.app.logger.exception('Campaign %s: batch ending at subscriber %s has unknown outcome',
+                                              campaign_id, last_id)
+                    continue
+                failures = campaign.failures + 1
+                error = f'{type(e).__name__}: {e}'[:2000]
+                self.app.logger.warning('Campaign %s: batch ending at subscriber %s failed (%s in a row): %s',
+                                        campaign_id, last_id, failures, error)
+                if failures >= self.max_failures:
+                    self._renew(campaign_id, token, status='paused', inflight_last_id=None, failures=failures,
+                                last_error=error, claimed_by=None, locked_until=None)
+                    return
+                if not self._renew(campaign_id, token, inflight_last_id=None, failures=failures, last_error=error):
+                    return
+                self._stop.wait(retry_delay(e, failures, self.backoff_base, self.backoff_max))
+                continue
+
+            if not self._renew(campaign_id, token, last_subscriber_id=last_id, inflight_last_id=None,
+                               sent_count=NewsletterCampaign.sent_count + len(batch),
+                               batch_count=NewsletterCampaign.batch_count + 1, failures=0, last_error=None):
+                return
+
+    def run_forever(self, workers):
+        """Foreground loop for ``flask campaign-worker``."""
+        self.workers = max(1, workers)
+        self.start()
+        try:
+            while any(t.is_alive() for t in self._threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self._stop.set()
+            self._wake.set()
+
+
+campaign_runner = CampaignRunner()
+
+
+def queue_campaign(campaign):
+    """Queue a draft or paused campaign for sending (caller commits, then calls `campaign_runner.wake`)."""
+    if campaign.status not in ('draft', 'paused'):
+        raise ValueError(f'Campaign is {campaign.status}')
+    campaign.status = 'queued'
+    campaign.failures = 0
+
+
+def pause_campaign(campaign):
+    """Stop a queued or sending campaign after its current batch (caller commits)."""
+    if campaign.status not in ('queued', 'sending'):
+        raise ValueError(f'Campaign is {campaign.status}')
+    campaign.status = 'paused'
+
+
+def campaign_progress(campaign, total=None):
+    """Dict for the admin page: counts and percentage done."""
+    if total is None:
+        total = db.session.query(db.func.count(NewsletterSubscriber.id)).scalar() or 0
+    remaining = db.session.query(db.func.count(NewsletterSubscriber.id)) \
+        .filter(NewsletterSubscriber.id > campaign.last_subscriber_id).scalar() or 0
+    done = max(0, total - remaining)
+    return {'total': total, 'remaining': remaining, 'percent': round(100.0 * done / total, 1) if total else 100.0}
+
+
+@click.command('campaign-worker')
+@with_appcontext
+@click.option('--workers', default=1, show_default=True, help='Campaigns sent in parallel.')
+def campaign_worker_command(workers):
+    """Send queued newsletter campaigns."""
+    click.echo(f'Campaign worker running with {workers} thread(s); Ctrl+C to stop.')
+    campaign_runner.run_forever(workers)
+
+
+def init_app(app):
+    campaign_runner.init_app(app)
+    app.cli.add_command(campaign_worker_command)
+
+    @app.before_request
+    def _start_campaign_runner():
+        # resume campaigns left behind by a previous (recycled) worker
+        if campaign_runner.workers > 0:
+            campaign_runner.start()
@@ -0,0 +1,99 @@
+"""Cart pricing shared by the cart, checkout and coupon/delivery AJAX views.
+
+The session cart maps composite ``"<product_id>:<color>"`` keys to quantities.
+`price_cart` parses those keys once, loads every referenced product with a
+single ``IN`` query and returns a `PricedCart` with the line items and totals.
+"""
+from sqlalchemy.orm import joinedload
+
+from app.models import Product
+
+
+def parse_cart_key(composite_key):
+    """Split a ``"pid:color"`` cart key into ``(product_id, color)``.
+
+    Returns None for malformed keys so callers can skip them.
+    """
+    try:
+        pid_str, color = composite_key.split(':', 1)
+        return int(pid_str), color
+    except Exception:
+        return None
+
+
+class PricedCart:
+    """Priced snapshot of a session cart.
+
+    - lines: list of dicts (product_id, name, price, quantity, total, color, image, product)
+    - subtotal: sum of line totals
+    - discount_amount: coupon discount taken from the session coupon (if any)
+    - delivery_amount: fee of the selected delivery option (if any)
+    - grand_total: subtotal - discount_amount + delivery_amount
+    """
+
+    def __init__(self, lines, delivery=None, coupon=None):
+        self.lines = lines
+        self.delivery = delivery
+        self.coupon = coupon
+        self.subtotal = sum(line['total'] for line in lines)
+        try:
+            self.discount_amount = float(coupon.get('discount_amount', 0.0)) if coupon else 0.0
+        except Exception:
+            self.discount_amount = 0.0
+        try:
+            self.delivery_amount = float(delivery.get('amount', 0.0)) if delivery else 0.0
+        except Exception:
+            self.delivery_amount = 0.0
+
+    @property
+    def grand_total(self):
+        return self.subtotal - self.discount_amount + self.delivery_amount
+
+    @property
+    def is_empty(self):
+        return not self.lines
+
+    def totals(self):
+        """Rounded totals in the shape the cart AJAX endpoints return."""
+        return {
+            'subtotal': round(self.subtotal, 2),
+            'discount_amount': round(self.discount_amount, 2),
+            'delivery_amount': round(self.delivery_amount, 2),
+            'grand_total': round(self.grand_total, 2),
+        }
+
+
+def price_cart(cart, delivery=None, coupon=None):
+    """Price a session cart with one product query.
+
+    Lines whose product no longer exists (or whose key is malformed) are
+    skipped, matching the previous per-line behaviour.
+    """
+    parsed = []
+    for composite_key, quantity in (cart or {}).items():
+        key = parse_cart_key(composite_key)
+        if key is None:
+            continue
+        parsed.append((key[0], key[1], quantity))
+
+    products = {}
+    ids = {pid for pid, _, _ in parsed}
+    if ids:
+        products = {p.id: p for p in Product.query.options(joinedload(Product.primary_image)).filter(Product.id.in_(ids)).all()}
+
+    lines = []
+    for pid, color, quantity in parsed:
+        product = products.get(pid)
+        if not product:
+            continue
+        lines.append({
+            'product_id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'quantity': quantity,
+            'total': product.price * quantity,
+            'color': color if color else None,
+            'image': product.primary_image.url if product.primary_image else None,
+            'product': product,
+        })
+    return PricedCart(lines, delivery=delivery, coupon=coupon)
@@ -0,0 +1,345 @@
+"""Server-side cart storage.
+
+The Flask session cookie only carries an opaque ``cart_id``; cart lines, the
+selected delivery option and the applied coupon live in a cart store chosen by
+the CART_STORE config value:
+
+- ``db`` (default): ``Cart``/``CartItem`` tables, shared by all workers.
+- ``memory``: a process-local dict. Only suitable for a single worker
+  (local development, tests) since gunicorn workers do not share memory.
+
+Carts expire CART_TTL_DAYS after their last write. Expired carts read as empty
+and are removed by `purge_expired` (see scripts/purge_expired_carts.py).
+"""
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app, g, session
+from flask_login import current_user
+
+
+def _new_cart_id():
+    return secrets.token_urlsafe(24)
+
+
+class DatabaseCartStore:
+    """Cart store backed by the ``cart``/``cart_item`` tables."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    def _expiry(self):
+        return datetime.utcnow() + self.ttl
+
+    def _live_cart(self, cart_id):
+        from app.models import Cart
+        cart = Cart.query.get(cart_id) if cart_id else None
+        if cart is not None and cart.expires_at < datetime.utcnow():
+            self.delete(cart_id)
+            return None
+        return cart
+
+    def _touch(self, cart_id, user_id=None):
+        """Create the cart row if missing, otherwise push its expiry forward."""
+        from app import db
+        from app.models import Cart
+        cart = Cart.query.get(cart_id)
+        if cart is None:
+            cart = Cart(id=cart_id, user_id=user_id, expires_at=self._expiry())
+            db.session.add(cart)
+        else:
+            cart.expires_at = self._expiry()
+        return cart
+
+    def exists(self, cart_id):
+        return self._live_cart(cart_id) is not None
+
+    def get_items(self, cart_id):
+        from app import db
+        from app.models import CartItem
+        if not self.exists(cart_id):
+            return {}
+        rows = db.session.query(CartItem.item_key, CartItem.quantity).filter(CartItem.cart_id == cart_id).all()
+        return {key: quantity for key, quantity in rows}
+
+    def add_item(self, cart_id, key, quantity, user_id=None):
+        from app import db
+        from app.models import CartItem
+        self._touch(cart_id, user_id=user_id)
+        item = CartItem.query.filter_by(cart_id=cart_id, item_key=key).first()
+        if item:
+            item.quantity = item.quantity + quantity
+        else:
+            db.session.add(CartItem(cart_id=cart_id, item_key=key, quantity=quantity))
+        db.session.commit()
+
+    def remove_item(self, cart_id, key):
+        from app import db
+        from app.models import CartItem
+        removed = CartItem.query.filter_by(cart_id=cart_id, item_key=key).delete()
+        if removed:
+            self._touch(cart_id)
+        db.session.commit()
+        return bool(removed)
+
+    def get_meta(self, cart_id):
+        cart = self._live_cart(cart_id)
+        if cart is None:
+            return {'delivery': None, 'coupon': None}
+        return {'delivery': cart.delivery, 'coupon': cart.coupon}
+
+    def set_meta(self, cart_id, name, value, user_id=None):
+        from app import db
+        cart = self._touch(cart_id, user_id=user_id)
+        setattr(cart, name, value)
+        db.session.commit()
+
+    def delete(self, cart_id):
+        from app import db
+        from app.models import Cart, CartItem
+        CartItem.query.filter_by(cart_id=cart_id).delete()
+        Cart.query.filter_by(id=cart_id).delete()
+        db.session.commit()
+
+    def cart_for_user(self, user_id):
+        from app.models import Cart
+        cart = Cart.query.filter(Cart.user_id == user_id, Cart.expires_at >= datetime.utcnow()).order_by(Cart.expires_at.desc()).first()
+        return cart.id if cart else None
+
+    def assign_user(self, cart_id, user_id):
+        from app import db
+        self._touch(cart_id, user_id=user_id).user_id = user_id
+        db.session.commit()
+
+    def merge(self, source_id, target_id):
+        """Add every line of `source_id` into `target_id`, then drop the source cart."""
+        for key, quantity in self.get_items(source_id).items():
+            self.add_item(target_id, key, quantity)
+        meta = self.get_meta(source_id)
+        if meta.get('delivery'):
+            self.set_meta(target_id, 'delivery', meta['delivery'])
+        self.delete(source_id)
+
+    def purge_expired(self):
+        from app import db
+        from app.models import Cart, CartItem
+        expired = db.session.query(Cart.id).filter(Cart.expires_at < datetime.utcnow())
+        CartItem.query.filter(CartItem.cart_id.in_(expired.scalar_subquery())).delete(synchronize_session=False)
+        count = Cart.query.filter(Cart.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+        db.session.commit()
+        return count
+
+
+class MemoryCartStore:
+    """Process-local cart store (single worker only)."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._carts = {}
+        self._lock = threading.Lock()
+
+    def _live_cart(self, cart_id):
+        cart = self._carts.get(cart_id)
+        if cart is not None and cart['expires_at'] < datetime.utcnow():
+            self._carts.pop(cart_id, None)
+            return None
+        return cart
+
+    def _touch(self, cart_id, user_id=None):
+        cart = self._live_cart(cart_id)
+        if cart is None:
+            cart = {'items': {}, 'delivery': None, 'coupon': None, 'user_id': user_id}
+            self._carts[cart_id] = cart
+        cart['expires_at'] = datetime.utcnow() + self.ttl
+        return cart
+
+    def exists(self, cart_id):
+        with self._lock:
+            return self._live_cart(cart_id) is not None
+
+    def get_items(self, cart_id):
+        with self._lock:
+            cart = self._live_cart(cart_id)
+            return dict(cart['items']) if cart else {}
+
+    def add_item(self, cart_id, key, quantity, user_id=None):
+        with self._lock:
+            items = self._touch(cart_id, user_id=user_id)['items']
+            items[key] = items.get(key, 0) + quantity
+
+    def remove_item(self, cart_id, key):
+        with self._lock:
+            cart = self._live_cart(cart_id)
+            if not cart or key not in cart['items']:
+                return False
+            del cart['items'][key]
+            self._touch(cart_id)
+            return True
+
+    def get_meta(self, cart_id):
+        with self._lock:
+            cart = self._live_cart(cart_id) or {}
+            return {'delivery': cart.get('delivery'), 'coupon': cart.get('coupon')}
+
+    def set_meta(self, cart_id, name, value, user_id=None):
+        with self._lock:
+            self._touch(cart_id, user_id=user_id)[name] = value
+
+    def delete(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def cart_for_user(self, user_id):
+        with self._lock:
+            for cart_id in list(self._carts):
+                cart = self._live_cart(cart_id)
+                if cart and cart.get('user_id') == user_id:
+                    return cart_id
+        return None
+
+    def assign_user(self, cart_id, user_id):
+        with self._lock:
+            self._touch(cart_id, user_id=user_id)['user_id'] = user_id
+
+    def merge(self, source_id, target_id):
+        for key, quantity in self.get_items(source_id).items():
+            self.add_item(target_id, key, quantity)
+        meta = self.get_meta(source_id)
+        if meta.get('delivery'):
+            self.set_meta(target_id, 'delivery', meta['delivery'])
+        self.delete(source_id)
+
+    def purge_expired(self):
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [cid for cid, cart in self._carts.items() if cart['expires_at'] < now]
+            for cid in expired:
+                del self._carts[cid]
+        return len(expired)
+
+
+STORES = {
+    'db': DatabaseCartStore,
+    'memory': MemoryCartStore,
+}
+
+
+def init_app(app):
+    backend = (app.config.get('CART_STORE') or 'db').lower()
+    if backend not in STORES:
+        raise ValueError(f'Unknown CART_STORE backend: {backend}')
+    ttl = timedelta(days=float(app.config.get('CART_TTL_DAYS') or 30))
+    app.extensions['cart_store'] = STORES[backend](ttl)
+
+
+def get_store():
+    return current_app.extensions['cart_store']
+
+
+class SessionCart:
+    """The current visitor's cart: store-backed lines, delivery and coupon.
+
+    Reads are cached for the lifetime of the request; writes go straight to
+    the store. A cart id is only allocated (and put in the session) on the
+    first write, so browsing does not create carts. A cart created for a
+    logged-in visitor (`user_id`) is saved for them, whichever write creates it.
+    """
+
+    def __init__(self, store, user_id=None):
+        self.store = store
+        self.user_id = user_id
+        self._items = None
+        self._meta = None
+
+    @property
+    def id(self):
+        return session.get('cart_id')
+
+    def _ensure_id(self):
+        if not session.get('cart_id'):
+            session['cart_id'] = _new_cart_id()
+        return session['cart_id']
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = self.store.get_items(self.id) if self.id else {}
+        return self._items
+
+    def _get_meta(self, name):
+        if self._meta is None:
+            self._meta = self.store.get_meta(self.id) if self.id else {'delivery': None, 'coupon': None}
+        return self._meta.get(name)
+
+    def _set_meta(self, name, value):
+        if value is None and not self.id:
+            return
+        self.store.set_meta(self._ensure_id(), name, value, user_id=self.user_id)
+        if self._meta is not None:
+            self._meta[name] = value
+
+    @property
+    def delivery(self):
+        return self._get_meta('delivery')
+
+    @delivery.setter
+    def delivery(self, value):
+        self._set_meta('delivery', value)
+
+    @property
+    def coupon(self):
+        return self._get_meta('coupon')
+
+    @coupon.setter
+    def coupon(self, value):
+        self._set_meta('coupon', value)
+
+    def add(self, key, quantity, user_id=None):
+        self.store.add_item(self._ensure_id(), key, quantity, user_id=user_id)
+        self._items = None
+
+    def remove(self, key):
+        if not self.id:
+            return False
+        removed = self.store.remove_item(self.id, key)
+        self._items = None
+        return removed
+
+    def clear(self):
+        if self.id:
+            self.store.delete(self.id)
+        session.pop('cart_id', None)
+        self._items = None
+        self._meta = None
+
+
+def current_cart():
+    """Return the request-scoped `SessionCart` for the current visitor."""
+    if 'cart' not in g:
+        user_id = current_user.id if current_user.is_authenticated else None
+        g.cart = SessionCart(get_store(), user_id=user_id)
+    return g.cart
+
+
+def attach_cart_to_user(user):
+    """Call right after login: merge the anonymous cart into the user's saved cart.
+
+    If the user has no saved cart, the anonymous cart simply becomes theirs.
+    """
+    store = get_store()
+    anon_id = session.get('cart_id')
+    user_cart_id = store.cart_for_user(user.id)
+    if user_cart_id and anon_id and anon_id != user_cart_id and store.exists(anon_id):
+        store.merge(anon_id, user_cart_id)
+    if user_cart_id:
+        session['cart_id'] = user_cart_id
+    elif anon_id and store.exists(anon_id):
+        store.assign_user(anon_id, user.id)
+    g.pop('cart', None)
+
+
+def detach_cart():
+    """Call on logout so the next anonymous visitor does not write into the user's cart."""
+    session.pop('cart_id', None)
+    g.pop('cart', None)
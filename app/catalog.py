@@ -0,0 +1,87 @@
+"""Keyset (cursor) pagination over the active product catalog.
+
+Pages are ordered newest first on ``(created_at, id)``. The cursor is an
+opaque token encoding the last row of the previous page, so fetching page N
+costs the same as fetching page 1 regardless of catalog size.
+
+SQLite keeps timestamps as text: ``current_timestamp`` defaults are stored as
+``'YYYY-MM-DD HH:MM:SS'`` while a bound datetime is rendered with
+microseconds, so `keyset_before` compares against ``datetime(:created)`` there
+to keep both sides in the stored format.
+"""
+import base64
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import DateTime, func, literal, tuple_
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Product
+
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(product):
+    raw = f'{product.created_at.isoformat()}|{product.id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` for a cursor token. Raises ValueError if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created, pid = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return datetime.fromisoformat(created), int(pid)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+
+def keyset_before(created_column, id_column, created, last_id):
+    """Filter for the rows after ``(created, last_id)`` in ``created desc, id desc`` order.
+
+    Written as a row-value comparison so the planner can seek into the
+    ``created_at`` index rather than filter from the top of it.
+    """
+    bound = literal(created, DateTime())
+    if db.session.get_bind().dialect.name == 'sqlite' and not created.microsecond:
+        # rows written by current_timestamp have no fractional part; datetime() drops the '.000000'
+        bound = func.datetime(bound)
+    return tuple_(created_column, id_column) < tuple_(bound, last_id)
+
+
+def page_size(requested=None):
+    default = int(current_app.config.get('CATALOG_PAGE_SIZE') or 24)
+    try:
+        size = int(requested) if requested else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def active_products_page(cursor=None, limit=None):
+    """Return ``(products, next_cursor)`` for one page of active products.
+
+    `next_cursor` is None on the last page. Raises ValueError for a bad cursor.
+    """
+    limit = page_size(limit)
+    query = Product.query.options(joinedload(Product.primary_image)).filter(Product.status == 'active')
+    if cursor:
+        created, pid = decode_cursor(cursor)
+        query = query.filter(keyset_before(Product.created_at, Product.id, created, pid))
+    rows = query.order_by(Product.created_at.desc(), Product.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def product_summary(product):
+    """JSON-friendly representation used by the product listing API."""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'image': product.primary_image.url if product.primary_image else None,
+        'colors': [c.strip() for c in (product.colors or '').split(',') if c.strip()],
+        'created_at': product.created_at.isoformat() if product.created_at else None,
+    }
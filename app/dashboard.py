@@ -0,0 +1,139 @@
+"""Admin dashboard and order listing data access.
+
+Each function returns plain dicts/lists (no ORM objects) so the same data can
+feed the admin templates and the ``/admin/api/dashboard`` JSON endpoint.
+`dashboard_data` needs five queries in total, independent of how many recent
+orders or top products are shown; revenue and status counts come from the
+daily sales rollup (app.sales) rather than the order table.
+"""
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func
+
+from app import db
+from app.catalog import decode_cursor, encode_cursor, keyset_before
+from app.models import DailySales, Order, OrderItem, Product, ProductVisit, User
+from app.sales import sales_summary
+
+
+ORDER_STATUSES = ('Pending', 'Processing', 'Shipped', 'Completed', 'Cancelled')
+ORDERS_PAGE_SIZE = 50
+
+
+def totals():
+    """Product and customer counts in one round trip."""
+    products = db.session.query(func.count(Product.id)).scalar_subquery()
+    customers = db.session.query(func.count(User.id)).filter(User.role == 'customer').scalar_subquery()
+    total_products, total_customers = db.session.query(products, customers).one()
+    return {'total_products': total_products or 0, 'total_customers': total_customers or 0}
+
+
+def recent_orders(limit=10):
+    """Newest orders with the customer's username/email joined in."""
+    rows = db.session.query(
+        Order.id, Order.total_amount, Order.payment_method, Order.trx_id, Order.bkash_number,
+        Order.status, Order.created_at, User.username, User.email,
+    ).outerjoin(User, User.id == Order.user_id).order_by(Order.created_at.desc()).limit(limit).all()
+    return [{
+        'id': r.id,
+        'username': r.username or 'Unknown',
+        'user_email': r.email,
+        'amount': r.total_amount,
+        'payment_method': r.payment_method,
+        'trx_id': r.trx_id,
+        'bkash_number': r.bkash_number,
+        'status': r.status,
+        'created_at': r.created_at,
+    } for r in rows]
+
+
+def top_products(limit=5):
+    """Most visited products with their visit totals and number of distinct orders."""
+    # one counter row per product, so the visit_count index gives the top rows directly
+    order_count = db.session.query(func.count(func.distinct(OrderItem.order_id))) \
+        .filter(OrderItem.product_id == Product.id).correlate(Product).scalar_subquery()
+    rows = db.session.query(Product.id, Product.name, Product.price, ProductVisit.visit_count, order_count) \
+        .join(ProductVisit, ProductVisit.product_id == Product.id) \
+        .order_by(ProductVisit.visit_count.desc(), Product.id).limit(limit).all()
+    return [{
+        'product': {'id': pid, 'name': name, 'price': price},
+        'visits': int(visit_total or 0),
+        'order_count': int(orders or 0),
+    } for pid, name, price, visit_total, orders in rows]
+
+
+def order_filters(status=None, payment_method=None, date_from=None, date_to=None):
+    """WHERE clauses for the admin order filters (dates are inclusive `date` objects)."""
+    clauses = []
+    if status:
+        clauses.append(Order.status == status)
+    if payment_method:
+        clauses.append(Order.payment_method == payment_method)
+    if date_from:
+        clauses.append(Order.created_at >= datetime.combine(date_from, time.min))
+    if date_to:
+        clauses.append(Order.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    return clauses
+
+
+def orders_page(status=None, payment_method=None, date_from=None, date_to=None, cursor=None, limit=ORDERS_PAGE_SIZE):
+    """One keyset page of orders (newest first) joined to their customer.
+
+    Returns ``(orders, next_cursor)``; raises ValueError for a bad cursor. Each
+    filter matches one of the order indexes, so a page costs one index range
+    scan whatever the table size.
+    """
+    query = db.session.query(
+        Order.id, Order.status, Order.total_amount, Order.payment_method, Order.trx_id,
+        Order.created_at, User.username, User.email,
+    ).outerjoin(User, User.id == Order.user_id).filter(*order_filters(status, payment_method, date_from, date_to))
+    if cursor:
+        created, oid = decode_cursor(cursor)
+        query = query.filter(keyset_before(Order.created_at, Order.id, created, oid))
+    rows = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return [{
+        'id': r.id,
+        'status': r.status,
+        'amount': r.total_amount,
+        'payment_method': r.payment_method,
+        'trx_id': r.trx_id,
+        'created_at': r.created_at,
+        'username': r.username or 'Unknown',
+        'user_email': r.email,
+    } for r in rows[:limit]], next_cursor
+
+
+def payment_methods():
+    """Payment methods seen so far (read from the small sales rollup, not the order table)."""
+    return [pm for (pm,) in db.session.query(DailySales.payment_method).distinct().order_by(DailySales.payment_method)]
+
+
+def recent_signups(limit=10):
+    rows = db.session.query(User.id, User.username, User.email, User.created_at) \
+        .order_by(User.created_at.desc()).limit(limit).all()
+    return [{'id': r.id, 'username': r.username, 'email': r.email, 'created_at': r.created_at} for r in rows]
+
+
+def dashboard_data():
+    """Everything the dashboard shows, keyed like the template variables."""
+    data = totals()
+    data.update(sales_summary())
+    data['recent_orders'] = recent_orders()
+    data['top_products'] = top_products()
+    data['recent_signups'] = recent_signups()
+    return data
+
+
+def _jsonable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def dashboard_json():
+    return _jsonable(dashboard_data())
@@ -0,0 +1,80 @@
+"""Engine configuration per database backend.
+
+`init_app` must run before ``db.init_app`` because Flask-SQLAlchemy creates
+the engine from SQLALCHEMY_ENGINE_OPTIONS right away.
+
+SQLite (the default ``instance/app.db``) is shared by every gunicorn worker,
+so each new connection gets these pragmas:
+- ``journal_mode`` (SQLITE_JOURNAL_MODE, default WAL): readers no longer
+  block the writer and the writer no longer blocks readers
+- ``synchronous`` (SQLITE_SYNCHRONOUS, default NORMAL): with WAL, commits
+  skip an fsync yet the database cannot be corrupted by a crash; the last
+  transactions may be lost on power failure
+- ``busy_timeout`` (SQLITE_BUSY_TIMEOUT ms, default 5000): a writer waits for
+  the lock instead of failing with "database is locked"
+- ``mmap_size`` (SQLITE_MMAP_SIZE bytes, default 256 MiB) and ``cache_size``
+  (SQLITE_CACHE_SIZE, SQLite's unit: negative means KiB, default 16 MiB per
+  connection): fewer read() calls for hot pages
+
+Any other backend (a DATABASE_URL pointing at PostgreSQL, for instance) gets
+a connection pool sized by DB_POOL_SIZE / DB_MAX_OVERFLOW, with connections
+checked before use and recycled after DB_POOL_RECYCLE seconds so restarts
+and idle timeouts on the server side do not surface as request errors.
+Options already present in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+"""
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+
+_pragmas = {}
+
+
+def sqlite_pragmas(config):
+    """``{pragma: value}`` to apply on every new SQLite connection."""
+    return {
+        'journal_mode': config.get('SQLITE_JOURNAL_MODE') or 'WAL',
+        'synchronous': config.get('SQLITE_SYNCHRONOUS') or 'NORMAL',
+        'busy_timeout': int(config.get('SQLITE_BUSY_TIMEOUT') or 5000),
+        'mmap_size': int(config.get('SQLITE_MMAP_SIZE') if config.get('SQLITE_MMAP_SIZE') is not None else 268435456),
+        'cache_size': int(config.get('SQLITE_CACHE_SIZE') or -16000),
+    }
+
+
+def engine_options(config):
+    """Engine options for the configured database URL (pooling for server databases)."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        # the sqlite3 driver's own lock wait, for the connect itself (seconds)
+        return {'connect_args': {'timeout': int(config.get('SQLITE_BUSY_TIMEOUT') or 5000) / 1000.0}}
+    return {
+        'pool_size': int(config.get('DB_POOL_SIZE') or 5),
+        'max_overflow': int(config.get('DB_MAX_OVERFLOW') if config.get('DB_MAX_OVERFLOW') is not None else 10),
+        'pool_timeout': float(config.get('DB_POOL_TIMEOUT') or 30),
+        'pool_recycle': int(config.get('DB_POOL_RECYCLE') or 1800),
+        'pool_pre_ping': True,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not _pragmas or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in _pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def init_app(app):
+    options = engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    if make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite':
+        _pragmas.clear()
+        _pragmas.update(sqlite_pragmas(app.config))
+        # registered on the Engine class: Flask-SQLAlchemy creates the engine later, in db.init_app
+        if not event.contains(Engine, 'connect', _apply_sqlite_pragmas):
+            event.listen(Engine, 'connect', _apply_sqlite_pragmas)
@@ -1,29 +1,75 @@
 import os
-from threading import Thread
+import threading
 from flask import current_app
 
-
-def _send_via_brevo(app, subject, sender, recipients, text_body, html_body=None):
-    """Send email using Brevo (Sendinblue) Transactional Emails API only."""
-    try:
-        import sib_api_v3_sdk
-        from sib_api_v3_sdk.rest import ApiException
-    except Exception:
-        app.logger.exception('Brevo SDK not installed or import failed')
-        return
-
-    api_key = app.config.get('BREVO_API_KEY') or os.environ.get('BREVO_API_KEY')
-    if not api_key:
-        app.logger.error('BREVO_API_KEY is not set')
-        return
-
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key['api-key'] = api_key
-
-    api_client = sib_api_v3_sdk.ApiClient(configuration)
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(api_client)
-
-    # parse sender into dict
+from app.outbox import outbox
+
+
+FAKE_BREVO_HOST = 'http://127.0.0.1:8025/v3'
+
+
+class BrevoClient:
+    """Process-wide Brevo `TransactionalEmailsApi`, built on first use.
+
+    The SDK's `ApiClient` keeps a urllib3 pool of keep-alive HTTPS connections,
+    so sharing one per process lets concurrent outbox workers reuse warm
+    connections instead of paying a TLS handshake per email. BREVO_POOL_SIZE
+    bounds the number of pooled connections. The client is rebuilt after a
+    fork or when the API key or host changes.
+
+    BREVO_API_HOST overrides the API base URL. With MAIL_PROVIDER=fake-brevo
+    it defaults to the local stand-in (scripts/fake_brevo.py) and no real API
+    key is needed.
+    """
+
+    def __init__(self):
+        self._api = None
+        self._settings = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _current(self, settings):
+        if self._api is not None and self._settings == settings and self._pid == os.getpid():
+            return self._api
+        return None
+
+    def get(self, app):
+        """Return the shared API instance. Raises if the SDK or API key is missing."""
+        fake = app.config.get('MAIL_PROVIDER') == 'fake-brevo'
+        api_key = app.config.get('BREVO_API_KEY') or os.environ.get('BREVO_API_KEY') or ('fake-key' if fake else None)
+        if not api_key:
+            app.logger.error('BREVO_API_KEY is not set')
+            raise RuntimeError('BREVO_API_KEY is not set')
+        host = app.config.get('BREVO_API_HOST') or (FAKE_BREVO_HOST if fake else None)
+        settings = (api_key, host)
+        api = self._current(settings)
+        if api is not None:
+            return api
+        with self._lock:
+            api = self._current(settings)
+            if api is not None:
+                return api
+            try:
+                import sib_api_v3_sdk
+            except Exception:
+                app.logger.exception('Brevo SDK not installed or import failed')
+                raise
+            configuration = sib_api_v3_sdk.Configuration()
+            configuration.api_key['api-key'] = api_key
+            configuration.connection_pool_maxsize = int(app.config.get('BREVO_POOL_SIZE') or 10)
+            if host:
+                configuration.host = host.rstrip('/')
+            self._api = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+            self._settings = settings
+            self._pid = os.getpid()
+            return self._api
+
+
+brevo_client = BrevoClient()
+
+
+def _sender(app, sender):
+    """Brevo sender dict from an address, a ``Name <address>`` string or a dict."""
     sender_email = None
     sender_name = None
     if isinstance(sender, dict):
@@ -39,53 +85,82 @@ def _send_via_brevo(app, subject, sender, recipients, text_body, html_body=None)
 
     if not sender_email:
         sender_email = app.config.get('MAIL_DEFAULT_SENDER') or app.config.get('MAIL_USERNAME')
+    return {"email": sender_email, "name": sender_name} if sender_name else {"email": sender_email}
+
+
+def _send_via_brevo(app, subject, sender, recipients, text_body, html_body=None, separate=False):
+    """Send email using Brevo (Sendinblue) Transactional Emails API only.
+
+    With ``separate=True`` every recipient gets their own copy (Brevo message
+    versions) instead of one email addressed to all of them, so a whole batch
+    goes out in one API call without exposing addresses to each other.
+
+    Raises on any failure so the caller can retry the message.
+    """
+    api_instance = brevo_client.get(app)
+    import sib_api_v3_sdk
 
     to_list = []
     for r in recipients:
         to_list.append({"email": r})
 
-    send_model = sib_api_v3_sdk.SendSmtpEmail(
-        to=to_list,
-        sender={"email": sender_email, "name": sender_name} if sender_name else {"email": sender_email},
-        subject=subject,
-        html_content=html_body,
-        text_content=text_body,
-    )
-
+    if separate:
+        send_model = sib_api_v3_sdk.SendSmtpEmail(
+            sender=_sender(app, sender),
+            subject=subject,
+            html_content=html_body,
+            text_content=text_body,
+            message_versions=[{"to": [to]} for to in to_list],
+        )
+    else:
+        send_model = sib_api_v3_sdk.SendSmtpEmail(
+            to=to_list,
+            sender=_sender(app, sender),
+            subject=subject,
+            html_content=html_body,
+            text_content=text_body,
+        )
+
+    # ApiException and transport errors propagate to the caller, which logs and retries
+    api_response = api_instance.send_transac_email(send_model)
+    # log Brevo response for debugging
     try:
-        api_response = api_instance.send_transac_email(send_model)
-        # log Brevo response for debugging
-        try:
-            msg_id = getattr(api_response, 'messageId', None) or getattr(api_response, 'message_id', None)
-            app.logger.info('Brevo send_transac_email response, message id: %s', msg_id)
-        except Exception:
-            app.logger.info('Brevo send_transac_email response: %s', api_response)
-    except ApiException as e:
-        app.logger.exception('Failed to send email via Brevo: %s', e)
-    except Exception as e:
-        app.logger.exception('Unexpected error sending email via Brevo: %s', e)
+        msg_id = getattr(api_response, 'messageId', None) or getattr(api_response, 'message_id', None)
+        app.logger.info('Brevo send_transac_email response, message id: %s', msg_id)
+    except Exception:
+        app.logger.info('Brevo send_transac_email response: %s', api_response)
+
 
+def deliver(app, subject, sender, recipients, text_body, html_body=None):
+    """Send one message now. Called by the outbox workers; raises on failure."""
+    _send_via_brevo(app, subject, sender, recipients, text_body, html_body)
 
-def _send_async_email(app, subject, sender, recipients, text_body, html_body=None):
-    with app.app_context():
-        _send_via_brevo(app, subject, sender, recipients, text_body, html_body)
+
+def deliver_batch(app, subject, sender, recipients, text_body, html_body=None):
+    """Send one individual copy to each of up to 1000 `recipients` in a single API call; raises on failure."""
+    _send_via_brevo(app, subject, sender, recipients, text_body, html_body, separate=True)
 
 
 def send_email(subject, recipients, text_body, html_body=None):
-    app = current_app._get_current_object()
-    cfg = app.config
+    """Queue an email in the outbox as part of the current transaction.
+
+    Nothing is sent until the caller commits; a rollback discards the message.
+    """
+    cfg = current_app.config
     sender = cfg.get('MAIL_DEFAULT_SENDER') or cfg.get('MAIL_USERNAME')
 
     if isinstance(recipients, str):
         recipients = [r.strip() for r in recipients.split(',') if r.strip()]
+    if not recipients:
+        return None
 
-    thr = Thread(target=_send_async_email, args=(app, subject, sender, recipients, text_body, html_body), daemon=True)
-    thr.start()
+    return outbox.enqueue(subject, recipients, text_body, html_body, sender=sender)
 
 
 def send_otp(email, otp_code, username=None, expires=None):
+    """Queue the OTP email; like `send_email`, the caller commits it with its `OTPToken`."""
     subject = 'Your SoBuy OTP'
     from flask import render_template
     text = render_template('email/otp.txt', otp=otp_code, username=username, expires=expires)
     html = render_template('email/otp.html', otp=otp_code, username=username, expires=expires)
-    send_email(subject, email, text, html)
+    return send_email(subject, email, text, html)
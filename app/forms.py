@@ -109,4 +109,11 @@ class CouponForm(FlaskForm):
     max_total_uses = IntegerField('Max Total Uses (optional)', validators=[Optional(), NumberRange(min=1)], render_kw={"placeholder": "Leave empty for unlimited"})
     expiry_date = DateTimeLocalField('Expiry Date (optional)', validators=[Optional()], format='%Y-%m-%dT%H:%M')
     is_active = BooleanField('Active')
-    submit = SubmitField('Save Coupon')
\ No newline at end of file
+    submit = SubmitField('Save Coupon')
+
+
+class CampaignForm(FlaskForm):
+    subject = StringField('Subject', validators=[DataRequired(), Length(max=255)])
+    text_body = TextAreaField('Plain text', validators=[DataRequired()])
+    html_body = TextAreaField('HTML (optional)', validators=[Optional()])
+    submit = SubmitField('Save Campaign')
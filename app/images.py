@@ -0,0 +1,211 @@
+"""Upload image pipeline.
+
+Uploaded product and slider images are saved as-is by the request, then
+handed to `image_pipeline`, which renders resized WebP and JPEG derivatives in
+a per-worker `ProcessPoolExecutor` so resizing never blocks a request thread.
+The EXIF orientation is applied to the derivatives so rotated phone photos
+come out upright, and they carry no EXIF metadata (GPS position, camera
+serials). The original upload is kept as uploaded, without re-encoding.
+
+When a render finishes, the derivative URLs are written to the row's
+``derivatives`` column as ``{"webp": {"320": url, ...}, "jpeg": {...}}`` and
+templates build ``srcset`` attributes from it. Until then (or when Pillow is
+missing) the original upload is served.
+
+Configuration:
+- IMAGE_DERIVATIVE_WIDTHS: comma-separated target widths (default 320,640,1024,1600)
+- IMAGE_QUALITY: WebP/JPEG quality (default 80)
+- IMAGE_WORKERS: processes per gunicorn worker; 0 renders inline in the request (development)
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+FORMATS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# model name -> column holding the original upload URL
+URL_COLUMNS = {
+    'ProductImage': 'url',
+    'HomeSliderImage': 'image_url',
+}
+
+
+def render_derivatives(src_path, widths, quality):
+    """Render every derivative of `src_path` next to it. Runs in a pool process.
+
+    Returns ``{'width', 'height', 'files': {fmt: {width: filename}}}``.
+    Widths larger than the source are skipped; a source narrower than the
+    smallest width gets a single derivative at its own size.
+    """
+    from PIL import Image, ImageOps
+
+    folder = os.path.dirname(src_path)
+    stem = os.path.splitext(os.path.basename(src_path))[0]
+    with Image.open(src_path) as original:
+        # the original file is left byte-for-byte as uploaded; only the derivatives are rotated
+        im = ImageOps.exif_transpose(original)
+        im.load()
+    width, height = im.size
+
+    targets = sorted({min(int(w), width) for w in widths if int(w) > 0}) or [width]
+    files = {fmt: {} for fmt in FORMATS}
+    for target in targets:
+        if target < width:
+            resized = im.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+        else:
+            resized = im
+        for fmt, ext in FORMATS.items():
+            name = f'{stem}_{target}w.{ext}'
+            out = resized
+            if fmt == 'jpeg' and resized.mode != 'RGB':
+                if resized.mode in ('RGBA', 'LA', 'P'):
+                    rgba = resized.convert('RGBA')
+                    out = Image.new('RGB', rgba.size, (255, 255, 255))
+                    out.paste(rgba, mask=rgba.split()[-1])
+                else:
+                    out = resized.convert('RGB')
+            elif fmt == 'webp' and resized.mode not in ('RGB', 'RGBA'):
+                out = resized.convert('RGBA' if 'A' in resized.mode or resized.mode == 'P' else 'RGB')
+            # Pillow only writes EXIF when passed exif=..., so derivatives carry none
+            if fmt == 'jpeg':
+                out.save(os.path.join(folder, name), format='JPEG', quality=quality, optimize=True, progressive=True)
+            else:
+                out.save(os.path.join(folder, name), format='WEBP', quality=quality, method=4)
+            files[fmt][str(target)] = name
+    return {'width': width, 'height': height, 'files': files}
+
+
+def _url_for_file(original_url, filename):
+    return original_url.rsplit('/', 1)[0] + '/' + filename
+
+
+def derivative_urls(derivatives):
+    """Flat list of every URL in a ``derivatives`` dict."""
+    return [url for variants in (derivatives or {}).values() for url in (variants or {}).values()]
+
+
+class ImagePipeline:
+
+    def __init__(self):
+        self.app = None
+        self.widths = (320, 640, 1024, 1600)
+        self.quality = 80
+        self.workers = 2
+        self.enabled = False
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        raw = app.config.get('IMAGE_DERIVATIVE_WIDTHS') or '320,640,1024,1600'
+        self.widths = tuple(int(w) for w in str(raw).split(',') if w.strip())
+        self.quality = int(app.config.get('IMAGE_QUALITY') or 80)
+        self.workers = int(app.config.get('IMAGE_WORKERS') if app.config.get('IMAGE_WORKERS') is not None else 2)
+        try:
+            import PIL  # noqa: F401
+            self.enabled = True
+        except Exception:
+            app.logger.warning('Pillow is not installed; uploaded images will be served without derivatives')
+            self.enabled = False
+
+    def _get_executor(self):
+        # one pool per gunicorn worker; a forked child must not reuse its parent's pool
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+            return self._executor
+
+    def upload_path(self, url):
+        upload_folder = self.app.config.get('UPLOAD_FOLDER') or os.path.join(self.app.static_folder, 'uploads')
+        filepath = os.path.join(upload_folder, url.split('/')[-1])
+        try:
+            common = os.path.commonpath([os.path.abspath(filepath), os.path.abspath(upload_folder)])
+        except Exception:
+            common = None
+        return filepath if common == os.path.abspath(upload_folder) else None
+
+    def process(self, images):
+        """Queue derivative rendering for committed `ProductImage`/`HomeSliderImage` rows."""
+        if not self.enabled:
+            return
+        for image in images:
+            model_name = type(image).__name__
+            url = getattr(image, URL_COLUMNS[model_name])
+            path = self.upload_path(url) if url else None
+            if not path or not os.path.exists(path):
+                continue
+            job = (model_name, image.id, url)
+            if self.workers <= 0:
+                try:
+                    result = render_derivatives(path, self.widths, self.quality)
+                except Exception:
+                    self.app.logger.exception('Failed to render derivatives for %s', url)
+                    continue
+                self._store(job, result)
+                continue
+            try:
+                future = self._get_executor().submit(render_derivatives, path, self.widths, self.quality)
+            except Exception:
+                self.app.logger.exception('Failed to queue derivatives for %s', url)
+                continue
+            future.add_done_callback(lambda f, job=job: self._finished(job, f))
+
+    def _finished(self, job, future):
+        try:
+            result = future.result()
+        except Exception:
+            self.app.logger.exception('Failed to render derivatives for %s', job[2])
+            return
+        with self.app.app_context():
+            self._store(job, result)
+
+    def _store(self, job, result):
+        from app import db, models
+        from app.cache import homepage_cache
+        model_name, row_id, url = job
+        derivatives = {fmt: {w: _url_for_file(url, name) for w, name in variants.items()}
+                       for fmt, variants in result['files'].items()}
+        try:
+            row = db.session.get(getattr(models, model_name), row_id)
+            if row is None or getattr(row, URL_COLUMNS[model_name]) != url:
+                # image was removed while rendering
+                self.delete_files(derivatives)
+                return
+            row.derivatives = derivatives
+            if hasattr(row, 'width'):
+                row.width, row.height = result['width'], result['height']
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception('Failed to store derivatives for %s', url)
+            return
+        homepage_cache.invalidate()
+
+    def delete_files(self, derivatives):
+        """Remove derivative files from the upload folder."""
+        for url in derivative_urls(derivatives):
+            path = self.upload_path(url)
+            try:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                self.app.logger.exception('Failed to delete derivative file: %s', path)
+
+    def wait(self):
+        """Block until queued renders are finished (scripts, shutdown)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=True)
+
+
+image_pipeline = ImagePipeline()
+
+
+def init_app(app):
+    image_pipeline.init_app(app)
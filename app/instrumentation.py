@@ -0,0 +1,159 @@
+"""Per-request SQL and template timing.
+
+For every request this counts the SQL statements run on the app's engine
+(``before_cursor_execute`` / ``after_cursor_execute``), their total time and
+the time spent rendering templates, and:
+
+- with SERVER_TIMING on (off by default: the figures describe the server to
+  anyone who can make a request), adds a ``Server-Timing`` header (``db``,
+  ``render`` and ``total``; shown in the browser's network panel)
+- logs every statement slower than SLOW_QUERY_MS with the endpoint name
+- keeps per-endpoint totals in this worker (`endpoint_stats`, served at
+  ``/admin/api/request-stats``) so N+1 patterns show up as a high
+  queries-per-request figure
+- with SQL_QUERY_BUDGET set, logs requests that run more statements than
+  that; with SQL_QUERY_BUDGET_RAISE on (meant for tests) the request fails
+  with `QueryBudgetExceeded` instead
+
+Statements run outside a request (background workers, CLI commands) are not
+counted, and neither are those a streaming response (the admin exports) runs
+after its headers went out.
+"""
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+
+from app import db
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more SQL statements than SQL_QUERY_BUDGET allows."""
+
+
+class RequestTiming:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        return (f'db;dur={self.db_ms:.1f};desc="{self.queries} queries", '
+                f'render;dur={self.render_ms:.1f}, total;dur={self.total_ms:.1f}')
+
+
+class EndpointStats:
+    """Running totals per endpoint for this worker process."""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, timing, total_ms):
+        with self._lock:
+            totals = self._totals.setdefault(endpoint, {'requests': 0, 'queries': 0, 'max_queries': 0,
+                                                        'db_ms': 0.0, 'render_ms': 0.0, 'total_ms': 0.0})
+            totals['requests'] += 1
+            totals['queries'] += timing.queries
+            totals['max_queries'] = max(totals['max_queries'], timing.queries)
+            totals['db_ms'] += timing.db_ms
+            totals['render_ms'] += timing.render_ms
+            totals['total_ms'] += total_ms
+
+    def snapshot(self):
+        """``{endpoint: totals}`` with per-request averages, busiest endpoints (by DB time) first."""
+        with self._lock:
+            rows = {endpoint: dict(totals) for endpoint, totals in self._totals.items()}
+        for totals in rows.values():
+            n = totals['requests']
+            for key in ('db_ms', 'render_ms', 'total_ms'):
+                totals[key] = round(totals[key], 2)
+            totals['avg_queries'] = round(totals['queries'] / n, 2)
+            totals['avg_db_ms'] = round(totals['db_ms'] / n, 2)
+            totals['avg_render_ms'] = round(totals['render_ms'] / n, 2)
+            totals['avg_total_ms'] = round(totals['total_ms'] / n, 2)
+        return dict(sorted(rows.items(), key=lambda item: item[1]['db_ms'], reverse=True))
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+
+endpoint_stats = EndpointStats()
+
+
+def _current():
+    return g.get('_request_timing') if has_request_context() else None
+
+
+class TimedTemplate(Template):
+    """Adds each top-level render to the current request's render time (includes/extends are part of it)."""
+
+    def render(self, *args, **kwargs):
+        timing = _current()
+        if timing is None:
+            return super().render(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            timing.render_ms += (time.perf_counter() - started) * 1000
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the execution context, which is discarded with the statement even if it raises
+    if context is not None and _current() is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timing = _current()
+    started = getattr(context, '_query_start', None)
+    if timing is None or started is None:
+        return
+    elapsed = (time.perf_counter() - started) * 1000
+    timing.queries += 1
+    timing.db_ms += elapsed
+    threshold = current_app.config.get('SLOW_QUERY_MS')
+    if threshold and elapsed >= threshold:
+        current_app.logger.warning('Slow query (%.1f ms) in %s: %s', elapsed, request.endpoint,
+                                   ' '.join(statement.split())[:1000])
+
+
+def init_app(app):
+    app.jinja_env.template_class = TimedTemplate
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def _start_request_timing():
+        g._request_timing = RequestTiming()
+
+    @app.after_request
+    def _finish_request_timing(response):
+        timing = g.pop('_request_timing', None)
+        if timing is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        total_ms = timing.total_ms
+        endpoint_stats.record(endpoint, timing, total_ms)
+        if app.config.get('SERVER_TIMING'):
+            response.headers['Server-Timing'] = timing.server_timing()
+        budget = app.config.get('SQL_QUERY_BUDGET')
+        if budget and timing.queries > budget:
+            message = f'{endpoint} ran {timing.queries} SQL queries (budget {budget})'
+            if app.config.get('SQL_QUERY_BUDGET_RAISE'):
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
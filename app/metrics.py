@@ -0,0 +1,396 @@
+"""Prometheus metrics shared across gunicorn workers.
+
+Counters and histograms live in each worker's memory and are written every
+METRICS_FLUSH_INTERVAL seconds (and at exit) to ``<pid>-<token>.json`` under
+METRICS_DIR (instance/metrics by default). ``/metrics`` merges every
+worker's file, so whichever worker answers the scrape reports the totals of
+all of them, at most one flush interval old:
+
+- counters and histograms are summed over all files; files left by workers
+  that exited are folded into ``dead.json`` so their counts are not lost
+- gauges (DB pool usage) are summed over files flushed recently, i.e. over
+  the workers that are still running
+- the email queue depth is read from the outbox table at scrape time
+
+``/metrics`` serves the text exposition format to admins, or to anyone
+presenting ``Authorization: Bearer <METRICS_TOKEN>`` when that is set (for
+the Prometheus scraper).
+"""
+import atexit
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows dev server: one process, nothing to fold
+    fcntl = None
+
+from flask import Response, current_app, g, request
+from flask_login import current_user
+
+from app import db
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [[list(key), value if not isinstance(value, list) else list(value)]
+                    for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Set from the process that owns the value; merged as a sum over live workers."""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # per-bucket (not cumulative) counts, then sum and count
+            counts = self._values.setdefault(key, [0] * (len(self.buckets) + 3))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+        self.directory = None
+        self.flush_interval = 5.0
+        self.engine = None
+        self._token = uuid.uuid4().hex[:8]
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def init_app(self, app):
+        self.directory = app.config.get('METRICS_DIR') or os.path.join(app.instance_path, 'metrics')
+        self.flush_interval = float(app.config.get('METRICS_FLUSH_INTERVAL') or 5)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            app.logger.warning('Could not create metrics directory %s', self.directory)
+        with app.app_context():
+            self.engine = db.engine
+        atexit.register(self._stop.set)
+        atexit.register(self.flush)
+
+    # -- writing -------------------------------------------------------------
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f'{os.getpid()}-{self._token}.json')
+
+    def _sample_pool(self):
+        pool = getattr(self.engine, 'pool', None)
+        for state, method in (('checked_out', 'checkedout'), ('idle', 'checkedin'), ('overflow', 'overflow')):
+            if hasattr(pool, method):
+                db_pool_connections.set(max(0, getattr(pool, method)()), state=state)
+
+    def flush(self):
+        """Write this process's samples to its file (atomically)."""
+        if not self.directory:
+            return
+        if self._pid != os.getpid():
+            # forked from a process that already counted: start from zero under a new file name
+            self._reset_after_fork()
+        self._sample_pool()
+        payload = {'pid': os.getpid(), 'metrics': {name: metric.samples() for name, metric in self.metrics.items()}}
+        try:
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as fh:
+                json.dump(payload, fh)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def _reset_after_fork(self):
+        if self._pid is not None:
+            for metric in self.metrics.values():
+                with metric._lock:
+                    metric._values.clear()
+            self._token = uuid.uuid4().hex[:8]
+        self._pid = os.getpid()
+
+    def start(self):
+        """Flush periodically from a daemon thread (lazily, and again after a fork)."""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    # -- reading -------------------------------------------------------------
+
+    def _fold_dead(self, files):
+        """Move counts from files of exited workers into dead.json. Returns the live files."""
+        if fcntl is None:
+            return files
+        live = []
+        dead = []
+        for path in files:
+            pid = int(os.path.basename(path).split('-', 1)[0])
+            try:
+                os.kill(pid, 0)
+                live.append(path)
+            except ProcessLookupError:
+                dead.append(path)
+            except PermissionError:
+                live.append(path)
+        if not dead:
+            return live
+        with open(os.path.join(self.directory, 'dead.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = os.path.join(self.directory, 'dead.json')
+            folded = {}
+            _merge_into(folded, (_read(archive_path) or {}).get('metrics', {}), self.metrics, gauges=False)
+            for path in dead:
+                data = _read(path)
+                if data is None:
+                    continue  # folded by another worker meanwhile
+                _merge_into(folded, data['metrics'], self.metrics, gauges=False)
+            tmp = f'{archive_path}.tmp'
+            with open(tmp, 'w') as fh:
+                json.dump({'metrics': {name: [[list(key), value] for key, value in values.items()]
+                                       for name, values in folded.items()}}, fh)
+            os.replace(tmp, archive_path)
+            for path in dead:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return live
+
+    def collect(self):
+        """``{name: samples}`` merged over every worker."""
+        self.flush()
+        files = [p for p in glob.glob(os.path.join(self.directory, '*-*.json'))]
+        files = self._fold_dead(files)
+        merged = {}
+        fresh_after = time.time() - 3 * self.flush_interval
+        archive = _read(os.path.join(self.directory, 'dead.json'))
+        if archive:
+            _merge_into(merged, archive['metrics'], self.metrics, gauges=False)
+        for path in files:
+            data = _read(path)
+            if data is None:
+                continue
+            try:
+                fresh = os.path.getmtime(path) >= fresh_after
+            except OSError:
+                fresh = False
+            _merge_into(merged, data['metrics'], self.metrics, gauges=fresh)
+        return merged
+
+    def exposition(self, extra=()):
+        """Prometheus text format for the merged samples plus ``extra`` ``(metric, samples)`` pairs."""
+        merged = self.collect()
+        lines = []
+        families = [(metric, merged.get(name, {})) for name, metric in self.metrics.items()] + list(extra)
+        for metric, samples in families:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for key, value in sorted(samples.items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind != 'histogram':
+                    lines.append(f'{metric.name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value):
+                    cumulative += count
+                    lines.append(f'{metric.name}_bucket{_labels(labels + [("le", _number(bound))])} {cumulative}')
+                lines.append(f'{metric.name}_bucket{_labels(labels + [("le", "+Inf")])} {value[-1]}')
+                lines.append(f'{metric.name}_sum{_labels(labels)} {_number(value[-2])}')
+                lines.append(f'{metric.name}_count{_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _read(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge_into(target, metrics, known, gauges):
+    for name, samples in metrics.items():
+        metric = known.get(name)
+        if metric is None or (metric.kind == 'gauge' and not gauges):
+            continue
+        values = target.setdefault(name, {})
+        for key, value in samples:
+            key = tuple(key)
+            if isinstance(value, list):
+                current = values.get(key)
+                values[key] = value if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                values[key] = values.get(key, 0) + value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+registry = Registry()
+
+http_requests_total = registry.counter(
+    'sobuy_http_requests_total', 'HTTP requests by endpoint, method and status code.', ('endpoint', 'method', 'status'))
+http_request_duration_seconds = registry.histogram(
+    'sobuy_http_request_duration_seconds', 'Request latency by endpoint.', ('endpoint', 'method'))
+checkouts_total = registry.counter(
+    'sobuy_checkouts_total', 'Checkout submissions by result (success, invalid, error).', ('result',))
+emails_total = registry.counter(
+    'sobuy_emails_total', 'Outbox delivery attempts by result (sent, retry, failed).', ('result',))
+email_send_duration_seconds = registry.histogram(
+    'sobuy_email_send_duration_seconds', 'Time for one Brevo send call from the outbox.', ())
+email_delivery_delay_seconds = registry.histogram(
+    'sobuy_email_delivery_delay_seconds', 'Time from queueing an email to Brevo accepting it.', (),
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600))
+cache_requests_total = registry.counter(
+    'sobuy_cache_requests_total', 'Per-worker cache lookups by cache and result (hit, miss).', ('cache', 'result'))
+db_pool_connections = registry.gauge(
+    'sobuy_db_pool_connections', 'Database pool connections by state, summed over running workers.', ('state',))
+
+email_outbox_messages = Gauge('sobuy_email_outbox_messages', 'Outbox rows by status (queue depth).', ('status',))
+
+
+def record_cache(cache, hit):
+    cache_requests_total.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _outbox_depth():
+    from app.models import EmailOutbox
+    try:
+        rows = db.session.query(EmailOutbox.status, db.func.count(EmailOutbox.id)) \
+            .filter(EmailOutbox.status.in_(('pending', 'sending'))).group_by(EmailOutbox.status).all()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Failed to read outbox depth for metrics')
+        return {}
+    counts = {('pending',): 0, ('sending',): 0}
+    counts.update({(status,): count for status, count in rows})
+    return counts
+
+
+def metrics_response():
+    """The ``/metrics`` body for all workers, with the outbox depth read now."""
+    body = registry.exposition(extra=[(email_outbox_messages, _outbox_depth())])
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+def scrape_allowed():
+    """Admins, or a scraper presenting METRICS_TOKEN as a bearer token."""
+    token = current_app.config.get('METRICS_TOKEN')
+    presented = request.headers.get('Authorization') or ''
+    if token and hmac.compare_digest(presented.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+        return True
+    return current_user.is_authenticated and current_user.is_admin
+
+
+def init_app(app):
+    registry.init_app(app)
+
+    @app.before_request
+    def _start_request_metrics():
+        registry.start()
+        g._metrics_started = time.perf_counter()
+
+    def _observe(status):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        http_request_duration_seconds.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+        http_requests_total.inc(endpoint=endpoint, method=request.method, status=status)
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        _observe(response.status_code)
+        return response
+
+    @app.teardown_request
+    def _failed_request_metrics(exc):
+        # only reached with the start time still set when the view raised
+        _observe(500)
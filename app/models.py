@@ -3,6 +3,8 @@ from flask_login import UserMixin # Import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(UserMixin, db.Model): # Inherit from UserMixin
+    # dashboard "recent signups"
+    __table_args__ = (db.Index('ix_user_created_at', 'created_at'),)
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     # allow nullable for backwards compatibility with existing users created before email was required
@@ -15,6 +17,8 @@ class User(UserMixin, db.Model): # Inherit from UserMixin
     # account status
     is_banned = db.Column(db.Boolean, nullable=False, default=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # bumped by app.user_cache.user_changed so cached copies in other workers can be told apart
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -34,19 +38,95 @@ class User(UserMixin, db.Model): # Inherit from UserMixin
     def is_admin(self):
         return self.role == 'admin'
 
+
+class ImageDerivativesMixin:
+    """`srcset` helpers over a ``derivatives`` JSON column filled by app.images."""
+
+    def variants(self, fmt):
+        """``[(width, url), ...]`` for one derivative format, narrowest first."""
+        found = (self.derivatives or {}).get(fmt) or {}
+        return sorted(((int(w), url) for w, url in found.items()), key=lambda v: v[0])
+
+    def srcset(self, fmt):
+        return ', '.join(f'{url} {w}w' for w, url in self.variants(fmt))
+
+    def best_url(self, fmt='webp', max_width=None):
+        """Widest derivative not wider than `max_width` (any width if None), else the original."""
+        fitting = [url for w, url in self.variants(fmt) if max_width is None or w <= max_width]
+        return fitting[-1] if fitting else self.original_url
+
+
 class Product(db.Model):
+    # storefront listings: active products, newest first
+    __table_args__ = (db.Index('ix_product_status_created_at', 'status', 'created_at'),)
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Float, nullable=False)
-    # store comma-separated URLs for multiple images
-    image_url = db.Column(db.Text, nullable=True)
     # optional comma-separated color names/hex values
     colors = db.Column(db.String(200), nullable=True)
     status = db.Column(db.String(20), nullable=False, default='active') # active, inactive
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), nullable=False)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+    # all images in display order; positions are kept contiguous from 0
+    images = db.relationship('ProductImage', order_by='ProductImage.position', cascade='all, delete-orphan',
+                             backref='product')
+    # just the first image, for listings: load with joinedload(Product.primary_image)
+    primary_image = db.relationship('ProductImage', uselist=False, viewonly=True,
+                                    primaryjoin='and_(ProductImage.product_id == Product.id, ProductImage.position == 0)')
+
+    @property
+    def image_urls(self):
+        return [img.url for img in self.images]
+
+    def set_image_urls(self, urls, sizes=None):
+        """Replace the product's images with `urls` (in order), reusing rows for unchanged URLs.
+
+        `sizes` optionally maps url -> (width, height) for newly added images.
+        """
+        sizes = sizes or {}
+        existing = {img.url: img for img in self.images}
+        ordered = []
+        for url in urls:
+            if not url or any(img.url == url for img in ordered):
+                continue
+            img = existing.pop(url, None)
+            if img is None:
+                width, height = sizes.get(url, (None, None))
+                img = ProductImage(url=url, width=width, height=height)
+            ordered.append(img)
+        for position, img in enumerate(ordered):
+            img.position = position
+        self.images = ordered
+
+
+class ProductImage(ImageDerivativesMixin, db.Model):
+    """One product image. Position 0 is the primary image shown in listings."""
+    __table_args__ = (db.Index('ix_product_image_product_position', 'product_id', 'position'),)
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    url = db.Column(db.String(300), nullable=False)  # original upload, e.g. /static/uploads/<file>
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    # resized variants, e.g. {"webp": {"320": "/static/uploads/..."}, "jpeg": {...}}
+    derivatives = db.Column(db.JSON, nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    @property
+    def original_url(self):
+        return self.url
+
 class Order(db.Model):
+    # admin order listing: newest first, optionally filtered by status or payment method
+    __table_args__ = (
+        db.Index('ix_order_created_at_id', 'created_at', 'id'),
+        db.Index('ix_order_status_created_at', 'status', 'created_at'),
+        db.Index('ix_order_payment_method_created_at', 'payment_method', 'created_at'),
+        # a customer's order history on /profile
+        db.Index('ix_order_user_id_created_at', 'user_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     total_amount = db.Column(db.Float, nullable=False)
@@ -58,10 +138,14 @@ class Order(db.Model):
     coupon_id = db.Column(db.Integer, db.ForeignKey('coupon.id', name='fk_order_coupon_id'), nullable=True)  # Applied coupon
     discount_amount = db.Column(db.Float, nullable=True, default=0.0)  # Actual discount applied
     status = db.Column(db.String(20), nullable=False, default='Pending')  # Pending, Processing, Shipped, Completed, Cancelled
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), nullable=False)
 
 
 class OrderItem(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_item_order_id', 'order_id'),
+        db.Index('ix_order_item_product_id', 'product_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -73,7 +157,24 @@ class OrderItem(db.Model):
     order = db.relationship('Order', backref=db.backref('items', lazy='joined'))
     product = db.relationship('Product', backref=db.backref('order_items', lazy='dynamic'))
 
+class DailySales(db.Model):
+    """Orders rolled up per UTC day, payment method and status; maintained by app.sales."""
+    __table_args__ = (db.UniqueConstraint('day', 'payment_method', 'status', name='uq_daily_sales_day_method_status'),)
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    payment_method = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    discount = db.Column(db.Float, nullable=False, default=0.0)  # coupon discounts given
+
+
 class ProductVisit(db.Model):
+    # one counter row per product (app.visits relies on it); visit_count orders the homepage "popular" picks
+    __table_args__ = (
+        db.UniqueConstraint('product_id', name='uq_product_visit_product_id'),
+        db.Index('ix_product_visit_visit_count', 'visit_count'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     visit_count = db.Column(db.Integer, default=0)
@@ -92,7 +193,27 @@ class OTPToken(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
 
-class HomeSliderImage(db.Model):
+class EmailOutbox(db.Model):
+    """Outgoing email, written in the sender's transaction and delivered by app.outbox."""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255), nullable=True)
+    recipients = db.Column(db.JSON, nullable=False)  # list of addresses
+    text_body = db.Column(db.Text, nullable=True)
+    html_body = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    claimed_by = db.Column(db.String(64), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)  # a 'sending' row past this is reclaimed
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+
+class HomeSliderImage(ImageDerivativesMixin, db.Model):
     """Images used in the homepage 'Discover Our New Collection' slider/hero background.
     Admins can upload multiple images; they will be shown (first by default) behind the hero section.
     """
@@ -100,10 +221,17 @@ class HomeSliderImage(db.Model):
     image_url = db.Column(db.String(300), nullable=False)
     position = db.Column(db.Integer, nullable=False, default=0)
     active = db.Column(db.Boolean, nullable=False, default=True)
+    # resized variants rendered by app.images (same shape as ProductImage.derivatives)
+    derivatives = db.Column(db.JSON, nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    @property
+    def original_url(self):
+        return self.image_url
+
 
 class BlogPost(db.Model):
+    __table_args__ = (db.Index('ix_blog_post_created_at', 'created_at'),)
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     slug = db.Column(db.String(250), unique=True, nullable=True, index=True)
@@ -116,6 +244,10 @@ class BlogPost(db.Model):
 
 
 class BlogComment(db.Model):
+    __table_args__ = (
+        db.Index('ix_blog_comment_post_id_created_at', 'post_id', 'created_at'),
+        db.Index('ix_blog_comment_created_at', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('blog_post.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -124,6 +256,7 @@ class BlogComment(db.Model):
 
 
 class BlogLike(db.Model):
+    __table_args__ = (db.UniqueConstraint('post_id', 'user_id', name='uq_blog_like_post_user'),)
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('blog_post.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -131,6 +264,7 @@ class BlogLike(db.Model):
 
 
 class BlogVisit(db.Model):
+    __table_args__ = (db.UniqueConstraint('post_id', name='uq_blog_visit_post_id'),)
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('blog_post.id'), nullable=False)
     visit_count = db.Column(db.Integer, default=0)
@@ -156,11 +290,39 @@ class DeliveryFee(db.Model):
 
 class NewsletterSubscriber(db.Model):
     """Stores emails of customers who subscribe to the site newsletter."""
+    __table_args__ = (db.Index('ix_newsletter_subscriber_created_at', 'created_at'),)
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), nullable=False, unique=True, index=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
 
+class NewsletterCampaign(db.Model):
+    """A bulk email to all newsletter subscribers, sent in batches by app.campaigns.
+
+    Progress is checkpointed as the highest subscriber id already handed to
+    Brevo; ``inflight_last_id`` marks a batch whose send was started but not
+    confirmed, so a restarted runner can tell what might already be out.
+    """
+    __tablename__ = 'newsletter_campaign'
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    text_body = db.Column(db.Text, nullable=False)
+    html_body = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='draft', index=True)  # draft, queued, sending, paused, completed
+    last_subscriber_id = db.Column(db.Integer, nullable=False, default=0)
+    inflight_last_id = db.Column(db.Integer, nullable=True)
+    sent_count = db.Column(db.Integer, nullable=False, default=0)
+    skipped_count = db.Column(db.Integer, nullable=False, default=0)  # recipients of unconfirmed batches, not resent
+    batch_count = db.Column(db.Integer, nullable=False, default=0)
+    failures = db.Column(db.Integer, nullable=False, default=0)  # consecutive failed batches
+    last_error = db.Column(db.Text, nullable=True)
+    claimed_by = db.Column(db.String(64), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
 class Coupon(db.Model):
     """Discount coupons that customers can apply at checkout."""
     id = db.Column(db.Integer, primary_key=True)
@@ -177,6 +339,7 @@ class Coupon(db.Model):
 
 class CouponUsage(db.Model):
     """Tracks individual coupon usage by users."""
+    __table_args__ = (db.Index('ix_coupon_usage_coupon_id_user_id', 'coupon_id', 'user_id'),)
     id = db.Column(db.Integer, primary_key=True)
     coupon_id = db.Column(db.Integer, db.ForeignKey('coupon.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -185,4 +348,22 @@ class CouponUsage(db.Model):
     
     # relationships
     coupon = db.relationship('Coupon', backref=db.backref('usages', lazy='dynamic'))
-    user = db.relationship('User', backref=db.backref('coupon_usages', lazy='dynamic'))
\ No newline at end of file
+    user = db.relationship('User', backref=db.backref('coupon_usages', lazy='dynamic'))
+
+class Cart(db.Model):
+    """Server-side shopping cart. The browser session only carries the opaque cart id."""
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True, index=True)
+    delivery = db.Column(db.JSON, nullable=True)  # selected delivery option {key, label, amount}
+    coupon = db.Column(db.JSON, nullable=True)  # applied coupon {id, code, discount_percent, discount_amount}
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # pushed forward on every write
+
+
+class CartItem(db.Model):
+    """One cart line keyed by the composite "<product_id>:<color>" cart key."""
+    __table_args__ = (db.UniqueConstraint('cart_id', 'item_key', name='uq_cart_item_cart_key'),)
+    id = db.Column(db.Integer, primary_key=True)
+    cart_id = db.Column(db.String(64), db.ForeignKey('cart.id', ondelete='CASCADE'), nullable=False)
+    item_key = db.Column(db.String(250), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
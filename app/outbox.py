@@ -0,0 +1,298 @@
+"""Durable email outbox.
+
+`app.email.send_email` no longer talks to Brevo from the request. It adds an
+``EmailOutbox`` row to the caller's session, so the message is committed (or
+rolled back) together with the order, token or status change that caused it.
+Committed rows are delivered by a small pool of worker threads:
+
+- OUTBOX_WORKERS threads per web process (default 2) wake up right after a
+  commit that queued mail and otherwise poll every OUTBOX_POLL_INTERVAL
+  seconds. Set OUTBOX_WORKERS=0 to leave delivery to a separate
+  ``flask outbox-worker`` process.
+- Workers claim up to OUTBOX_BATCH_SIZE due rows at a time with a conditional
+  UPDATE that stamps them with a claim token and a lease, so any number of
+  threads and processes can drain the table without sending a row twice.
+- A failed send is retried with exponential backoff (OUTBOX_BACKOFF_BASE
+  seconds doubling per attempt, capped at OUTBOX_BACKOFF_MAX, with jitter;
+  a 429's Retry-After is honoured) and marked ``failed`` after
+  OUTBOX_MAX_ATTEMPTS attempts.
+- A row whose worker died mid-send is claimed again once its lease
+  (OUTBOX_LEASE seconds) runs out, so mail survives worker restarts; delivery
+  is at-least-once.
+"""
+import atexit
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, event, or_, update
+
+from app import db
+from app.metrics import email_delivery_delay_seconds, email_send_duration_seconds, emails_total
+from app.metrics import registry as metrics_registry
+from app.models import EmailOutbox
+
+
+def backoff(attempts, base, cap):
+    """Jittered exponential backoff: about ``base * 2 ** (attempts - 1)`` seconds, at most `cap`."""
+    delay = min(cap, base * 2 ** max(0, attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_delay(error, attempts, base, cap):
+    """Backoff for a failed Brevo call; a 429 with Retry-After waits at least that long."""
+    delay = backoff(attempts, base, cap)
+    if getattr(error, 'status', None) == 429:
+        try:
+            delay = max(delay, float((getattr(error, 'headers', None) or {}).get('Retry-After')))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+class Outbox:
+
+    def __init__(self):
+        self.app = None
+        self.workers = 2
+        self.batch_size = 20
+        self.poll_interval = 5.0
+        self.max_attempts = 8
+        self.backoff_base = 30.0
+        self.backoff_max = 3600.0
+        self.lease = 300.0
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        cfg = app.config
+        self.workers = int(cfg.get('OUTBOX_WORKERS') if cfg.get('OUTBOX_WORKERS') is not None else 2)
+        self.batch_size = int(cfg.get('OUTBOX_BATCH_SIZE') or 20)
+        self.poll_interval = float(cfg.get('OUTBOX_POLL_INTERVAL') or 5.0)
+        self.max_attempts = int(cfg.get('OUTBOX_MAX_ATTEMPTS') or 8)
+        self.backoff_base = float(cfg.get('OUTBOX_BACKOFF_BASE') or 30.0)
+        self.backoff_max = float(cfg.get('OUTBOX_BACKOFF_MAX') or 3600.0)
+        self.lease = float(cfg.get('OUTBOX_LEASE') or 300.0)
+        atexit.register(self._stop.set)
+
+    # -- producing -----------------------------------------------------------
+
+    def enqueue(self, subject, recipients, text_body, html_body=None, sender=None):
+        """Add a message to the current session; it is sent once the caller commits."""
+        message = EmailOutbox(subject=subject, sender=sender, recipients=list(recipients), text_body=text_body,
+                              html_body=html_body, status='pending', attempts=0, next_attempt_at=datetime.utcnow())
+        db.session.add(message)
+        db.session.info['outbox_pending'] = True
+        return message
+
+    def wake(self):
+        """Start this process's workers if needed and have one look for due mail now."""
+        if self.workers <= 0:
+            return
+        self.start()
+        self._wake.set()
+
+    # -- consuming -----------------------------------------------------------
+
+    def start(self):
+        """Make sure this process runs its delivery threads (lazily, and again after a fork)."""
+        if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+                return
+            if self._pid != os.getpid():
+                self._threads = []
+            self._pid = os.getpid()
+            # a standalone `flask outbox-worker` serves no requests, so start the metrics flush here too
+            metrics_registry.start()
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f'outbox-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    handled = self.process_batch()
+            except Exception:
+                self.app.logger.exception('Outbox worker failed to process a batch')
+                handled = 0
+            if handled < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _due(self, now):
+        return or_(
+            and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+            and_(EmailOutbox.status == 'sending', EmailOutbox.locked_until < now),
+        )
+
+    def claim(self, limit=None):
+        """Claim up to `limit` due messages for this caller. Returns ``(token, rows)``."""
+        limit = limit or self.batch_size
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        try:
+            ids = [i for (i,) in db.session.query(EmailOutbox.id).filter(self._due(now))
+                   .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit)]
+            if not ids:
+                db.session.rollback()
+                return token, []
+            # re-checking the due condition makes the claim atomic: a row another worker took first no longer matches
+            db.session.execute(
+                update(EmailOutbox).where(EmailOutbox.id.in_(ids), self._due(now))
+                .values(status='sending', claimed_by=token, locked_until=now + timedelta(seconds=self.lease),
+                        attempts=EmailOutbox.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        rows = db.session.query(EmailOutbox).filter(EmailOutbox.claimed_by == token,
+                                                    EmailOutbox.status == 'sending').all()
+        # detach so later commits do not expire (and reload) them while sending
+        for row in rows:
+            db.session.expunge(row)
+        db.session.commit()
+        return token, rows
+
+    def backoff(self, attempts):
+        """Seconds to wait before attempt number ``attempts + 1``."""
+        return backoff(attempts, self.backoff_base, self.backoff_max)
+
+    def retry_delay(self, error, attempts):
+        return retry_delay(error, attempts, self.backoff_base, self.backoff_max)
+
+    def _finish(self, message, token, **values):
+        db.session.execute(
+            update(EmailOutbox).where(EmailOutbox.id == message.id, EmailOutbox.claimed_by == token)
+            .values(claimed_by=None, locked_until=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def process_batch(self):
+        """Claim and send one batch. Returns the number of messages handled."""
+        from app.email import deliver
+
+        token, messages = self.claim()
+        for message in messages:
+            started = time.perf_counter()
+            try:
+                deliver(self.app, message.subject, message.sender, message.recipients,
+                        message.text_body, message.html_body)
+            except Exception as e:
+                email_send_duration_seconds.observe(time.perf_counter() - started)
+                error = f'{type(e).__name__}: {e}'[:2000]
+                try:
+                    if message.attempts >= self.max_attempts:
+                        self.app.logger.error('Giving up on outbox message %s after %s attempts: %s',
+                                              message.id, message.attempts, error)
+                        self._finish(message, token, status='failed', last_error=error)
+                        emails_total.inc(result='failed')
+                    else:
+                        retry_at = datetime.utcnow() + timedelta(seconds=self.retry_delay(e, message.attempts))
+                        self.app.logger.warning('Outbox message %s failed (attempt %s), retrying at %s: %s',
+                                                message.id, message.attempts, retry_at, error)
+                        self._finish(message, token, status='pending', next_attempt_at=retry_at, last_error=error)
+                        emails_total.inc(result='retry')
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Failed to record outbox failure for message %s', message.id)
+                continue
+            email_send_duration_seconds.observe(time.perf_counter() - started)
+            emails_total.inc(result='sent')
+            if message.created_at:
+                email_delivery_delay_seconds.observe(max(0.0, (datetime.utcnow() - message.created_at).total_seconds()))
+            try:
+                self._finish(message, token, status='sent', sent_at=datetime.utcnow(), last_error=None)
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('Failed to mark outbox message %s as sent', message.id)
+        return len(messages)
+
+    def drain(self):
+        """Deliver everything that is due now, in the calling thread (scripts, tests)."""
+        total = 0
+        while True:
+            handled = self.process_batch()
+            total += handled
+            if handled < self.batch_size:
+                return total
+
+    def run_forever(self, workers):
+        """Foreground loop for ``flask outbox-worker``."""
+        self.workers = max(1, workers)
+        self.start()
+        try:
+            while any(t.is_alive() for t in self._threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self._stop.set()
+            self._wake.set()
+
+    def purge(self, days):
+        """Delete sent messages older than `days` days. Returns the number of rows removed."""
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        removed = EmailOutbox.query.filter(EmailOutbox.status == 'sent', EmailOutbox.sent_at < cutoff) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+
+
+outbox = Outbox()
+
+
+def _after_commit(session):
+    # a flag left over from a rolled-back transaction only costs one empty poll
+    if session.info.pop('outbox_pending', False):
+        outbox.wake()
+
+
+@click.command('outbox-worker')
+@with_appcontext
+@click.option('--workers', default=None, type=int, help='Delivery threads (default OUTBOX_WORKERS or 2).')
+@click.option('--once', is_flag=True, help='Send everything that is due, then exit.')
+def outbox_worker_command(workers, once):
+    """Deliver queued email from the outbox table."""
+    if once:
+        click.echo(f'Sent or retried {outbox.drain()} message(s).')
+        return
+    workers = workers if workers is not None else (outbox.workers or 2)
+    click.echo(f'Outbox worker running with {workers} thread(s); Ctrl+C to stop.')
+    outbox.run_forever(workers)
+
+
+@click.command('outbox-purge')
+@with_appcontext
+@click.option('--days', default=30, show_default=True, help='Keep sent messages this many days.')
+def outbox_purge_command(days):
+    """Delete old sent messages from the outbox table."""
+    click.echo(f'Removed {outbox.purge(days)} sent message(s).')
+
+
+def init_app(app):
+    outbox.init_app(app)
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'after_commit', _after_commit)
+    app.cli.add_command(outbox_worker_command)
+    app.cli.add_command(outbox_purge_command)
+
+    @app.before_request
+    def _start_outbox_workers():
+        # pick up mail left behind by a previous (recycled) worker without waiting for a new message
+        if outbox.workers > 0:
+            outbox.start()
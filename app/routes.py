@@ -2,23 +2,38 @@ import os
 import uuid
 from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, session, abort, Response
 from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, session, jsonify
-import csv
-import io
 from app import db
 from app.models import (
     Product, User, Order, ProductVisit, HomeSliderImage, OrderItem,
     OTPToken, BlogPost, BlogComment, BlogLike, BlogVisit, BkashNumber
 )
 from app.models import DeliveryFee
-from app.utils import render_markdown_safe, safe_admin_flash, generate_slug
+from app.utils import render_markdown_safe, safe_admin_flash, generate_slug, image_dimensions
 from app.forms import (
     LoginForm, ProductUploadForm, PaymentForm, RegistrationForm, CheckoutForm,
     ProfileForm, ChangePasswordForm, OTPForm, BlogPostForm, CommentForm
 )
 from app.email import send_email
+from app.visits import product_visits, blog_visits
+from app.cart import price_cart
+from app.cart_store import current_cart, attach_cart_to_user, detach_cart
+from app.cache import homepage_cache
+from app.user_cache import user_changed
+from app.bans import bans_changed
+from app.instrumentation import endpoint_stats
+from app.metrics import checkouts_total, metrics_response, record_cache, scrape_allowed
+from app.catalog import active_products_page, product_summary
+from app.exports import export_response
+from app.campaigns import campaign_runner, campaign_progress, queue_campaign, pause_campaign
+from app.dashboard import dashboard_data, dashboard_json, orders_page, payment_methods, ORDER_STATUSES
+from app.sales import record_order, record_status_change, record_order_deleted, cached_sales_series, BUCKETS, MAX_SERIES_DAYS
+from app.search import search_engine
+from app.images import image_pipeline
+from app.sitemap import index_response as sitemap_index_response, pages_response as sitemap_pages_response, section_response as sitemap_section_response, sitemap_changed
 from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from flask_login import login_user, logout_user, login_required, current_user
 from sqlalchemy.exc import OperationalError, IntegrityError
 from werkzeug.utils import secure_filename
@@ -61,8 +76,19 @@ def subscribe_newsletter():
 
 @main.route('/')
 def index():
-    # only show active products to customers
-    products = Product.query.filter_by(status='active').all()
+    # anonymous visitors without pending flash messages all see the same page,
+    # so serve it from the per-worker cache (invalidated by admin edits)
+    cacheable = not current_user.is_authenticated and not session.get('_flashes')
+    if cacheable:
+        cached = homepage_cache.get(request.url)
+        record_cache('homepage', cached is not None)
+        if cached is not None:
+            return cached
+    # only show active products to customers, one keyset page at a time
+    try:
+        products, next_cursor = active_products_page(request.args.get('after'))
+    except ValueError:
+        return redirect(url_for('main.index'))
     # load active slider images for the hero section (ordered by position)
     try:
         slider_images = HomeSliderImage.query.filter_by(active=True).order_by(HomeSliderImage.position.asc()).all()
@@ -73,7 +99,55 @@ def index():
         recent_posts = BlogPost.query.filter_by(status='published').order_by(BlogPost.created_at.desc()).limit(3).all()
     except Exception:
         recent_posts = []
-    return render_template('index.html', products=products, slider_images=slider_images, recent_posts=recent_posts)
+    html = render_template('index.html', products=products, next_cursor=next_cursor, slider_images=slider_images, recent_posts=recent_posts)
+    if cacheable:
+        homepage_cache.set(request.url, html)
+    return html
+
+
+@main.route('/api/products')
+def api_products():
+    """JSON listing of active products, newest first, paginated with the same cursor as the storefront.
+
+    Query args: `after` (cursor from a previous response) and `limit` (max 100).
+    """
+    try:
+        products, next_cursor = active_products_page(request.args.get('after'), request.args.get('limit'))
+    except ValueError:
+        return jsonify({'error': 'invalid cursor'}), 400
+    items = []
+    for p in products:
+        item = product_summary(p)
+        item['url'] = url_for('main.product_detail', product_id=p.id)
+        items.append(item)
+    return jsonify({'products': items, 'next_cursor': next_cursor})
+
+
+@main.route('/search')
+def search():
+    q = (request.args.get('q') or '').strip()
+    products = search_engine.products(q) if q else []
+    posts = search_engine.posts(q) if q else []
+    return render_template('search.html', q=q, products=products, posts=posts)
+
+
+@main.route('/api/search')
+def api_search():
+    """Ranked product and blog matches for `q` as JSON."""
+    q = (request.args.get('q') or '').strip()
+    products = [dict(product_summary(p), url=url_for('main.product_detail', product_id=p.id)) for p in search_engine.products(q, limit=20)] if q else []
+    posts = [{'id': p.id, 'title': p.title, 'url': url_for('main.blog_detail', slug=p.slug)} for p in search_engine.posts(q, limit=5)] if q else []
+    return jsonify({'q': q, 'products': products, 'posts': posts})
+
+
+@main.route('/api/search/suggest')
+def api_search_suggest():
+    """Title autocomplete: every typed word must match, the last one as a prefix."""
+    q = (request.args.get('q') or '').strip()
+    suggestions = []
+    for kind, doc_id, title in search_engine.suggest(q):
+        suggestions.append({'kind': kind, 'id': doc_id, 'title': title})
+    return jsonify({'q': q, 'suggestions': suggestions})
 
 
 @main.route('/register', methods=['GET', 'POST'])
@@ -95,14 +169,14 @@ def register():
 
         token = OTPToken(email=email, username=username, password_hash=password_hash, otp_code=otp_code, expires_at=expires)
         db.session.add(token)
-        db.session.commit()
 
-        # send OTP email
+        # queue the OTP email; it is committed together with the token
         subject = 'Your SoBuy signup code'
         text = render_template('email/otp.txt', otp=otp_code, expires=expires, username=username)
         html = render_template('email/otp.html', otp=otp_code, expires=expires, username=username)
         recipients = email
         send_email(subject, recipients, text, html)
+        db.session.commit()
 
         # save pending email in session so we can prefill verify form
         session['pending_signup_email'] = email
@@ -143,6 +217,7 @@ def verify_signup():
         db.session.commit()
 
         login_user(new_user)
+        attach_cart_to_user(new_user)
         session.pop('pending_signup_email', None)
         flash('Signup complete — you are now logged in.')
         return redirect(url_for('main.index'))
@@ -166,6 +241,7 @@ def login():
             except Exception:
                 pass
             login_user(user)
+            attach_cart_to_user(user)
             flash('You have been logged in successfully.')
             if user.is_admin:
                 return redirect(url_for('main.admin_dashboard'))
@@ -178,6 +254,7 @@ def login():
 @login_required
 def logout():
     logout_user()
+    detach_cart()
     flash('You have been logged out.')
     return redirect(url_for('main.index'))
 
@@ -188,53 +265,13 @@ def admin_dashboard():
     if not current_user.is_admin:
         flash('You do not have permission to access this page.')
         return redirect(url_for('main.index'))
-    # aggregate stats
-    total_products = Product.query.count()
-    total_orders = Order.query.count()
-    total_customers = User.query.filter_by(role='customer').count()
-
-    # recent orders (include username)
-    recent_raw = Order.query.order_by(Order.created_at.desc()).limit(10).all()
-    recent_orders = []
-    for o in recent_raw:
-        user = User.query.get(o.user_id)
-        recent_orders.append({
-            'id': o.id,
-            'username': user.username if user else 'Unknown',
-            'user_email': user.email if user else None,
-            'amount': o.total_amount,
-            'payment_method': o.payment_method,
-            'trx_id': getattr(o, 'trx_id', None),
-            'bkash_number': getattr(o, 'bkash_number', None),
-            'status': o.status,
-            'created_at': o.created_at
-        })
-
-    # top products by visits
-    top_visits = ProductVisit.query.order_by(ProductVisit.visit_count.desc()).limit(5).all()
-    top_products = []
-    for pv in top_visits:
-        p = Product.query.get(pv.product_id)
-        if p:
-            # count how many distinct orders included this product
-            try:
-                order_count = db.session.query(func.count(func.distinct(OrderItem.order_id))).filter(OrderItem.product_id == p.id).scalar() or 0
-            except Exception:
-                order_count = 0
-            top_products.append({'product': p, 'visits': pv.visit_count, 'order_count': int(order_count)})
-
-    # additional admin insights
     try:
-        revenue_total = db.session.query(func.coalesce(func.sum(Order.total_amount), 0.0)).scalar() or 0.0
-        revenue_last_30 = db.session.query(func.coalesce(func.sum(Order.total_amount), 0.0)).filter(Order.created_at >= (datetime.utcnow() - timedelta(days=30))).scalar() or 0.0
-        orders_by_status_raw = db.session.query(Order.status, func.count(Order.id)).group_by(Order.status).all()
-        orders_by_status = {status: count for status, count in orders_by_status_raw}
+        data = dashboard_data()
     except Exception:
-        revenue_total = 0.0
-        revenue_last_30 = 0.0
-        orders_by_status = {}
-
-    recent_signups = User.query.order_by(User.created_at.desc()).limit(10).all()
+        current_app.logger.exception('Failed to load dashboard data')
+        data = {'total_products': 0, 'total_orders': 0, 'total_customers': 0, 'recent_orders': [],
+                'top_products': [], 'revenue_total': 0.0, 'revenue_last_30': 0.0,
+                'orders_by_status': {}, 'recent_signups': []}
 
     # load homepage slider images for management UI
     try:
@@ -248,17 +285,68 @@ def admin_dashboard():
         active_bkash = None
 
     return render_template('admin_dashboard.html',
-                           total_products=total_products,
-                           total_orders=total_orders,
-                           total_customers=total_customers,
-                           recent_orders=recent_orders,
-                           top_products=top_products,
                            slider_images=slider_images,
                            active_bkash=active_bkash,
-                           revenue_total=revenue_total,
-                           revenue_last_30=revenue_last_30,
-                           orders_by_status=orders_by_status,
-                           recent_signups=recent_signups)
+                           **data)
+
+
+@main.route('/admin/api/sales-series')
+@login_required
+def admin_sales_series():
+    """Bucketed revenue/orders/AOV/discounts for admin charts.
+
+    Query args: start, end (YYYY-MM-DD, default: the last 30 days), bucket (day|week|month),
+    status (comma-separated, optional), payment_method (optional).
+    """
+    if not current_user.is_admin:
+        return jsonify({'error': 'forbidden'}), 403
+    today = datetime.utcnow().date()
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else today
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'dates must be YYYY-MM-DD'}), 400
+    bucket = request.args.get('bucket') or 'day'
+    if bucket not in BUCKETS:
+        return jsonify({'error': f'bucket must be one of {", ".join(BUCKETS)}'}), 400
+    if start > end or (end - start).days > MAX_SERIES_DAYS:
+        return jsonify({'error': f'range must be 0-{MAX_SERIES_DAYS} days'}), 400
+    statuses = [st.strip() for st in (request.args.get('status') or '').split(',') if st.strip()]
+    payment_method = request.args.get('payment_method') or None
+    try:
+        return jsonify(cached_sales_series(start, end, bucket, statuses, payment_method))
+    except Exception:
+        current_app.logger.exception('Failed to build sales series')
+        return jsonify({'error': 'server error'}), 500
+
+
+@main.route('/metrics')
+def metrics():
+    # Prometheus scrapes with a bearer token; admins can look at it in the browser
+    if not scrape_allowed():
+        return 'Forbidden', 403
+    return metrics_response()
+
+
+@main.route('/admin/api/request-stats')
+@login_required
+def admin_request_stats_api():
+    """Per-endpoint query counts and DB/render/total time for this worker since it started."""
+    if not current_user.is_admin:
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(endpoint_stats.snapshot())
+
+
+@main.route('/admin/api/dashboard')
+@login_required
+def admin_dashboard_api():
+    if not current_user.is_admin:
+        return jsonify({'error': 'forbidden'}), 403
+    try:
+        return jsonify(dashboard_json())
+    except Exception:
+        current_app.logger.exception('Failed to load dashboard data')
+        return jsonify({'error': 'server error'}), 500
 
 
 @main.route('/admin/delivery-fees', methods=['GET', 'POST'])
@@ -335,6 +423,8 @@ def admin_ban_user(user_id):
         flash('Cannot ban an admin user.')
         return redirect(url_for('main.admin_users'))
     user.is_banned = True
+    user_changed(user)
+    bans_changed()
     db.session.commit()
     safe_admin_flash(f'User {user.username} has been banned.', display=f'User {user.username} has been banned.')
     return redirect(url_for('main.admin_users'))
@@ -347,6 +437,8 @@ def admin_unban_user(user_id):
         return redirect(url_for('main.index'))
     user = User.query.get_or_404(user_id)
     user.is_banned = False
+    user_changed(user)
+    bans_changed()
     db.session.commit()
     safe_admin_flash(f'User {user.username} has been unbanned.', display=f'User {user.username} has been unbanned.')
     return redirect(url_for('main.admin_users'))
@@ -362,6 +454,8 @@ def admin_delete_user(user_id):
     if user.is_admin:
         flash('Cannot delete an admin user.')
         return redirect(url_for('main.admin_users'))
+    user_changed(user)
+    bans_changed()
     db.session.delete(user)
     db.session.commit()
     safe_admin_flash(f'User {user.username} has been deleted.', display=f'User {user.username} has been deleted.')
@@ -369,19 +463,49 @@ def admin_delete_user(user_id):
 
 
 
+def _order_filter_args():
+    """Parse the admin order filters from the query string.
+
+    Returns ``(filters, active_filters, dates)``: the form values, the non-empty
+    ones (for links) and the parsed ``from``/``to`` dates.
+    """
+    status = request.args.get('status') or None
+    if status not in ORDER_STATUSES:
+        status = None
+    payment_method = request.args.get('payment_method') or None
+    dates = {}
+    for arg in ('from', 'to'):
+        try:
+            dates[arg] = datetime.strptime(request.args[arg], '%Y-%m-%d').date() if request.args.get(arg) else None
+        except ValueError:
+            flash(f'Ignored invalid "{arg}" date; use YYYY-MM-DD.')
+            dates[arg] = None
+    filters = {'status': status, 'payment_method': payment_method,
+               'from': dates['from'].isoformat() if dates['from'] else None,
+               'to': dates['to'].isoformat() if dates['to'] else None}
+    active_filters = {k: v for k, v in filters.items() if v}
+    return filters, active_filters, dates
+
+
 @main.route('/admin/orders')
 @login_required
 def admin_orders():
     if not current_user.is_admin:
         flash('You do not have permission to access this page.')
         return redirect(url_for('main.index'))
+    filters, active_filters, dates = _order_filter_args()
+    status, payment_method = filters['status'], filters['payment_method']
     try:
-        orders = Order.query.order_by(Order.created_at.desc()).all()
+        orders, next_cursor = orders_page(status, payment_method, dates['from'], dates['to'], request.args.get('after'))
+        methods = payment_methods()
+    except ValueError:
+        return redirect(url_for('main.admin_orders', **active_filters))
     except Exception:
-        orders = []
-    # import User locally to avoid circular top-level hits in some environments
-    from app.models import User
-    return render_template('admin_orders.html', orders=orders, User=User)
+        current_app.logger.exception('Failed to load orders')
+        orders, next_cursor, methods = [], None, []
+    return render_template('admin_orders.html', orders=orders, next_cursor=next_cursor, filters=filters,
+                           active_filters=active_filters, statuses=ORDER_STATUSES, payment_methods=methods,
+                           is_first_page=not request.args.get('after'))
 
 
 @main.route('/admin/subscribers')
@@ -402,29 +526,106 @@ def admin_subscribers():
 @main.route('/admin/subscribers/export')
 @login_required
 def admin_subscribers_export():
+    return redirect(url_for('main.admin_export', name='subscribers', format=request.args.get('format', 'csv')))
+
+
+@main.route('/admin/export/<name>')
+@login_required
+def admin_export(name):
     if not current_user.is_admin:
         flash('You do not have permission to access this page.')
         return redirect(url_for('main.index'))
+    filters, _, dates = _order_filter_args()
     try:
-        from app.models import NewsletterSubscriber
-        subs = NewsletterSubscriber.query.order_by(NewsletterSubscriber.created_at.desc()).all()
-
-        si = io.StringIO()
-        writer = csv.writer(si)
-        writer.writerow(['id', 'email', 'created_at'])
-        for s in subs:
-            created = s.created_at.isoformat() if getattr(s, 'created_at', None) else ''
-            writer.writerow([s.id, s.email, created])
-
-        output = si.getvalue()
-        si.close()
-        return Response(output, mimetype='text/csv', headers={
-            'Content-Disposition': 'attachment; filename=newsletter_subscribers.csv'
+        response = export_response(name, request.args.get('format', 'csv'), {
+            'status': filters['status'], 'payment_method': filters['payment_method'],
+            'date_from': dates['from'], 'date_to': dates['to'],
         })
     except Exception:
-        current_app.logger.exception('Failed to export subscribers')
-        flash('Failed to export subscribers.')
-        return redirect(url_for('main.admin_subscribers'))
+        current_app.logger.exception('Failed to start export %s', name)
+        flash('Failed to export data.')
+        return redirect(url_for('main.admin_dashboard'))
+    if response is None:
+        abort(404)
+    return response
+
+
+# ====================== NEWSLETTER CAMPAIGNS ======================
+
+@main.route('/admin/campaigns', methods=['GET', 'POST'])
+@login_required
+def admin_campaigns():
+    """List newsletter campaigns and create new drafts."""
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page.')
+        return redirect(url_for('main.index'))
+
+    from app.forms import CampaignForm
+    from app.models import NewsletterCampaign, NewsletterSubscriber
+
+    form = CampaignForm()
+    if form.validate_on_submit():
+        try:
+            campaign = NewsletterCampaign(subject=form.subject.data.strip(), text_body=form.text_body.data,
+                                          html_body=form.html_body.data or None, status='draft')
+            db.session.add(campaign)
+            db.session.commit()
+            safe_admin_flash(f'Campaign #{campaign.id} saved as draft.', 'Campaign saved as draft.')
+            return redirect(url_for('main.admin_campaigns'))
+        except Exception:
+            current_app.logger.exception('Failed to create campaign')
+            db.session.rollback()
+            flash('Failed to save campaign.', 'danger')
+    elif request.method == 'POST':
+        for field, errors in form.errors.items():
+            for error in errors:
+                flash(f'{field}: {error}', 'danger')
+
+    try:
+        campaigns = NewsletterCampaign.query.order_by(NewsletterCampaign.id.desc()).limit(50).all()
+        total = db.session.query(func.count(NewsletterSubscriber.id)).scalar() or 0
+        # one indexed count per unfinished campaign; drafts and completed ones need none
+        progress = {c.id: campaign_progress(c, total) for c in campaigns if c.status in ('queued', 'sending', 'paused')}
+    except Exception:
+        current_app.logger.exception('Failed to load campaigns')
+        campaigns, total, progress = [], 0, {}
+    return render_template('admin_campaigns.html', form=form, campaigns=campaigns, progress=progress,
+                           subscriber_count=total)
+
+
+@main.route('/admin/campaigns/<int:campaign_id>/start', methods=['POST'])
+@login_required
+def admin_campaign_start(campaign_id):
+    if not current_user.is_admin:
+        return redirect(url_for('main.index'))
+    from app.models import NewsletterCampaign
+    campaign = NewsletterCampaign.query.get_or_404(campaign_id)
+    try:
+        queue_campaign(campaign)
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('main.admin_campaigns'))
+    db.session.commit()
+    campaign_runner.wake()
+    safe_admin_flash(f'Campaign #{campaign.id} queued for sending.', 'Campaign queued for sending.')
+    return redirect(url_for('main.admin_campaigns'))
+
+
+@main.route('/admin/campaigns/<int:campaign_id>/pause', methods=['POST'])
+@login_required
+def admin_campaign_pause(campaign_id):
+    if not current_user.is_admin:
+        return redirect(url_for('main.index'))
+    from app.models import NewsletterCampaign
+    campaign = NewsletterCampaign.query.get_or_404(campaign_id)
+    try:
+        pause_campaign(campaign)
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('main.admin_campaigns'))
+    db.session.commit()
+    safe_admin_flash(f'Campaign #{campaign.id} paused.', 'Campaign paused after the current batch.')
+    return redirect(url_for('main.admin_campaigns'))
 
 
 # ====================== COUPON MANAGEMENT ======================
@@ -586,44 +787,31 @@ def admin_coupon_toggle(coupon_id):
 
 @main.route('/sitemap.xml')
 def sitemap():
-    """Generate a sitemap including product detail and a few static pages."""
+    """Sitemap index pointing at the page, product and blog post sitemaps."""
     try:
-        pages = []
-        # static pages
-        pages.append(url_for('main.index', _external=True))
-        pages.append(url_for('main.blog_list', _external=True))
-        pages.append(url_for('main.cart', _external=True))
-        pages.append(url_for('main.login', _external=True))
-
-        # products
-        from app.models import Product
-        for p in Product.query.filter_by(status='active').all():
-            try:
-                pages.append(url_for('main.product_detail', product_id=p.id, _external=True))
-            except Exception:
-                continue
-
-        # blog posts
-        for post in BlogPost.query.filter_by(status='published').all():
-            try:
-                pages.append(url_for('main.blog_detail', slug=post.slug, _external=True))
-            except Exception:
-                continue
-
-        sitemap_xml = ['<?xml version="1.0" encoding="UTF-8"?>', '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
-        for page in pages:
-            sitemap_xml.append('<url>')
-            sitemap_xml.append(f'<loc>{page}</loc>')
-            sitemap_xml.append('</url>')
-        sitemap_xml.append('</urlset>')
-        response = make_response('\n'.join(sitemap_xml))
-        response.headers['Content-Type'] = 'application/xml'
-        return response
+        return sitemap_index_response()
     except Exception:
         current_app.logger.exception('Failed to generate sitemap')
         return redirect(url_for('main.index'))
 
 
+@main.route('/sitemap-pages.xml')
+def sitemap_pages():
+    return sitemap_pages_response()
+
+
+@main.route('/sitemap-<section>-<int:chunk>.xml')
+def sitemap_section(section, chunk):
+    try:
+        response = sitemap_section_response(section, chunk)
+    except Exception:
+        current_app.logger.exception('Failed to generate %s sitemap %s', section, chunk)
+        abort(500)
+    if response is None:
+        abort(404)
+    return response
+
+
 @main.route('/robots.txt')
 def robots_txt():
     lines = [
@@ -665,12 +853,9 @@ def update_order_status(order_id):
         return redirect(url_for('main.admin_dashboard'))
 
     order.status = new_status
-    db.session.commit()
-    # Record full detail in server logs and flash an admin-only message
-    safe_admin_flash(f'Order #{order.id} status updated from {old_status} to {new_status}.',
-                     display=f'Order #{order.id} status updated to {new_status}.')
+    record_status_change(order, old_status)
 
-    # send emails on specific transitions
+    # queue emails on specific transitions; they are committed with the status change
     try:
         user = User.query.get(order.user_id)
         if new_status == 'Shipped' and user and getattr(user, 'email', None):
@@ -682,7 +867,12 @@ def update_order_status(order_id):
             html = render_template('email/order_completed.html', order=order, user=user)
             send_email(f'Your SoBuy order #{order.id} is complete — thank you!', user.email, text, html)
     except Exception:
-        current_app.logger.exception('Failed to send order status change email')
+        current_app.logger.exception('Failed to queue order status change email')
+
+    db.session.commit()
+    # Record full detail in server logs and flash an admin-only message
+    safe_admin_flash(f'Order #{order.id} status updated from {old_status} to {new_status}.',
+                     display=f'Order #{order.id} status updated to {new_status}.')
 
     return redirect(url_for('main.admin_dashboard'))
 
@@ -700,7 +890,8 @@ def delete_order(order_id):
         # Delete associated order items first
         OrderItem.query.filter_by(order_id=order.id).delete()
         
-        # Delete the order
+        # Delete the order (and take it out of the sales rollup in the same transaction)
+        record_order_deleted(order)
         db.session.delete(order)
         db.session.commit()
         
@@ -748,6 +939,7 @@ def upload_slider_images():
         max_pos = 0
 
     added = []
+    added_rows = []
     for file in files:
         if file and getattr(file, 'filename', None):
             filename = secure_filename(file.filename)
@@ -759,6 +951,7 @@ def upload_slider_images():
             img = HomeSliderImage(image_url=url, position=max_pos, active=True)
             db.session.add(img)
             added.append(url)
+            added_rows.append(img)
 
     try:
         db.session.commit()
@@ -773,6 +966,8 @@ def upload_slider_images():
             flash('Failed to save slider images due to a database error. Please run `init_db.py` to create missing tables or check logs.')
             return redirect(url_for('main.admin_dashboard'))
 
+    homepage_cache.invalidate()
+    image_pipeline.process(added_rows)
     if added:
         flash(f'Uploaded {len(added)} slider image(s).')
     return redirect(url_for('main.admin_dashboard'))
@@ -798,11 +993,13 @@ def delete_slider_image(image_id):
         if common == os.path.abspath(upload_folder) and os.path.exists(filepath):
             os.remove(filepath)
             current_app.logger.info('Deleted slider image file from disk: %s', filepath)
+        image_pipeline.delete_files(img.derivatives)
     except Exception:
         current_app.logger.exception('Failed to delete slider file: %s', getattr(img, 'image_url', None))
 
     db.session.delete(img)
     db.session.commit()
+    homepage_cache.invalidate()
     flash('Slider image removed.')
     return redirect(url_for('main.admin_dashboard'))
 
@@ -898,6 +1095,7 @@ def upload_product():
 
         # collect files from request (support multiple)
         saved_urls = []
+        sizes = {}
         files = request.files.getlist('image')
         # fallback to single WTForms field if no list
         if not files or all(getattr(f, 'filename', '') == '' for f in files):
@@ -911,21 +1109,25 @@ def upload_product():
                 unique = f"{uuid.uuid4().hex}_{filename}"
                 filepath = os.path.join(upload_folder, unique)
                 file.save(filepath)
-                saved_urls.append(f"/static/uploads/{unique}")
-
-        image_urls_csv = ",".join(saved_urls) if saved_urls else None
+                url = f"/static/uploads/{unique}"
+                saved_urls.append(url)
+                sizes[url] = image_dimensions(filepath)
 
         new_product = Product(
             name=form.name.data,
             description=form.description.data,
             price=form.price.data,
-            image_url=image_urls_csv,
             colors=colors_csv,
             status=form.status.data if getattr(form, 'status', None) else 'active'
         )
+        new_product.set_image_urls(saved_urls, sizes)
 
         db.session.add(new_product)
+        sitemap_changed()
         db.session.commit()
+        homepage_cache.invalidate()
+        search_engine.index_product(new_product)
+        image_pipeline.process(new_product.images)
         flash('Product uploaded successfully.')
         return redirect(url_for('main.admin_dashboard'))
 
@@ -972,10 +1174,9 @@ def edit_product(product_id):
         upload_folder = current_app.config.get('UPLOAD_FOLDER') or os.path.join(current_app.static_folder, 'uploads')
         os.makedirs(upload_folder, exist_ok=True)
 
-        saved_urls = []
-        # Preserve existing images if no new images are uploaded
-        if product.image_url:
-            saved_urls.extend(product.image_url.split(','))
+        # Preserve existing images (in their current order) if no new images are uploaded
+        saved_urls = product.image_urls
+        sizes = {}
 
         # Handle image removals requested by the admin (checkboxes named 'remove_image')
         remove_list = request.form.getlist('remove_image') or []
@@ -1039,17 +1240,28 @@ def edit_product(product_id):
                 unique = f"{uuid.uuid4().hex}_{filename}"
                 filepath = os.path.join(upload_folder, unique)
                 file.save(filepath)
-                saved_urls.append(f"/static/uploads/{unique}")
+                url = f"/static/uploads/{unique}"
+                saved_urls.append(url)
+                sizes[url] = image_dimensions(filepath)
         
-        # Remove duplicates and update image_url
-        product.image_url = ",".join(list(set(saved_urls))) if saved_urls else None
+        # derivative files of removed images are deleted once the change is committed
+        removed_derivatives = [img.derivatives for img in product.images if img.url not in saved_urls]
+
+        # Remove duplicates (keeping order) and update the product's images
+        product.set_image_urls(saved_urls, sizes)
         # update status from the form
         try:
             product.status = form.status.data
         except Exception:
             pass
 
+        sitemap_changed()
         db.session.commit()
+        homepage_cache.invalidate()
+        search_engine.index_product(product)
+        for derivatives in removed_derivatives:
+            image_pipeline.delete_files(derivatives)
+        image_pipeline.process([img for img in product.images if img.url in sizes])
         flash('Product updated successfully.')
         return redirect(url_for('main.view_products'))
 
@@ -1086,22 +1298,15 @@ def product_detail(product_id):
         if not (current_user.is_authenticated and getattr(current_user, 'is_admin', False)):
             # don't reveal the existence of inactive products to customers
             abort(404)
-    # record product visit (create or increment)
+    # record product visit in the per-worker buffer (flushed to ProductVisit in batches)
     try:
-        pv = ProductVisit.query.filter_by(product_id=product.id).first()
-        if pv:
-            pv.visit_count = pv.visit_count + 1
-            pv.last_visited = db.func.current_timestamp()
-        else:
-            pv = ProductVisit(product_id=product.id, visit_count=1)
-            db.session.add(pv)
-        db.session.commit()
+        product_visits.increment(product.id)
     except Exception:
-        # avoid breaking product page on db errors
-        db.session.rollback()
+        # avoid breaking product page on counter errors
+        current_app.logger.exception('Failed to record product visit')
     # other recent active products (exclude current)
     try:
-        other_products = Product.query.filter(Product.id != product.id, Product.status == 'active').order_by(Product.created_at.desc()).limit(8).all()
+        other_products = Product.query.options(joinedload(Product.primary_image)).filter(Product.id != product.id, Product.status == 'active').order_by(Product.created_at.desc()).limit(8).all()
     except Exception:
         other_products = []
     return render_template('product_detail.html', product=product, other_products=other_products)
@@ -1127,18 +1332,11 @@ def blog_detail_redirect(post_id):
 @main.route('/blog/<slug>', methods=['GET', 'POST'])
 def blog_detail(slug):
     post = BlogPost.query.filter_by(slug=slug).first_or_404()
-    # increment visit count
+    # record visit in the per-worker buffer (flushed to BlogVisit in batches)
     try:
-        bv = BlogVisit.query.filter_by(post_id=post.id).first()
-        if bv:
-            bv.visit_count = bv.visit_count + 1
-            bv.last_visited = db.func.current_timestamp()
-        else:
-            bv = BlogVisit(post_id=post.id, visit_count=1)
-            db.session.add(bv)
-        db.session.commit()
+        blog_visits.increment(post.id)
     except Exception:
-        db.session.rollback()
+        current_app.logger.exception('Failed to record blog visit')
 
     # comments + like info
     raw_comments = BlogComment.query.filter_by(post_id=post.id).order_by(BlogComment.created_at.asc()).all()
@@ -1158,10 +1356,9 @@ def blog_detail(slug):
     if current_user.is_authenticated:
         user_liked = BlogLike.query.filter_by(post_id=post.id, user_id=current_user.id).first() is not None
 
-    # visit count (safe read)
+    # visit count served from the counter cache plus pending deltas
     try:
-        bv = BlogVisit.query.filter_by(post_id=post.id).first()
-        visit_count = bv.visit_count if bv else 0
+        visit_count = blog_visits.count(post.id)
     except Exception:
         visit_count = 0
 
@@ -1209,10 +1406,10 @@ def blog_detail(slug):
             if p and getattr(p, 'status', 'active') == 'active':
                 featured_products.append(p)
         if not featured_products:
-            featured_products = Product.query.filter_by(status='active').order_by(Product.created_at.desc()).limit(4).all()
+            featured_products = Product.query.options(joinedload(Product.primary_image)).filter_by(status='active').order_by(Product.created_at.desc()).limit(4).all()
     except Exception:
         try:
-            featured_products = Product.query.filter_by(status='active').order_by(Product.created_at.desc()).limit(4).all()
+            featured_products = Product.query.options(joinedload(Product.primary_image)).filter_by(status='active').order_by(Product.created_at.desc()).limit(4).all()
         except Exception:
             featured_products = []
 
@@ -1246,7 +1443,11 @@ def toggle_like(slug):
     else:
         like = BlogLike(post_id=post.id, user_id=current_user.id)
         db.session.add(like)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # a concurrent request (double click) already stored this like
+            db.session.rollback()
         flash('You liked the post.')
     return redirect(url_for('main.blog_detail', slug=post.slug))
 
@@ -1303,7 +1504,10 @@ def admin_create_blog():
         slug = generate_slug(form.title.data, BlogPost)
         post = BlogPost(title=form.title.data, slug=slug, body=form.body.data, image_url=image_url, author_id=current_user.id, status=form.status.data)
         db.session.add(post)
+        sitemap_changed()
         db.session.commit()
+        homepage_cache.invalidate()
+        search_engine.index_post(post)
         flash('Blog post created.')
         return redirect(url_for('main.admin_blogs'))
     return render_template('upload_blog.html', form=form)
@@ -1331,7 +1535,10 @@ def admin_edit_blog(post_id):
             filepath = os.path.join(upload_folder, unique)
             file.save(filepath)
             post.image_url = f"/static/uploads/{unique}"
+        sitemap_changed()
         db.session.commit()
+        homepage_cache.invalidate()
+        search_engine.index_post(post)
         flash('Blog post updated.')
         return redirect(url_for('main.admin_blogs'))
     return render_template('upload_blog.html', form=form, post=post)
@@ -1360,7 +1567,10 @@ def admin_delete_blog(post_id):
     except Exception:
         current_app.logger.exception('Failed to remove blog image file')
     db.session.delete(post)
+    sitemap_changed()
     db.session.commit()
+    homepage_cache.invalidate()
+    search_engine.remove_post(post_id)
     flash('Blog post deleted.')
     return redirect(url_for('main.admin_blogs'))
 
@@ -1429,9 +1639,7 @@ def add_to_cart(product_id):
     color_key = selected_color or ''
     cart_key = f"{product_id}:{color_key}"
 
-    cart = session.get('cart', {})
-    cart[cart_key] = cart.get(cart_key, 0) + quantity
-    session['cart'] = cart
+    current_cart().add(cart_key, quantity, user_id=current_user.id if current_user.is_authenticated else None)
 
     flash(f'"{product.name}" has been added to your cart.')
     return redirect(request.referrer or url_for('main.index'))
@@ -1439,35 +1647,10 @@ def add_to_cart(product_id):
 
 @main.route('/cart', methods=['GET', 'POST'])
 def cart():
-    cart = session.get('cart', {}) or {}
-    detailed_cart = []
-    total_amount = 0.0
-    for composite_key, quantity in cart.items():
-        try:
-            pid_str, color = composite_key.split(':', 1)
-            pid = int(pid_str)
-        except Exception:
-            continue
-        product = Product.query.get(pid)
-        if not product:
-            continue
-        item_total = product.price * quantity
-        total_amount += item_total
-
-        # images
-        images = []
-        if getattr(product, 'image_url', None):
-            images = [u.strip() for u in (product.image_url or "").split(',') if u.strip()]
-
-        detailed_cart.append({
-            'product_id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'quantity': quantity,
-            'total': item_total,
-            'color': color if color else None,
-            'image': images[0] if images else None
-        })
+    basket = current_cart()
+    priced = price_cart(basket.items)
+    detailed_cart = priced.lines
+    total_amount = priced.subtotal
 
     # load delivery fee options
     try:
@@ -1475,29 +1658,29 @@ def cart():
     except Exception:
         fees = []
 
-    # validate any delivery stored in session — if it doesn't match current fee keys, clear it
+    # validate any stored delivery — if it doesn't match current fee keys, clear it
     try:
-        sel = session.get('delivery')
+        sel = basket.delivery
         if sel and fees:
             valid_keys = {f.key for f in fees}
             if sel.get('key') not in valid_keys:
-                session.pop('delivery', None)
+                basket.delivery = None
                 sel = None
     except Exception:
-        # if session isn't available or unexpected data, quietly continue
-        sel = session.get('delivery')
+        # if the store isn't available or holds unexpected data, quietly continue
+        sel = None
 
     # clear any existing delivery on a plain GET so nothing is preselected by default
-    if request.method == 'GET':
-        session.pop('delivery', None)
+    if request.method == 'GET' and basket.delivery:
+        basket.delivery = None
 
     # handle POST when user selects a delivery option
     if request.method == 'POST':
         sel = (request.form.get('delivery_option') or '').strip()
-        coupon_data = session.get('coupon')
+        coupon_data = basket.coupon
         if not sel:
             flash('Please select a delivery option before proceeding to checkout.')
-            return render_template('cart.html', cart=detailed_cart, total_amount=total_amount, fees=fees, selected=session.get('delivery'), coupon=coupon_data)
+            return render_template('cart.html', cart=detailed_cart, total_amount=total_amount, fees=fees, selected=basket.delivery, coupon=coupon_data)
         # find fee row
         chosen = None
         for f in fees:
@@ -1506,19 +1689,19 @@ def cart():
                 break
         if not chosen:
             flash('Invalid delivery option selected.')
-            return render_template('cart.html', cart=detailed_cart, total_amount=total_amount, fees=fees, selected=session.get('delivery'), coupon=coupon_data)
-        session['delivery'] = {'key': chosen.key, 'label': chosen.label, 'amount': float(chosen.amount)}
+            return render_template('cart.html', cart=detailed_cart, total_amount=total_amount, fees=fees, selected=basket.delivery, coupon=coupon_data)
+        basket.delivery = {'key': chosen.key, 'label': chosen.label, 'amount': float(chosen.amount)}
         return redirect(url_for('main.checkout'))
 
-    # Get applied coupon from session
-    coupon_data = session.get('coupon')
+    # Get applied coupon from the cart
+    coupon_data = basket.coupon
 
-    return render_template('cart.html', cart=detailed_cart, total_amount=total_amount, fees=fees, selected=session.get('delivery'), coupon=coupon_data)
+    return render_template('cart.html', cart=detailed_cart, total_amount=total_amount, fees=fees, selected=basket.delivery, coupon=coupon_data)
 
 
 @main.route('/cart/set-delivery', methods=['POST'])
 def set_delivery_ajax():
-    """AJAX endpoint to set delivery option in session and return updated totals.
+    """AJAX endpoint to set the cart's delivery option and return updated totals.
     Expects JSON: { key: 'express_inside' }
     Returns JSON with delivery details and recalculated totals.
     """
@@ -1545,46 +1728,23 @@ def set_delivery_ajax():
     if not chosen:
         return jsonify({'success': False, 'error': 'Invalid delivery option.'}), 400
 
-    # persist in session
-    session['delivery'] = {'key': chosen.key, 'label': chosen.label, 'amount': float(chosen.amount)}
-
-    # recompute cart subtotal
-    cart = session.get('cart', {}) or {}
-    subtotal = 0.0
-    for composite_key, quantity in cart.items():
-        try:
-            pid_str, _ = composite_key.split(':', 1)
-            pid = int(pid_str)
-        except Exception:
-            continue
-        product = Product.query.get(pid)
-        if not product:
-            continue
-        subtotal += (product.price * quantity)
+    # persist in the server-side cart
+    basket = current_cart()
+    basket.delivery = {'key': chosen.key, 'label': chosen.label, 'amount': float(chosen.amount)}
 
-    delivery_amount = float(chosen.amount)
-    
-    # Get coupon discount from session if applied
-    coupon_data = session.get('coupon')
-    discount_amount = 0.0
-    if coupon_data:
-        discount_amount = float(coupon_data.get('discount_amount', 0.0))
-    
-    grand_total = subtotal - discount_amount + delivery_amount
+    # recompute cart totals with the new delivery fee and any applied coupon
+    priced = price_cart(basket.items, delivery=basket.delivery, coupon=basket.coupon)
 
     return jsonify({
         'success': True,
-        'delivery': {'key': chosen.key, 'label': chosen.label, 'amount': delivery_amount},
-        'subtotal': round(subtotal, 2),
-        'discount_amount': round(discount_amount, 2),
-        'delivery_amount': round(delivery_amount, 2),
-        'grand_total': round(grand_total, 2)
+        'delivery': {'key': chosen.key, 'label': chosen.label, 'amount': priced.delivery_amount},
+        **priced.totals()
     })
 
 
 @main.route('/cart/apply-coupon', methods=['POST'])
 def apply_coupon():
-    """Apply a coupon code to the current cart session."""
+    """Apply a coupon code to the current cart."""
     if not current_user.is_authenticated:
         return jsonify({'success': False, 'error': 'Please log in to use coupons.'}), 401
     
@@ -1625,18 +1785,8 @@ def apply_coupon():
             return jsonify({'success': False, 'error': 'You have already used this coupon the maximum number of times.'}), 400
     
     # Calculate discount
-    cart = session.get('cart', {}) or {}
-    subtotal = 0.0
-    for composite_key, quantity in cart.items():
-        try:
-            pid_str, _ = composite_key.split(':', 1)
-            pid = int(pid_str)
-        except Exception:
-            continue
-        product = Product.query.get(pid)
-        if not product:
-            continue
-        subtotal += (product.price * quantity)
+    basket = current_cart()
+    subtotal = price_cart(basket.items).subtotal
     
     if subtotal <= 0:
         return jsonify({'success': False, 'error': 'Your cart is empty.'}), 400
@@ -1649,8 +1799,8 @@ def apply_coupon():
     
     discount_amount = round(discount_amount, 2)
     
-    # Store coupon in session
-    session['coupon'] = {
+    # Store coupon on the cart
+    basket.coupon = {
         'id': coupon.id,
         'code': coupon.code,
         'discount_percent': coupon.discount_percent,
@@ -1658,8 +1808,7 @@ def apply_coupon():
     }
     
     # Recalculate totals
-    delivery = session.get('delivery', {})
-    delivery_amount = float(delivery.get('amount', 0.0)) if delivery else 0.0
+    delivery_amount = float((basket.delivery or {}).get('amount', 0.0))
     grand_total = subtotal - discount_amount + delivery_amount
     
     return jsonify({
@@ -1678,33 +1827,15 @@ def apply_coupon():
 
 @main.route('/cart/remove-coupon', methods=['POST'])
 def remove_coupon():
-    """Remove the applied coupon from session."""
-    session.pop('coupon', None)
+    """Remove the applied coupon from the cart."""
+    basket = current_cart()
+    basket.coupon = None
     
     # Recalculate totals
-    cart = session.get('cart', {}) or {}
-    subtotal = 0.0
-    for composite_key, quantity in cart.items():
-        try:
-            pid_str, _ = composite_key.split(':', 1)
-            pid = int(pid_str)
-        except Exception:
-            continue
-        product = Product.query.get(pid)
-        if not product:
-            continue
-        subtotal += (product.price * quantity)
+    totals = price_cart(basket.items, delivery=basket.delivery).totals()
+    totals.pop('discount_amount', None)
     
-    delivery = session.get('delivery', {})
-    delivery_amount = float(delivery.get('amount', 0.0)) if delivery else 0.0
-    grand_total = subtotal + delivery_amount
-    
-    return jsonify({
-        'success': True,
-        'subtotal': round(subtotal, 2),
-        'delivery_amount': round(delivery_amount, 2),
-        'grand_total': round(grand_total, 2)
-    })
+    return jsonify({'success': True, **totals})
 
 
 @main.route('/checkout', methods=['GET', 'POST'])
@@ -1725,47 +1856,23 @@ def checkout():
             # don't block checkout on prefill errors
             current_app.logger.exception('Failed to prefill checkout form from user profile')
 
-    # compute total amount from cart
-    cart = session.get('cart', {}) or {}
-    total_amount = 0.0
-    for composite_key, quantity in cart.items():
-        try:
-            pid_str, _ = composite_key.split(':', 1)
-            pid = int(pid_str)
-        except Exception:
-            continue
-        product = Product.query.get(pid)
-        if not product:
-            continue
-        total_amount += product.price * quantity
-
     # active receiving bKash number to show during checkout
     try:
         active_bkash = BkashNumber.query.filter_by(active=True).first()
     except Exception:
         active_bkash = None
 
-    # require delivery selection present in session when accessing checkout
-    delivery = session.get('delivery')
+    # require delivery selection present on the cart when accessing checkout
+    basket = current_cart()
+    delivery = basket.delivery
     if not delivery:
         flash('Please choose a delivery option from the cart before proceeding to checkout.')
         return redirect(url_for('main.cart'))
 
-    # Get coupon discount from session if applied
-    coupon_data = session.get('coupon')
-    discount_amount = 0.0
-    if coupon_data:
-        discount_amount = float(coupon_data.get('discount_amount', 0.0))
-    
-    # Subtract discount from total
-    total_amount -= discount_amount
-
-    # add delivery fee to total amount
-    try:
-        delivery_fee_amount = float(delivery.get('amount', 0.0))
-    except Exception:
-        delivery_fee_amount = 0.0
-    total_amount += delivery_fee_amount
+    # price the cart once (single product query): subtotal - coupon discount + delivery fee
+    coupon_data = basket.coupon
+    priced = price_cart(basket.items, delivery=delivery, coupon=coupon_data)
+    total_amount = priced.grand_total
 
     if form.validate_on_submit():
         # Prevent bKash orders when there is no active receiving number
@@ -1773,33 +1880,11 @@ def checkout():
         if pm == 'bkash' and not active_bkash:
             flash('bKash is currently unavailable. Please choose another payment method.')
             return render_template('checkout.html', form=form, total_amount=total_amount, active_bkash=active_bkash, delivery=delivery)
-        # build items summary from cart for email
-        cart_items = []
-        for composite_key, quantity in cart.items():
-            try:
-                pid_str, color = composite_key.split(':', 1)
-                pid = int(pid_str)
-            except Exception:
-                continue
-            product = Product.query.get(pid)
-            if not product:
-                continue
-            cart_items.append({
-                'product_id': product.id,
-                'name': product.name,
-                'price': product.price,
-                'quantity': quantity,
-                'color': color or None
-            })
-
-        # Get coupon discount from session if applied
-        coupon_data = session.get('coupon')
-        discount_amount = 0.0
-        coupon_id = None
-        
-        if coupon_data:
-            coupon_id = coupon_data.get('id')
-            discount_amount = coupon_data.get('discount_amount', 0.0)
+        # items summary for the order rows and email (already priced above)
+        cart_items = priced.lines
+
+        coupon_id = coupon_data.get('id') if coupon_data else None
+        discount_amount = priced.discount_amount
 
         # create order record
         order = Order(
@@ -1825,6 +1910,7 @@ def checkout():
                     updated = True
                 if updated:
                     db.session.add(current_user)
+                    user_changed(current_user)
         except Exception:
             current_app.logger.exception('Failed to save profile info from checkout')
         db.session.add(order)
@@ -1839,8 +1925,39 @@ def checkout():
         except Exception:
             current_app.logger.exception('Failed to create order items')
 
-        # commit order and items together
-        db.session.commit()
+        record_order(order)
+
+        # queue email notifications (customer + admins) in the order's transaction
+        try:
+            # prepare templates
+            text = render_template('email/order.txt', order=order, items=cart_items, user=current_user)
+            html = render_template('email/order.html', order=order, items=cart_items, user=current_user)
+
+            # send to customer
+            if getattr(current_user, 'email', None):
+                send_email(f'Your SoBuy order #{order.id}', current_user.email, text, html)
+
+            # send to admins
+            admins = current_app.config.get('ORDER_NOTIFICATION_RECIPIENTS')
+            if admins:
+                send_email(f'New order #{order.id}', admins, text, html)
+
+            # send to employees
+            employees = current_app.config.get('EMPLOYEE_RECIPIENTS')
+            if employees:
+                send_email(f'New order #{order.id}', employees, text, html)
+        except Exception:
+            # don't let email failures block checkout
+            current_app.logger.exception('Failed to queue order notification emails')
+
+        # commit order, items, the sales rollup and the notifications together
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            checkouts_total.inc(result='error')
+            raise
+        checkouts_total.inc(result='success')
 
         # Track coupon usage if a coupon was applied
         if coupon_id:
@@ -1864,37 +1981,17 @@ def checkout():
                 current_app.logger.exception('Failed to track coupon usage')
                 # Don't rollback the order - coupon tracking failure shouldn't break checkout
 
-        # send email notifications (customer + admins)
+        # clear cart (lines, delivery and coupon)
         try:
-            # prepare templates
-            text = render_template('email/order.txt', order=order, items=cart_items, user=current_user)
-            html = render_template('email/order.html', order=order, items=cart_items, user=current_user)
-
-            # send to customer
-            if getattr(current_user, 'email', None):
-                send_email(f'Your SoBuy order #{order.id}', current_user.email, text, html)
-
-            # send to admins
-            admins = current_app.config.get('ORDER_NOTIFICATION_RECIPIENTS')
-            if admins:
-                send_email(f'New order #{order.id}', admins, text, html)
-
-            # send to employees
-            employees = current_app.config.get('EMPLOYEE_RECIPIENTS')
-            if employees:
-                send_email(f'New order #{order.id}', employees, text, html)
+            basket.clear()
         except Exception:
-            # don't let email failures block checkout
-            current_app.logger.exception('Failed to send order notification emails')
-
-        # clear cart
-        session.pop('cart', None)
-        session.pop('delivery', None)
-        session.pop('coupon', None)
+            current_app.logger.exception('Failed to clear cart after checkout')
         flash('Order placed successfully!')
 
         return redirect(url_for('main.order_invoice', order_id=order.id))
 
+    if request.method == 'POST':
+        checkouts_total.inc(result='invalid')
     return render_template('checkout.html', form=form, total_amount=total_amount, active_bkash=active_bkash, delivery=delivery, coupon=coupon_data)
 
 
@@ -1964,6 +2061,7 @@ def profile():
         current_user.phone = form.phone.data
         current_user.address = form.address.data
         # don't allow changing username here for simplicity
+        user_changed(current_user)
         db.session.commit()
         flash('Profile updated successfully.')
         return redirect(url_for('main.profile'))
@@ -1982,6 +2080,7 @@ def change_password():
             flash('Current password is incorrect.')
             return redirect(url_for('main.change_password'))
         current_user.set_password(form.new_password.data)
+        user_changed(current_user)
         db.session.commit()
         flash('Password changed successfully.')
         return redirect(url_for('main.profile'))
@@ -1994,11 +2093,8 @@ def remove_from_cart():
     color = (request.form.get('color') or '').strip()
     if not product_id:
         return redirect(url_for('main.cart'))
-    cart = session.get('cart', {})
     key = f"{product_id}:{color}"
-    if key in cart:
-        del cart[key]
-        session['cart'] = cart
+    if current_cart().remove(key):
         flash('Item removed from cart.')
     return redirect(url_for('main.cart'))
 
@@ -2010,8 +2106,15 @@ def delete_product(product_id):
         flash('You do not have permission to delete products.')
         return redirect(url_for('main.index'))
     product = Product.query.get_or_404(product_id)
+    # derivative files are deleted once the change is committed
+    removed_derivatives = [img.derivatives for img in product.images]
     db.session.delete(product)
+    sitemap_changed()
     db.session.commit()
+    homepage_cache.invalidate()
+    search_engine.remove_product(product_id)
+    for derivatives in removed_derivatives:
+        image_pipeline.delete_files(derivatives)
     flash('Product deleted successfully.')
     return redirect(url_for('main.admin_dashboard'))
 
@@ -2054,9 +2157,10 @@ def admin_delete_image():
     if not product:
         return jsonify({'error': 'product not found'}), 404
 
-    saved = product.image_url.split(',') if product.image_url else []
+    saved = product.image_urls
     if image not in saved:
         return jsonify({'error': 'image not associated with product'}), 400
+    removed_derivatives = next((img.derivatives for img in product.images if img.url == image), None)
 
     # remove reference
     try:
@@ -2082,6 +2186,8 @@ def admin_delete_image():
     except Exception:
         current_app.logger.exception('Error deleting image file via AJAX: %s', image)
 
-    product.image_url = ",".join(saved) if saved else None
+    product.set_image_urls(saved)
     db.session.commit()
+    homepage_cache.invalidate()
+    image_pipeline.delete_files(removed_derivatives)
     return jsonify({'ok': True, 'images': saved})
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""Daily sales rollup.
+
+`DailySales` holds one row per (UTC day, payment method, status) with the
+number of orders, their summed ``total_amount`` and the coupon discounts
+given. The order routes call `record_order`, `record_status_change` and
+`record_order_deleted` before they commit, so the rollup moves in the same
+transaction as the order itself. Dashboard revenue, status counts and the
+admin sales charts then read O(days) rollup rows instead of scanning every
+order. `rebuild` recomputes the table from ``order``
+(see scripts/rebuild_sales_rollup.py).
+
+Chart series are memoised per worker in a small LRU. Every commit that
+touched the rollup bumps the ``sales`` version stamp, which empties the LRU
+in all workers.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, case, cast, event, func, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.cache import VersionStamp
+from app.metrics import record_cache
+from app.models import DailySales, Order
+
+
+BUCKETS = ('day', 'week', 'month')
+MAX_SERIES_DAYS = 3 * 366
+
+sales_version = VersionStamp('sales')
+
+
+def _order_day(order):
+    return (order.created_at or datetime.utcnow()).date()
+
+
+def _bump(day, payment_method, status, count, amount, discount):
+    """Add `count` orders / `amount` revenue / `discount` to one rollup row, creating it if needed."""
+    table = DailySales.__table__
+    match = (table.c.day == day, table.c.payment_method == payment_method, table.c.status == status)
+    increment = update(table).where(*match).values(order_count=table.c.order_count + count,
+                                                   revenue=table.c.revenue + amount,
+                                                   discount=table.c.discount + discount)
+    db.session.info['sales_changed'] = True
+    if db.session.execute(increment).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(day=day, payment_method=payment_method, status=status,
+                                                     order_count=count, revenue=amount, discount=discount))
+    except IntegrityError:
+        # another worker created the row between our UPDATE and INSERT
+        db.session.execute(increment)
+
+
+def _amounts(order):
+    return order.total_amount or 0.0, order.discount_amount or 0.0
+
+
+def record_order(order):
+    """Count a new order. Call after flush, before commit."""
+    amount, discount = _amounts(order)
+    _bump(_order_day(order), order.payment_method, order.status or 'Pending', 1, amount, discount)
+
+
+def record_status_change(order, old_status):
+    """Move an order between status buckets. Call before commit."""
+    if old_status == order.status:
+        return
+    day = _order_day(order)
+    amount, discount = _amounts(order)
+    _bump(day, order.payment_method, old_status, -1, -amount, -discount)
+    _bump(day, order.payment_method, order.status, 1, amount, discount)
+
+
+def record_order_deleted(order):
+    """Uncount an order that is being deleted. Call before commit."""
+    amount, discount = _amounts(order)
+    _bump(_order_day(order), order.payment_method, order.status, -1, -amount, -discount)
+
+
+def sales_summary(days=30):
+    """Order count, revenue (all time and the last `days` days) and counts per status."""
+    cutoff = datetime.utcnow().date() - timedelta(days=days - 1)
+    recent = case((DailySales.day >= cutoff, DailySales.revenue), else_=0.0)
+    rows = db.session.query(
+        DailySales.status,
+        func.coalesce(func.sum(DailySales.order_count), 0),
+        func.coalesce(func.sum(DailySales.revenue), 0.0),
+        func.coalesce(func.sum(recent), 0.0),
+    ).group_by(DailySales.status).all()
+    return {
+        'total_orders': int(sum(count for _, count, _, _ in rows)),
+        'revenue_total': float(sum(total for _, _, total, _ in rows)),
+        'revenue_last_30': float(sum(last for _, _, _, last in rows)),
+        'orders_by_status': {status: int(count) for status, count, _, _ in rows if count},
+    }
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def _as_date(value):
+    return date.fromisoformat(value[:10]) if isinstance(value, str) else value
+
+
+def sales_series(start, end, bucket='day', statuses=None, payment_method=None):
+    """Revenue, order count, average order value and discounts per bucket between `start` and `end` (inclusive).
+
+    Buckets with no orders are included with zeros so charts get a continuous axis.
+    """
+    query = db.session.query(
+        DailySales.day,
+        func.sum(DailySales.order_count),
+        func.sum(DailySales.revenue),
+        func.sum(DailySales.discount),
+    ).filter(DailySales.day >= start, DailySales.day <= end)
+    if statuses:
+        query = query.filter(DailySales.status.in_(statuses))
+    if payment_method:
+        query = query.filter(DailySales.payment_method == payment_method)
+    buckets = OrderedDict()
+    cursor = bucket_start(start, bucket)
+    while cursor <= end:
+        buckets[cursor] = [0, 0.0, 0.0]
+        cursor = _next_bucket(cursor, bucket)
+    for day, orders, revenue, discount in query.group_by(DailySales.day).all():
+        totals = buckets[bucket_start(_as_date(day), bucket)]
+        totals[0] += int(orders or 0)
+        totals[1] += float(revenue or 0.0)
+        totals[2] += float(discount or 0.0)
+
+    def point(orders, revenue, discount):
+        return {
+            'orders': orders,
+            'revenue': round(revenue, 2),
+            'avg_order_value': round(revenue / orders, 2) if orders else 0.0,
+            'discount': round(discount, 2),
+        }
+
+    series = [dict(start=key.isoformat(), **point(*values)) for key, values in buckets.items()]
+    return {
+        'bucket': bucket,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': series,
+        'totals': point(sum(v[0] for v in buckets.values()),
+                        sum(v[1] for v in buckets.values()),
+                        sum(v[2] for v in buckets.values())),
+    }
+
+
+class SeriesCache:
+    """Per-worker LRU of computed series, emptied whenever the `sales` stamp changes."""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        version = sales_version.current()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                record_cache('sales_series', True)
+                return self._entries[key]
+        record_cache('sales_series', False)
+        value = compute()
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+
+series_cache = SeriesCache()
+
+
+def cached_sales_series(start, end, bucket='day', statuses=None, payment_method=None):
+    key = (start, end, bucket, tuple(sorted(statuses or ())), payment_method)
+    return series_cache.get_or_compute(key, lambda: sales_series(start, end, bucket, statuses, payment_method))
+
+
+def _day_expression():
+    if db.engine.dialect.name == 'sqlite':
+        return func.date(Order.created_at)
+    return cast(Order.created_at, Date)
+
+
+def rebuild():
+    """Recompute every rollup row from the order table. Returns the number of rows written."""
+    day = _day_expression()
+    grouped = db.session.query(
+        day, Order.payment_method, Order.status, func.count(Order.id),
+        func.coalesce(func.sum(Order.total_amount), 0.0), func.coalesce(func.sum(Order.discount_amount), 0.0),
+    ).group_by(day, Order.payment_method, Order.status).all()
+
+    totals = {}
+    today = datetime.utcnow().date()
+    for raw_day, payment_method, status, count, revenue, discount in grouped:
+        key = (_as_date(raw_day) if raw_day is not None else today, payment_method, status)
+        prev = totals.get(key, (0, 0.0, 0.0))
+        totals[key] = (prev[0] + count, prev[1] + float(revenue), prev[2] + float(discount))
+
+    DailySales.query.delete()
+    db.session.add_all(DailySales(day=d, payment_method=pm, status=st, order_count=n, revenue=rev, discount=disc)
+                       for (d, pm, st), (n, rev, disc) in totals.items())
+    db.session.info['sales_changed'] = True
+    db.session.commit()
+    return len(totals)
+
+
+def _after_commit(session):
+    # a flag left over from a rolled-back transaction only costs one extra cache refill
+    if session.info.pop('sales_changed', False):
+        sales_version.bump()
+
+
+def init_app(app):
+    sales_version.init_app(app)
+    series_cache.max_entries = int(app.config.get('SALES_SERIES_CACHE_SIZE') or 128)
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'after_commit', _after_commit)
@@ -0,0 +1,383 @@
+"""Product and blog full-text search.
+
+Two interchangeable backends sit behind `search_engine`:
+
+- `Fts5Index` (SQLite): an FTS5 virtual table ``search_index`` with columns
+  title/body/extra. The rowid encodes the document (``id * 2`` for products,
+  ``id * 2 + 1`` for blog posts) so updates and deletes are rowid lookups.
+  Ranking uses bm25 with the title weighted highest.
+- `MemoryIndex` (any other database, or SEARCH_BACKEND=memory): a per-worker
+  inverted index built from column-only queries. Writes bump a shared version
+  stamp so other workers rebuild their copy on their next query.
+
+Only active products and published posts are indexed. The admin routes call
+`index_product` / `index_post` after create/edit and `remove_product` /
+`remove_post` after delete. `rebuild()` (scripts/rebuild_search_index.py)
+re-indexes everything.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload
+
+from app.cache import VersionStamp
+
+
+PRODUCT = 'product'
+POST = 'post'
+_KIND_BIT = {PRODUCT: 0, POST: 1}
+
+_word_re = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(value):
+    """Lowercase, strip accents and split into word tokens."""
+    value = unicodedata.normalize('NFKD', (value or '').lower())
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return _word_re.findall(value)
+
+
+def _product_doc(product):
+    return {
+        'title': product.name or '',
+        'body': product.description or '',
+        'extra': (product.colors or '').replace(',', ' '),
+    }
+
+
+def _post_doc(post):
+    return {'title': post.title or '', 'body': post.body or '', 'extra': ''}
+
+
+def _indexable_product(product):
+    return getattr(product, 'status', 'active') == 'active'
+
+
+def _indexable_post(post):
+    return getattr(post, 'status', 'published') == 'published'
+
+
+def _iter_documents():
+    """Yield ``(kind, id, doc)`` for everything that should be searchable (column-only queries)."""
+    from app import db
+    from app.models import Product, BlogPost
+    rows = db.session.query(Product.id, Product.name, Product.description, Product.colors) \
+        .filter(Product.status == 'active').yield_per(1000)
+    for pid, name, description, colors in rows:
+        yield PRODUCT, pid, {'title': name or '', 'body': description or '', 'extra': (colors or '').replace(',', ' ')}
+    rows = db.session.query(BlogPost.id, BlogPost.title, BlogPost.body) \
+        .filter(BlogPost.status == 'published').yield_per(1000)
+    for post_id, title, body in rows:
+        yield POST, post_id, {'title': title or '', 'body': body or '', 'extra': ''}
+
+
+class Fts5Index:
+    """SQLite FTS5 backend."""
+
+    TABLE = 'search_index'
+
+    def __init__(self):
+        self._ready = False
+
+    @staticmethod
+    def available(engine):
+        if engine.dialect.name != 'sqlite':
+            return False
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_probe USING fts5(x)'))
+                conn.execute(text('DROP TABLE IF EXISTS temp._fts5_probe'))
+            return True
+        except Exception:
+            return False
+
+    def _ensure(self):
+        if self._ready:
+            return
+        from app import db
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': self.TABLE}
+        ).first()
+        if not exists:
+            db.session.execute(text(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.TABLE} USING fts5('
+                'title, body, extra, tokenize="unicode61 remove_diacritics 2", prefix="2 3")'
+            ))
+            db.session.commit()
+            self._ready = True
+            self.rebuild()
+        self._ready = True
+
+    @staticmethod
+    def _rowid(kind, doc_id):
+        return int(doc_id) * 2 + _KIND_BIT[kind]
+
+    @staticmethod
+    def _match(tokens, prefix_last=True, title_only=False):
+        parts = [f'"{t}"' for t in tokens]
+        if prefix_last:
+            parts[-1] += '*'
+        expr = ' '.join(parts)
+        return f'{{title}} : ({expr})' if title_only else expr
+
+    def upsert(self, kind, doc_id, doc):
+        from app import db
+        self._ensure()
+        db.session.execute(
+            text(f'INSERT OR REPLACE INTO {self.TABLE}(rowid, title, body, extra) VALUES (:rowid, :title, :body, :extra)'),
+            {'rowid': self._rowid(kind, doc_id), **doc},
+        )
+        db.session.commit()
+
+    def remove(self, kind, doc_id):
+        from app import db
+        self._ensure()
+        db.session.execute(text(f'DELETE FROM {self.TABLE} WHERE rowid = :rowid'), {'rowid': self._rowid(kind, doc_id)})
+        db.session.commit()
+
+    def rebuild(self):
+        from app import db
+        self._ensure()
+        db.session.execute(text(f'DELETE FROM {self.TABLE}'))
+        batch = []
+        for kind, doc_id, doc in _iter_documents():
+            batch.append({'rowid': self._rowid(kind, doc_id), **doc})
+            if len(batch) >= 1000:
+                db.session.execute(text(f'INSERT INTO {self.TABLE}(rowid, title, body, extra) VALUES (:rowid, :title, :body, :extra)'), batch)
+                batch = []
+        if batch:
+            db.session.execute(text(f'INSERT INTO {self.TABLE}(rowid, title, body, extra) VALUES (:rowid, :title, :body, :extra)'), batch)
+        db.session.commit()
+
+    def search(self, tokens, kind=None, limit=20, title_only=False):
+        from app import db
+        self._ensure()
+        sql = f'SELECT rowid, title FROM {self.TABLE} WHERE {self.TABLE} MATCH :match'
+        if kind is not None:
+            sql += f' AND rowid % 2 = {_KIND_BIT[kind]}'
+        sql += f' ORDER BY bm25({self.TABLE}, 10.0, 1.0, 3.0) LIMIT :limit'
+        rows = db.session.execute(text(sql), {'match': self._match(tokens, title_only=title_only), 'limit': limit}).all()
+        return [(POST if rowid % 2 else PRODUCT, rowid // 2, title) for rowid, title in rows]
+
+
+class MemoryIndex:
+    """Per-worker inverted index used when FTS5 is not available."""
+
+    FIELD_WEIGHTS = {'title': 10.0, 'body': 1.0, 'extra': 3.0}
+
+    def __init__(self):
+        self.stamp = VersionStamp('search')
+        self._lock = threading.RLock()
+        self._postings = {}     # term -> {doc_key: weighted term frequency}
+        self._title_terms = {}  # term -> set(doc_key) for title-only (autocomplete) lookups
+        self._doc_terms = {}    # doc_key -> set(term), used to unindex a document
+        self._titles = {}       # doc_key -> title
+        self._vocab = []        # sorted terms, rebuilt lazily for prefix expansion
+        self._vocab_dirty = True
+        self._version = object()
+
+    def init_app(self, app):
+        self.stamp.init_app(app)
+
+    def _ensure(self):
+        version = self.stamp.current()
+        if version != self._version:
+            self._load()
+            self._version = version
+
+    def _clear(self):
+        self._postings.clear()
+        self._title_terms.clear()
+        self._doc_terms.clear()
+        self._titles.clear()
+        self._vocab_dirty = True
+
+    def _load(self):
+        with self._lock:
+            self._clear()
+            for kind, doc_id, doc in _iter_documents():
+                self._add((kind, doc_id), doc)
+
+    def _add(self, key, doc):
+        terms = set()
+        for field, weight in self.FIELD_WEIGHTS.items():
+            for term in tokenize(doc.get(field)):
+                postings = self._postings.setdefault(term, {})
+                postings[key] = postings.get(key, 0.0) + weight
+                terms.add(term)
+                if field == 'title':
+                    self._title_terms.setdefault(term, set()).add(key)
+        self._doc_terms[key] = terms
+        self._titles[key] = doc.get('title') or ''
+        self._vocab_dirty = True
+
+    def _discard(self, key):
+        for term in self._doc_terms.pop(key, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+            titles = self._title_terms.get(term)
+            if titles is not None:
+                titles.discard(key)
+                if not titles:
+                    del self._title_terms[term]
+        self._titles.pop(key, None)
+        self._vocab_dirty = True
+
+    def upsert(self, kind, doc_id, doc):
+        with self._lock:
+            self._ensure()
+            self._discard((kind, doc_id))
+            self._add((kind, doc_id), doc)
+            self.stamp.bump()
+            self._version = self.stamp.current()
+
+    def remove(self, kind, doc_id):
+        with self._lock:
+            self._ensure()
+            self._discard((kind, doc_id))
+            self.stamp.bump()
+            self._version = self.stamp.current()
+
+    def rebuild(self):
+        with self._lock:
+            self._load()
+            self.stamp.bump()
+            self._version = self.stamp.current()
+
+    def _expand(self, term):
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        start = bisect.bisect_left(self._vocab, term)
+        end = bisect.bisect_left(self._vocab, term + '\uffff')
+        return self._vocab[start:end]
+
+    def search(self, tokens, kind=None, limit=20, title_only=False):
+        with self._lock:
+            self._ensure()
+            total = max(len(self._doc_terms), 1)
+            scores = None
+            for i, token in enumerate(tokens):
+                terms = self._expand(token) if i == len(tokens) - 1 else [token]
+                matched = {}
+                for term in terms:
+                    postings = self._postings.get(term, {})
+                    if title_only:
+                        postings = {k: postings[k] for k in self._title_terms.get(term, ()) if k in postings}
+                    idf = math.log(1.0 + total / (len(postings) or 1))
+                    for key, tf in postings.items():
+                        matched[key] = matched.get(key, 0.0) + idf * tf / (tf + 1.2)
+                # every token must match (AND semantics, like FTS5)
+                if scores is None:
+                    scores = matched
+                else:
+                    scores = {key: scores[key] + val for key, val in matched.items() if key in scores}
+                if not scores:
+                    return []
+            ranked = heapq.nsmallest(
+                limit,
+                ((score, key) for key, score in scores.items() if kind is None or key[0] == kind),
+                key=lambda item: (-item[0], item[1][1]),
+            )
+            return [(key[0], key[1], self._titles.get(key, '')) for _, key in ranked]
+
+
+class SearchEngine:
+    """Facade the routes talk to; picks FTS5 on SQLite, the in-memory index otherwise."""
+
+    def __init__(self):
+        self.backend = None
+        self._memory = MemoryIndex()
+
+    def init_app(self, app):
+        self._memory.init_app(app)
+        self.backend = None
+
+    def _get_backend(self):
+        if self.backend is None:
+            from app import db
+            choice = (current_app.config.get('SEARCH_BACKEND') or 'auto').lower()
+            if choice != 'memory' and Fts5Index.available(db.engine):
+                self.backend = Fts5Index()
+            else:
+                self.backend = self._memory
+        return self.backend
+
+    def _safely(self, action, *args):
+        from app import db
+        try:
+            return action(*args)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Search index operation failed')
+            return None
+
+    def index_product(self, product):
+        if _indexable_product(product):
+            self._safely(self._get_backend().upsert, PRODUCT, product.id, _product_doc(product))
+        else:
+            self.remove_product(product.id)
+
+    def index_post(self, post):
+        if _indexable_post(post):
+            self._safely(self._get_backend().upsert, POST, post.id, _post_doc(post))
+        else:
+            self.remove_post(post.id)
+
+    def remove_product(self, product_id):
+        self._safely(self._get_backend().remove, PRODUCT, product_id)
+
+    def remove_post(self, post_id):
+        self._safely(self._get_backend().remove, POST, post_id)
+
+    def rebuild(self):
+        self._get_backend().rebuild()
+
+    def search(self, query, kind=None, limit=20):
+        """Ranked ``(kind, id, title)`` tuples; the last word is matched as a prefix."""
+        tokens = tokenize(query)[:8]
+        if not tokens:
+            return []
+        return self._safely(self._get_backend().search, tokens, kind, limit) or []
+
+    def suggest(self, query, limit=8):
+        """Title autocomplete: ``(kind, id, title)`` tuples whose title matches every typed word."""
+        tokens = tokenize(query)[:8]
+        if not tokens:
+            return []
+        return self._safely(self._get_backend().search, tokens, None, limit, True) or []
+
+    def products(self, query, limit=40):
+        """Active `Product` objects matching `query`, best match first."""
+        from app.models import Product
+        ids = [doc_id for _, doc_id, _ in self.search(query, PRODUCT, limit)]
+        if not ids:
+            return []
+        found = {p.id: p for p in Product.query.options(joinedload(Product.primary_image))
+                 .filter(Product.id.in_(ids), Product.status == 'active').all()}
+        return [found[i] for i in ids if i in found]
+
+    def posts(self, query, limit=10):
+        """Published `BlogPost` objects matching `query`, best match first."""
+        from app.models import BlogPost
+        ids = [doc_id for _, doc_id, _ in self.search(query, POST, limit)]
+        if not ids:
+            return []
+        found = {p.id: p for p in BlogPost.query.filter(BlogPost.id.in_(ids), BlogPost.status == 'published').all()}
+        return [found[i] for i in ids if i in found]
+
+
+search_engine = SearchEngine()
+
+
+def init_app(app):
+    search_engine.init_app(app)
@@ -0,0 +1,179 @@
+"""Streamed, cached sitemaps.
+
+``/sitemap.xml`` is a sitemap index pointing at:
+
+- ``/sitemap-pages.xml``: the static pages
+- ``/sitemap-products-<n>.xml``: active products with ids in
+  ``[n * URLS_PER_SITEMAP, (n + 1) * URLS_PER_SITEMAP)``
+- ``/sitemap-posts-<n>.xml``: published blog posts, sliced the same way
+
+Slicing by id range keeps every child under the 50,000-URL protocol limit and
+turns each query into a primary-key range scan. Children are streamed from
+column-only queries (id/slug and timestamps, no ORM objects) and the rendered
+XML is kept in a per-worker `PageCache` (app/cache.py) under the ``sitemap``
+version stamp, so a cached hit runs no query at all. Routes that create,
+edit or delete products or blog posts call `sitemap_changed()`; the stamp is
+bumped after their commit and every worker rebuilds on its next hit. The
+grouped listing of non-empty slices behind the index only runs on a miss;
+PAGE_CACHE_TTL bounds staleness after writes made outside the routes.
+"""
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from flask import Response, request, stream_with_context, url_for
+from sqlalchemy import event, func
+
+from app import db
+from app.cache import PageCache
+from app.models import Product, BlogPost
+
+
+URLS_PER_SITEMAP = 50000
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+sitemap_cache = PageCache('sitemap', max_entries=256)
+
+
+def _lastmod(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00') if value else None
+
+
+def _url(loc, lastmod=None):
+    if lastmod:
+        return f'<url><loc>{escape(loc)}</loc><lastmod>{lastmod}</lastmod></url>\n'
+    return f'<url><loc>{escape(loc)}</loc></url>\n'
+
+
+class _Section:
+    """One kind of sitemap child: which rows it lists and how to build their URLs."""
+
+    def __init__(self, name, model, visible, key_column):
+        self.name = name
+        self.model = model
+        self.visible = visible
+        self.key_column = key_column
+
+    @property
+    def modified(self):
+        return func.coalesce(self.model.updated_at, self.model.created_at)
+
+    def _filter(self, query, chunk=None):
+        query = query.filter(*self.visible())
+        if chunk is not None:
+            query = query.filter(self.model.id >= chunk * URLS_PER_SITEMAP,
+                                 self.model.id < (chunk + 1) * URLS_PER_SITEMAP)
+        return query
+
+    def chunks(self):
+        """``[(chunk, count, newest), ...]`` for every non-empty slice, one primary-key range query per slice."""
+        top = db.session.query(func.max(self.model.id)).scalar()
+        if top is None:
+            return []
+        listing = []
+        for chunk in range(top // URLS_PER_SITEMAP + 1):
+            count, newest = self._filter(db.session.query(func.count(self.model.id), func.max(self.modified)),
+                                         chunk).one()
+            if count:
+                listing.append((chunk, count, newest))
+        return listing
+
+    def rows(self, chunk):
+        query = self._filter(db.session.query(self.key_column, self.modified), chunk).order_by(self.model.id)
+        return query.yield_per(1000)
+
+
+SECTIONS = {
+    'products': _Section('products', Product, lambda: (Product.status == 'active',), Product.id),
+    'posts': _Section('posts', BlogPost,
+                      lambda: (BlogPost.status == 'published', BlogPost.slug.isnot(None), BlogPost.slug != ''),
+                      BlogPost.slug),
+}
+
+
+def _location_prefix(section):
+    if section.name == 'products':
+        return url_for('main.product_detail', product_id=0, _external=True)[:-1]
+    return url_for('main.blog_detail', slug='x', _external=True)[:-1]
+
+
+def _cached_response(name, generate):
+    """Serve `name` from the cache, or stream `generate()` while filling the cache."""
+    # bodies hold absolute URLs, so keep one copy per host name
+    name = f'{request.host}/{name}'
+    body = sitemap_cache.get(name)
+    if body is not None:
+        return Response(body, mimetype='application/xml')
+    version = sitemap_cache.stamp.current()
+
+    def stream():
+        parts = []
+        for part in generate():
+            parts.append(part)
+            yield part
+        # a change committed while we were reading may not be in the body
+        if sitemap_cache.stamp.current() == version:
+            sitemap_cache.set(name, ''.join(parts))
+
+    return Response(stream_with_context(stream()), mimetype='application/xml')
+
+
+def index_response():
+    def generate():
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{XMLNS}">\n'
+        yield f'<sitemap><loc>{escape(url_for("main.sitemap_pages", _external=True))}</loc></sitemap>\n'
+        for section in SECTIONS.values():
+            for chunk, _, newest in section.chunks():
+                loc = escape(url_for('main.sitemap_section', section=section.name, chunk=chunk, _external=True))
+                lastmod = _lastmod(newest)
+                yield f'<sitemap><loc>{loc}</loc>' + (f'<lastmod>{lastmod}</lastmod>' if lastmod else '') + '</sitemap>\n'
+        yield '</sitemapindex>\n'
+
+    return _cached_response('index', generate)
+
+
+def pages_response():
+    def generate():
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n'
+        for endpoint in ('main.index', 'main.blog_list', 'main.cart', 'main.login'):
+            yield _url(url_for(endpoint, _external=True))
+        yield '</urlset>\n'
+
+    return _cached_response('pages', generate)
+
+
+def section_response(name, chunk):
+    """Child sitemap for one slice of a section, or None if the section is unknown."""
+    section = SECTIONS.get(name)
+    if section is None:
+        return None
+    prefix = _location_prefix(section)
+
+    def generate():
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n'
+        batch = []
+        for key, modified in section.rows(chunk):
+            batch.append(_url(prefix + quote(str(key)), _lastmod(modified)))
+            if len(batch) >= 1000:
+                yield ''.join(batch)
+                batch = []
+        yield ''.join(batch) + '</urlset>\n'
+
+    return _cached_response(f'{name}-{chunk}', generate)
+
+
+def sitemap_changed():
+    """Call when a transaction adds, edits or deletes a product or blog post; sitemaps are rebuilt after commit."""
+    db.session.info['sitemap_changed'] = True
+
+
+def _after_commit(session):
+    # a flag left over from a rolled-back transaction only costs one rebuild
+    if session.info.pop('sitemap_changed', False):
+        sitemap_cache.invalidate()
+
+
+def init_app(app):
+    sitemap_cache.init_app(app)
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'after_commit', _after_commit)
@@ -0,0 +1,124 @@
+"""Per-worker cache behind Flask-Login's user_loader.
+
+Without it every request from a logged-in user, including the small AJAX
+calls from the cart and checkout pages, starts with a ``SELECT`` on ``user``.
+Each worker instead keeps the column values of recently seen users for
+USER_CACHE_TTL seconds (0 disables the cache) and rebuilds the `User` from
+them with ``session.merge(load=False)``, which attaches it to the request's
+session without a query.
+
+Invalidation:
+- code that changes a user calls `user_changed(user)` before committing; it
+  increments ``User.version`` in the same transaction and, once the commit
+  succeeds, evicts the entry locally and bumps the ``users`` version stamp
+  (see app/cache.py) so other workers notice on their next lookup
+- a worker that sees the stamp move re-reads ``id, version`` for the users it
+  has cached (one query) and drops those whose version changed or that no
+  longer exist; a ban therefore takes effect on the next request everywhere
+- a lookup that raced with a change is not stored, and TTL expiry covers
+  writes made outside the app (shell sessions, other hosts without a shared
+  PAGE_CACHE_DIR)
+"""
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db
+from app.cache import VersionStamp
+from app.metrics import record_cache
+from app.models import User
+
+
+class UserCache:
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.ttl = 60.0
+        self.stamp = VersionStamp('users')
+        self._entries = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        ttl = app.config.get('USER_CACHE_TTL')
+        self.ttl = float(ttl if ttl is not None else 60)
+        self.max_entries = int(app.config.get('USER_CACHE_SIZE') or 2048)
+        self.stamp.init_app(app)
+
+    def _columns(self):
+        return [attr.key for attr in db.inspect(User).column_attrs]
+
+    def _sync(self, version):
+        """Drop entries whose user changed since this worker last saw the stamp."""
+        with self._lock:
+            if version == self._version:
+                return
+            cached = {user_id: values['version'] for user_id, (values, _) in self._entries.items()}
+        stale = set()
+        if cached:
+            current = dict(db.session.query(User.id, User.version).filter(User.id.in_(list(cached))).all())
+            stale = {user_id for user_id, seen in cached.items() if current.get(user_id) != seen}
+        with self._lock:
+            for user_id in stale:
+                self._entries.pop(user_id, None)
+            self._version = version
+
+    def get(self, user_id):
+        """The `User` with this id attached to the current session, or None."""
+        if self.ttl <= 0:
+            return db.session.get(User, user_id)
+        version = self.stamp.current()
+        self._sync(version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        record_cache('users', entry is not None and now - entry[1] <= self.ttl)
+        if entry is not None and now - entry[1] <= self.ttl:
+            user = User(**entry[0])
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            with self._lock:
+                self._entries.pop(user_id, None)
+            return None
+        values = {key: getattr(user, key) for key in self._columns()}
+        with self._lock:
+            # a change committed while we were reading may not be in `values`
+            if self.stamp.current() == version == self._version:
+                if user_id not in self._entries and len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[user_id] = (values, now)
+        return user
+
+    def evict(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+def user_changed(user):
+    """Mark `user` as modified in the current transaction so cached copies are dropped on commit."""
+    # incremented in SQL so two concurrent changes never end up with the same version
+    user.version = User.version + 1
+    db.session.info.setdefault('users_changed', set()).add(user.id)
+
+
+def _after_commit(session):
+    # ids left over from a rolled-back transaction only cost a re-read
+    changed = session.info.pop('users_changed', None)
+    if changed:
+        user_cache.evict(changed)
+        user_cache.stamp.bump()
+
+
+def init_app(app):
+    user_cache.init_app(app)
+    if not event.contains(db.session, 'after_commit', _after_commit):
+        event.listen(db.session, 'after_commit', _after_commit)
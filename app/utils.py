@@ -15,6 +15,20 @@ def validate_trxID(trxID):
     pass
 
 
+def image_dimensions(path):
+    """Return (width, height) of an image file, or (None, None) if Pillow is
+    missing or the file cannot be read."""
+    try:
+        from PIL import Image
+    except Exception:
+        return (None, None)
+    try:
+        with Image.open(path) as im:
+            return im.size
+    except Exception:
+        return (None, None)
+
+
 def generate_slug(title, model_class=None, existing_id=None):
     """Generate a unique URL-safe slug from a title.
     
@@ -0,0 +1,176 @@
+"""Batched page visit counters.
+
+One `VisitCounter` exists per counted model (``ProductVisit``, ``BlogVisit``)
+and every gunicorn worker keeps its own copy. Page views only bump an
+in-memory dict; a background thread writes the pending deltas every
+VISIT_FLUSH_INTERVAL seconds or as soon as VISIT_FLUSH_THRESHOLD hits are
+pending, and anything still pending is flushed when the worker exits.
+
+A flush is a single ``INSERT ... ON CONFLICT (key) DO UPDATE`` that adds
+each delta to the stored count, relying on the unique constraint on the key
+column, so workers flushing a new key at the same time cannot collide.
+
+Displayed counts are served from a cached base value plus the pending
+delta, so reading a count does not hit the database more than once per
+VISIT_COUNT_TTL seconds per key.
+"""
+import atexit
+import os
+import threading
+import time
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# dialects whose insert() supports on_conflict_do_update
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+class VisitCounter:
+    """In-process accumulator for one model's visit counters."""
+
+    def __init__(self, model_name, key_column, app=None):
+        self.model_name = model_name
+        self.key_column = key_column
+        self.app = None
+        self._pending = {}
+        self._pending_hits = 0
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.flush_interval = 10.0
+        self.flush_threshold = 100
+        self.count_ttl = 60.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = float(app.config.get('VISIT_FLUSH_INTERVAL') or 10.0)
+        self.flush_threshold = int(app.config.get('VISIT_FLUSH_THRESHOLD') or 100)
+        self.count_ttl = float(app.config.get('VISIT_COUNT_TTL') or 60.0)
+        atexit.register(self.flush)
+
+    @property
+    def table(self):
+        from app import models
+        return getattr(models, self.model_name).__table__
+
+    def increment(self, key, amount=1):
+        """Record `amount` visits for `key` without touching the database."""
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+            self._pending_hits += amount
+            full = self._pending_hits >= self.flush_threshold
+        self._ensure_worker()
+        if full:
+            self._wake.set()
+
+    def count(self, key):
+        """Return the visit count for `key`: stored value plus this worker's pending delta."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._counts.get(key)
+            pending = self._pending.get(key, 0)
+        if cached is None or now - cached[1] > self.count_ttl:
+            from app import db
+            table = self.table
+            stored = db.session.execute(
+                db.select(db.func.coalesce(db.func.sum(table.c.visit_count), 0))
+                .where(table.c[self.key_column] == key)
+            ).scalar() or 0
+            with self._lock:
+                self._counts[key] = (int(stored), now)
+                pending = self._pending.get(key, 0)
+            return int(stored) + pending
+        return cached[0] + pending
+
+    def _ensure_worker(self):
+        # start the flusher lazily and restart it after a fork (gunicorn --preload)
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f'{self.model_name}-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _drain(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._pending_hits = 0
+        return pending
+
+    def flush(self):
+        """Write all pending deltas to the database. Safe to call at any time."""
+        if self.app is None:
+            return
+        pending = self._drain()
+        if not pending:
+            return
+        try:
+            with self.app.app_context():
+                self._write(pending)
+        except Exception:
+            # put the deltas back so a transient DB error does not lose visits
+            with self._lock:
+                for key, amount in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + amount
+                    self._pending_hits += amount
+            try:
+                self.app.logger.exception('Failed to flush %s counts', self.model_name)
+            except Exception:
+                pass
+            return
+        # the flushed deltas are now part of the stored value
+        with self._lock:
+            for key, amount in pending.items():
+                cached = self._counts.get(key)
+                if cached is not None:
+                    self._counts[key] = (cached[0] + amount, cached[1])
+
+    def _write(self, pending):
+        from app import db
+
+        table = self.table
+        dialect = db.session.get_bind().dialect.name
+        if dialect not in _UPSERT_INSERTS:
+            raise NotImplementedError(f'visit counters need an upsert, not available on {dialect}')
+        stmt = _UPSERT_INSERTS[dialect](table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[self.key_column]],
+            set_={
+                'visit_count': db.func.coalesce(table.c.visit_count, 0) + stmt.excluded.visit_count,
+                'last_visited': db.func.current_timestamp(),
+            },
+        )
+        try:
+            db.session.execute(stmt, [{self.key_column: key, 'visit_count': amount} for key, amount in pending.items()])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+product_visits = VisitCounter('ProductVisit', 'product_id')
+blog_visits = VisitCounter('BlogVisit', 'post_id')
+
+
+def init_app(app):
+    for counter in (product_visits, blog_visits):
+        counter.init_app(app)
+
+
+def flush_all():
+    for counter in (product_visits, blog_visits):
+        counter.flush()
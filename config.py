@@ -7,6 +7,30 @@ class Config:
     # prefer a provided DATABASE_URL (Render will set this when you add a managed DB)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite connection pragmas and server-database pooling (see app/database.py)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)  # milliseconds
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 268435456)  # bytes; 0 disables
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or -16000)  # negative = KiB per connection
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 5)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 10)
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+
+    # per-request SQL/render timing (see app/instrumentation.py); SERVER_TIMING=1 adds the Server-Timing header,
+    # SQL_QUERY_BUDGET=0 disables the budget check, SQL_QUERY_BUDGET_RAISE=1 (for tests) fails over-budget
+    # requests instead of logging them
+    SERVER_TIMING = (os.environ.get('SERVER_TIMING') or '0') == '1'
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS') or 200)
+    SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET') or 0)
+    SQL_QUERY_BUDGET_RAISE = (os.environ.get('SQL_QUERY_BUDGET_RAISE') or '0') == '1'
+
+    # Prometheus /metrics (see app/metrics.py): per-worker samples are merged through files in METRICS_DIR
+    # (default instance/metrics); METRICS_TOKEN lets a scraper authenticate with a bearer token
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL') or 5)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
     PAYMENT_OPTIONS = ['Cash on Delivery', 'Bkash']
     # upload folder can be configured via env var in production (use S3 for durability)
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(basedir, 'app', 'static', 'uploads')
@@ -15,9 +39,67 @@ class Config:
     EMPLOYEE_RECIPIENTS = os.environ.get('EMPLOYEE_RECIPIENTS') or 'teamsobuy@gmail.com' # Replace with actual employee email(s)
 
     # email settings
+    # 'brevo', or 'fake-brevo' to send to the local stand-in from scripts/fake_brevo.py
     MAIL_PROVIDER = os.environ.get('MAIL_PROVIDER') or 'brevo'
     BREVO_API_KEY = os.environ.get('BREVO_API_KEY')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'noreply@teamsobuy.shop'
     BREVO_SENDER_EMAIL = os.environ.get('BREVO_SENDER_EMAIL') or 'noreply@teamsobuy.shop'
+    # keep-alive HTTPS connections shared by all senders in a process (see app.email.BrevoClient)
+    BREVO_POOL_SIZE = int(os.environ.get('BREVO_POOL_SIZE') or 10)
+    # API base URL override, e.g. http://127.0.0.1:8025/v3 for the stand-in
+    BREVO_API_HOST = os.environ.get('BREVO_API_HOST')
+
+    # product/blog visit counters are buffered per worker and flushed in batches;
+    # displayed counts re-read the stored value at most once per VISIT_COUNT_TTL seconds
+    VISIT_FLUSH_INTERVAL = float(os.environ.get('VISIT_FLUSH_INTERVAL') or 10)
+    VISIT_FLUSH_THRESHOLD = int(os.environ.get('VISIT_FLUSH_THRESHOLD') or 100)
+    VISIT_COUNT_TTL = float(os.environ.get('VISIT_COUNT_TTL') or 60)
+
+    # server-side cart storage: 'db' (shared tables) or 'memory' (single worker only)
+    CART_STORE = os.environ.get('CART_STORE') or 'db'
+    CART_TTL_DAYS = float(os.environ.get('CART_TTL_DAYS') or 30)
+
+    # rendered homepage cache for anonymous visitors (seconds; 0 disables)
+    PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL') or 300)
+    PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR')
+
+    # logged-in users are cached per worker by the user_loader (seconds; 0 disables, see app/user_cache.py)
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL') or 60)
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 2048)
+    # per-worker banned user set is reloaded on ban/unban/delete and at least this often (seconds, see app/bans.py)
+    BAN_REFRESH_INTERVAL = float(os.environ.get('BAN_REFRESH_INTERVAL') or 30)
+
+    # products per storefront / API page (keyset paginated)
+    CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE') or 24)
+
+    # product/blog search: 'auto' uses SQLite FTS5 when available, 'memory' forces the in-process index
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'
+
+    # uploaded image derivatives (see app/images.py); IMAGE_WORKERS=0 renders inline
+    IMAGE_DERIVATIVE_WIDTHS = os.environ.get('IMAGE_DERIVATIVE_WIDTHS') or '320,640,1024,1600'
+    IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY') or 80)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS') or 2)
+
+    # per-worker LRU size for /admin/api/sales-series results
+    SALES_SERIES_CACHE_SIZE = int(os.environ.get('SALES_SERIES_CACHE_SIZE') or 128)
+
+    # rows fetched per query by the streaming admin exports (see app/exports.py)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 1000)
+
+    # email outbox delivery (see app/outbox.py); OUTBOX_WORKERS=0 leaves delivery to `flask outbox-worker`
+    OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS') or 2)
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE') or 20)
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL') or 5)
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS') or 8)
+    OUTBOX_BACKOFF_BASE = float(os.environ.get('OUTBOX_BACKOFF_BASE') or 30)
+    OUTBOX_BACKOFF_MAX = float(os.environ.get('OUTBOX_BACKOFF_MAX') or 3600)
+    OUTBOX_LEASE = float(os.environ.get('OUTBOX_LEASE') or 300)
 
-    
\ No newline at end of file
+    # newsletter campaigns (see app/campaigns.py); CAMPAIGN_WORKERS=0 leaves sending to `flask campaign-worker`
+    CAMPAIGN_WORKERS = int(os.environ.get('CAMPAIGN_WORKERS') or 1)
+    CAMPAIGN_BATCH_SIZE = int(os.environ.get('CAMPAIGN_BATCH_SIZE') or 500)
+    CAMPAIGN_RATE_LIMIT = float(os.environ.get('CAMPAIGN_RATE_LIMIT') or 300)  # emails per second; 0 = unthrottled
+    CAMPAIGN_MAX_FAILURES = int(os.environ.get('CAMPAIGN_MAX_FAILURES') or 5)
+    CAMPAIGN_BACKOFF_BASE = float(os.environ.get('CAMPAIGN_BACKOFF_BASE') or 2)
+    CAMPAIGN_BACKOFF_MAX = float(os.environ.get('CAMPAIGN_BACKOFF_MAX') or 60)
+    CAMPAIGN_LEASE = float(os.environ.get('CAMPAIGN_LEASE') or 120)
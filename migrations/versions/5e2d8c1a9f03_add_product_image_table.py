@@ -0,0 +1,75 @@
+"""Move Product.image_url CSV into a product_image table
+
+Revision ID: 5e2d8c1a9f03
+Revises: b7c41e9d2a6f
+Create Date: 2026-10-17 13:05:12.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2d8c1a9f03'
+down_revision = 'b7c41e9d2a6f'
+branch_labels = None
+depends_on = None
+
+
+product = sa.table('product', sa.column('id', sa.Integer), sa.column('image_url', sa.Text))
+product_image = sa.table(
+    'product_image',
+    sa.column('product_id', sa.Integer),
+    sa.column('position', sa.Integer),
+    sa.column('url', sa.String),
+)
+
+
+def upgrade():
+    op.create_table('product_image',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=300), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('derivatives', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.create_index('ix_product_image_product_position', ['product_id', 'position'], unique=False)
+
+    # backfill from the comma-separated column, keeping the stored order and dropping duplicates
+    conn = op.get_bind()
+    rows = []
+    for pid, csv_urls in conn.execute(sa.select(product.c.id, product.c.image_url)):
+        seen = []
+        for url in (csv_urls or '').split(','):
+            url = url.strip()
+            if url and url not in seen:
+                seen.append(url)
+        rows.extend({'product_id': pid, 'position': pos, 'url': url} for pos, url in enumerate(seen))
+    if rows:
+        op.bulk_insert(product_image, rows)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('image_url')
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_url', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    urls = {}
+    for pid, url in conn.execute(sa.select(product_image.c.product_id, product_image.c.url).order_by(product_image.c.product_id, product_image.c.position)):
+        urls.setdefault(pid, []).append(url)
+    for pid, items in urls.items():
+        conn.execute(product.update().where(product.c.id == pid).values(image_url=','.join(items)))
+
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_image_product_position')
+
+    op.drop_table('product_image')
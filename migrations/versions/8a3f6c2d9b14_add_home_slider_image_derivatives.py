@@ -0,0 +1,26 @@
+"""Add derivatives to home_slider_image
+
+Revision ID: 8a3f6c2d9b14
+Revises: 5e2d8c1a9f03
+Create Date: 2026-10-17 13:05:21.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3f6c2d9b14'
+down_revision = '5e2d8c1a9f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('home_slider_image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('derivatives', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('home_slider_image', schema=None) as batch_op:
+        batch_op.drop_column('derivatives')
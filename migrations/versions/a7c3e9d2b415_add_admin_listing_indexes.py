@@ -0,0 +1,32 @@
+"""Add admin listing indexes
+
+Revision ID: a7c3e9d2b415
+Revises: e8b2c6f1a094
+Create Date: 2026-10-17 21:04:18.330517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d2b415'
+down_revision = 'e8b2c6f1a094'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('blog_post', schema=None) as batch_op:
+        batch_op.create_index('ix_blog_post_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('newsletter_subscriber', schema=None) as batch_op:
+        batch_op.create_index('ix_newsletter_subscriber_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('newsletter_subscriber', schema=None) as batch_op:
+        batch_op.drop_index('ix_newsletter_subscriber_created_at')
+
+    with op.batch_alter_table('blog_post', schema=None) as batch_op:
+        batch_op.drop_index('ix_blog_post_created_at')
@@ -0,0 +1,48 @@
+"""Add newsletter_campaign table
+
+Revision ID: b3d8f1a6c472
+Revises: a9c2e7f4b361
+Create Date: 2026-10-17 19:02:17.318604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d8f1a6c472'
+down_revision = 'a9c2e7f4b361'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('newsletter_campaign',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('text_body', sa.Text(), nullable=False),
+    sa.Column('html_body', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('last_subscriber_id', sa.Integer(), nullable=False),
+    sa.Column('inflight_last_id', sa.Integer(), nullable=True),
+    sa.Column('sent_count', sa.Integer(), nullable=False),
+    sa.Column('skipped_count', sa.Integer(), nullable=False),
+    sa.Column('batch_count', sa.Integer(), nullable=False),
+    sa.Column('failures', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('claimed_by', sa.String(length=64), nullable=True),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('newsletter_campaign', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_newsletter_campaign_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('newsletter_campaign', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_newsletter_campaign_status'))
+
+    op.drop_table('newsletter_campaign')
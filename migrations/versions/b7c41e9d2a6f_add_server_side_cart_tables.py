@@ -0,0 +1,51 @@
+"""Add server-side cart tables
+
+Revision ID: b7c41e9d2a6f
+Revises: 0dddf5a3512f
+Create Date: 2026-10-17 10:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c41e9d2a6f'
+down_revision = '0dddf5a3512f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cart',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('delivery', sa.JSON(), nullable=True),
+    sa.Column('coupon', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_cart_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_cart_expires_at'), ['expires_at'], unique=False)
+
+    op.create_table('cart_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cart_id', sa.String(length=64), nullable=False),
+    sa.Column('item_key', sa.String(length=250), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['cart_id'], ['cart.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cart_id', 'item_key', name='uq_cart_item_cart_key')
+    )
+
+
+def downgrade():
+    op.drop_table('cart_item')
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cart_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_cart_user_id'))
+
+    op.drop_table('cart')
@@ -0,0 +1,27 @@
+"""Add updated_at to product
+
+Revision ID: c41d7e9a2b58
+Revises: 8a3f6c2d9b14
+Create Date: 2026-10-17 14:22:07.551930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9a2b58'
+down_revision = '8a3f6c2d9b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE product SET updated_at = created_at')
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
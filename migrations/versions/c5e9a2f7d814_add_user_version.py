@@ -0,0 +1,26 @@
+"""Add version counter to user
+
+Revision ID: c5e9a2f7d814
+Revises: b3d8f1a6c472
+Create Date: 2026-10-17 20:14:03.551920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e9a2f7d814'
+down_revision = 'b3d8f1a6c472'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('version')
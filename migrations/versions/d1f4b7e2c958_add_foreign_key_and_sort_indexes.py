@@ -0,0 +1,94 @@
+"""Add foreign key and sort indexes, one visit/like row per key
+
+Revision ID: d1f4b7e2c958
+Revises: c5e9a2f7d814
+Create Date: 2026-10-17 20:41:26.193847
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f4b7e2c958'
+down_revision = 'c5e9a2f7d814'
+branch_labels = None
+depends_on = None
+
+
+def _merge_visit_counters(table, key):
+    # fold duplicate counter rows into the oldest one before the unique constraint goes on
+    op.execute(
+        f'UPDATE {table} SET visit_count = (SELECT SUM(COALESCE(d.visit_count, 0)) FROM {table} d '
+        f'WHERE d.{key} = {table}.{key}) '
+        f'WHERE id IN (SELECT MIN(id) FROM {table} GROUP BY {key} HAVING COUNT(*) > 1)'
+    )
+    op.execute(f'DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {key})')
+
+
+def upgrade():
+    _merge_visit_counters('product_visit', 'product_id')
+    _merge_visit_counters('blog_visit', 'post_id')
+    op.execute('DELETE FROM blog_like WHERE id NOT IN (SELECT MIN(id) FROM blog_like GROUP BY post_id, user_id)')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_status_created_at', ['status', 'created_at'], unique=False)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.create_index('ix_order_item_order_id', ['order_id'], unique=False)
+        batch_op.create_index('ix_order_item_product_id', ['product_id'], unique=False)
+
+    with op.batch_alter_table('product_visit', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_product_visit_product_id', ['product_id'])
+        batch_op.create_index('ix_product_visit_visit_count', ['visit_count'], unique=False)
+
+    with op.batch_alter_table('blog_comment', schema=None) as batch_op:
+        batch_op.create_index('ix_blog_comment_post_id_created_at', ['post_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_blog_comment_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('blog_like', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_blog_like_post_user', ['post_id', 'user_id'])
+
+    with op.batch_alter_table('blog_visit', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_blog_visit_post_id', ['post_id'])
+
+    with op.batch_alter_table('coupon_usage', schema=None) as batch_op:
+        batch_op.create_index('ix_coupon_usage_coupon_id_user_id', ['coupon_id', 'user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('coupon_usage', schema=None) as batch_op:
+        batch_op.drop_index('ix_coupon_usage_coupon_id_user_id')
+
+    with op.batch_alter_table('blog_visit', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_blog_visit_post_id', type_='unique')
+
+    with op.batch_alter_table('blog_like', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_blog_like_post_user', type_='unique')
+
+    with op.batch_alter_table('blog_comment', schema=None) as batch_op:
+        batch_op.drop_index('ix_blog_comment_created_at')
+        batch_op.drop_index('ix_blog_comment_post_id_created_at')
+
+    with op.batch_alter_table('product_visit', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_visit_visit_count')
+        batch_op.drop_constraint('uq_product_visit_product_id', type_='unique')
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_item_product_id')
+        batch_op.drop_index('ix_order_item_order_id')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_user_id_created_at')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_status_created_at')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_created_at')
@@ -0,0 +1,46 @@
+"""Add daily_sales rollup table
+
+Revision ID: d7e2a9c4f613
+Revises: c41d7e9a2b58
+Create Date: 2026-10-17 15:40:52.017336
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2a9c4f613'
+down_revision = 'c41d7e9a2b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_sales',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('payment_method', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'payment_method', 'status', name='uq_daily_sales_day_method_status')
+    )
+    with op.batch_alter_table('daily_sales', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_daily_sales_day'), ['day'], unique=False)
+
+    # backfill from existing orders
+    day = 'date(created_at)' if op.get_bind().dialect.name == 'sqlite' else 'CAST(created_at AS DATE)'
+    op.execute(
+        'INSERT INTO daily_sales (day, payment_method, status, order_count, revenue) '
+        f'SELECT COALESCE({day}, CURRENT_DATE), payment_method, status, COUNT(id), COALESCE(SUM(total_amount), 0) '
+        f'FROM "order" GROUP BY COALESCE({day}, CURRENT_DATE), payment_method, status'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('daily_sales', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_daily_sales_day'))
+
+    op.drop_table('daily_sales')
@@ -0,0 +1,35 @@
+"""Add discount to daily_sales
+
+Revision ID: e5b3c8d1a7f2
+Revises: d7e2a9c4f613
+Create Date: 2026-10-17 16:31:18.640291
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b3c8d1a7f2'
+down_revision = 'd7e2a9c4f613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('daily_sales', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('discount', sa.Float(), nullable=False, server_default='0'))
+
+    # backfill discounts from existing orders
+    day = 'date(o.created_at)' if op.get_bind().dialect.name == 'sqlite' else 'CAST(o.created_at AS DATE)'
+    op.execute(
+        'UPDATE daily_sales SET discount = COALESCE(('
+        'SELECT SUM(o.discount_amount) FROM "order" o '
+        f'WHERE COALESCE({day}, CURRENT_DATE) = daily_sales.day '
+        'AND o.payment_method = daily_sales.payment_method AND o.status = daily_sales.status), 0)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('daily_sales', schema=None) as batch_op:
+        batch_op.drop_column('discount')
@@ -0,0 +1,33 @@
+"""Make product and order created_at NOT NULL
+
+Revision ID: e8b2c6f1a094
+Revises: d1f4b7e2c958
+Create Date: 2026-10-17 21:42:17.308114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b2c6f1a094'
+down_revision = 'd1f4b7e2c958'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the keyset cursors (app/catalog.py) order on created_at and cannot encode NULL
+    op.execute('UPDATE product SET created_at = coalesce(updated_at, current_timestamp) WHERE created_at IS NULL')
+    op.execute('UPDATE "order" SET created_at = current_timestamp WHERE created_at IS NULL')
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,30 @@
+"""Add order listing indexes
+
+Revision ID: f2a6d4b8c931
+Revises: e5b3c8d1a7f2
+Create Date: 2026-10-17 17:12:44.905126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6d4b8c931'
+down_revision = 'e5b3c8d1a7f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_order_status_created_at', ['status', 'created_at'], unique=False)
+        batch_op.create_index('ix_order_payment_method_created_at', ['payment_method', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_payment_method_created_at')
+        batch_op.drop_index('ix_order_status_created_at')
+        batch_op.drop_index('ix_order_created_at_id')
@@ -0,0 +1,164 @@
+"""
+Benchmark order-notification email throughput against the local Brevo stand-in.
+
+Usage:
+    python scripts/benchmark_email.py [--checkouts 300] [--concurrency 16] [--outbox-workers 4]
+                                      [--latency-ms 80] [--jitter-ms 40] [--error-rate 0] [--throttle-rate 0]
+                                      [--brevo-host http://127.0.0.1:8025/v3] [--database sqlite:////tmp/bench.db]
+
+Each simulated checkout does what the checkout route does: it inserts an order
+and queues the customer, ORDER_NOTIFICATION_RECIPIENTS and
+EMPLOYEE_RECIPIENTS emails in the same transaction. The outbox workers then
+deliver to scripts/fake_brevo.py, started in-process unless --brevo-host
+points at one that is already running.
+
+Reported:
+- enqueue latency: send_email calls plus the commit, per checkout (p50/p99/max)
+- delivery latency: commit to Brevo accepting the message (p50/p99)
+- end-to-end throughput: emails accepted per second
+- queue depth: pending + in-flight outbox rows, sampled every 100 ms
+
+By default the benchmark uses a throwaway SQLite database; it never sends real mail.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Make sure project root is on sys.path so 'app' package can be imported when running this script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_brevo import FakeBrevo, serve
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checkouts', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--outbox-workers', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=80.0)
+    parser.add_argument('--jitter-ms', type=float, default=40.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--brevo-host', help='use an already running stand-in instead of starting one')
+    parser.add_argument('--database', help='SQLAlchemy URL (default: a temporary SQLite file)')
+    parser.add_argument('--timeout', type=float, default=300.0, help='give up waiting for delivery after this many seconds')
+    args = parser.parse_args()
+
+    fake = None
+    host = args.brevo_host
+    if not host:
+        fake = FakeBrevo(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate, retry_after=1)
+        host = f'http://127.0.0.1:{serve(fake, port=0).server_port}/v3'
+
+    os.environ['DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['MAIL_PROVIDER'] = 'fake-brevo'
+    os.environ['BREVO_API_HOST'] = host
+    os.environ['OUTBOX_WORKERS'] = str(args.outbox_workers)
+    os.environ['OUTBOX_POLL_INTERVAL'] = '0.5'
+    os.environ['OUTBOX_BACKOFF_BASE'] = '1'
+    os.environ['ORDER_NOTIFICATION_RECIPIENTS'] = 'admin@bench.invalid'
+    os.environ['EMPLOYEE_RECIPIENTS'] = 'staff@bench.invalid'
+
+    from app import create_app, db
+    from app.email import send_email
+    from app.models import EmailOutbox, Order, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User.query.filter_by(username='email-bench').first()
+        if user is None:
+            user = User(username='email-bench', email='customer@bench.invalid', role='customer')
+            user.set_password(os.urandom(8).hex())
+            db.session.add(user)
+            db.session.commit()
+        user_id, user_email = user.id, user.email
+        start_id = db.session.query(db.func.coalesce(db.func.max(EmailOutbox.id), 0)).scalar()
+
+    enqueue_ms = []
+    committed_at = {}
+    lock = threading.Lock()
+
+    def checkout(n):
+        with app.test_request_context():
+            order = Order(user_id=user_id, total_amount=100.0, payment_method='cash', status='Pending')
+            db.session.add(order)
+            db.session.flush()
+            t0 = time.perf_counter()
+            body = f'Order #{order.id} benchmark notification'
+            send_email(f'Your SoBuy order #{order.id}', user_email, body, f'<p>{body}</p>')
+            send_email(f'New order #{order.id}', app.config['ORDER_NOTIFICATION_RECIPIENTS'], body, f'<p>{body}</p>')
+            send_email(f'New order #{order.id}', app.config['EMPLOYEE_RECIPIENTS'], body, f'<p>{body}</p>')
+            db.session.commit()
+            done = time.perf_counter()
+            with lock:
+                enqueue_ms.append((done - t0) * 1000)
+                committed_at[order.id] = datetime.utcnow()
+
+    depth = []
+    stop = threading.Event()
+
+    def sample_queue():
+        with app.app_context():
+            while not stop.is_set():
+                depth.append(EmailOutbox.query.filter(EmailOutbox.id > start_id,
+                                                      EmailOutbox.status.in_(('pending', 'sending'))).count())
+                db.session.rollback()
+                stop.wait(0.1)
+
+    sampler = threading.Thread(target=sample_queue, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(checkout, range(args.checkouts)))
+    enqueued = time.perf_counter()
+
+    expected = args.checkouts * 3
+    with app.app_context():
+        while time.perf_counter() - enqueued < args.timeout:
+            open_rows = EmailOutbox.query.filter(EmailOutbox.id > start_id,
+                                                 EmailOutbox.status.in_(('pending', 'sending'))).count()
+            db.session.rollback()
+            if not open_rows:
+                break
+            time.sleep(0.05)
+        finished = time.perf_counter()
+        stop.set()
+        rows = db.session.query(EmailOutbox.subject, EmailOutbox.status, EmailOutbox.attempts, EmailOutbox.sent_at) \
+            .filter(EmailOutbox.id > start_id).all()
+
+    sent = sum(1 for row in rows if row.status == 'sent')
+    failed = sum(1 for row in rows if row.status == 'failed')
+    retried = sum(1 for row in rows if row.attempts > 1)
+    delivery_ms = [(row.sent_at - committed_at[int(row.subject.rsplit('#', 1)[1])]).total_seconds() * 1000
+                   for row in rows if row.sent_at is not None]
+    elapsed = finished - started
+
+    print(f'checkouts:           {args.checkouts} ({args.concurrency} concurrent)')
+    print(f'emails:              {sent}/{expected} sent, {failed} failed, {retried} retried, '
+          f'{expected - sent - failed} still queued')
+    print(f'enqueue latency ms:  p50 {percentile(enqueue_ms, 50):.1f}  p99 {percentile(enqueue_ms, 99):.1f}  '
+          f'max {max(enqueue_ms or [0]):.1f}')
+    print(f'delivery latency ms: p50 {percentile(delivery_ms, 50):.1f}  p99 {percentile(delivery_ms, 99):.1f}')
+    print(f'checkouts/s:         {args.checkouts / max(enqueued - started, 1e-9):.1f} (enqueue only)')
+    print(f'emails/s end-to-end: {sent / max(elapsed, 1e-9):.1f} over {elapsed:.2f}s '
+          f'({args.outbox_workers} outbox workers)')
+    print(f'queue depth:         max {max(depth or [0])}  mean {sum(depth) / max(len(depth), 1):.1f}')
+    if fake is not None:
+        print(f'fake brevo:          {fake.snapshot()}')
+
+
+if __name__ == '__main__':
+    main()
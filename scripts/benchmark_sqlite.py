@@ -0,0 +1,208 @@
+"""
+Benchmark concurrent SQLite throughput with the default and the tuned connection settings.
+
+Usage:
+    python scripts/benchmark_sqlite.py [--processes 3] [--threads 4] [--duration 10]
+                                       [--write-ratio 0.2] [--products 200] [--profile both|default|tuned]
+
+Like the Procfile's gunicorn workers, --processes separate processes (each
+with --threads threads) share one SQLite file and run a storefront-like mix
+for --duration seconds:
+
+- reads: a catalog page, a product by id and a customer's order history
+- writes (--write-ratio of the operations): a checkout (order plus two
+  order items) and a visit counter update, each in its own transaction
+
+Each profile gets a fresh database file:
+- default: SQLite's own settings (rollback journal, synchronous=FULL, no mmap,
+  2 MiB page cache) with the sqlite3 driver's 5 s lock wait
+- tuned: the SQLITE_* settings from config.py (WAL, synchronous=NORMAL,
+  busy_timeout, mmap, larger cache), applied by app/database.py
+
+Reported per profile: operations per second, read and write latency
+(p50/p99) and operations that failed with "database is locked".
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Make sure project root is on sys.path so 'app' package can be imported when running this script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+PROFILES = {
+    'default': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT': '5000',
+                'SQLITE_MMAP_SIZE': '0', 'SQLITE_CACHE_SIZE': '-2000'},
+    'tuned': {},
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _environment(database, profile):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+    os.environ['OUTBOX_WORKERS'] = '0'
+    os.environ['CAMPAIGN_WORKERS'] = '0'
+    for key in PROFILES['default']:
+        os.environ.pop(key, None)
+    os.environ.update(PROFILES[profile])
+
+
+def seed(database, profile, products):
+    _environment(database, profile)
+    from app import create_app, db
+    from app.models import Product, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        for i in range(products):
+            db.session.add(Product(name=f'Product {i}', description='Benchmark product', price=100.0 + i,
+                                   status='active'))
+        for i in range(50):
+            user = User(username=f'bench{i}', email=f'bench{i}@bench.invalid')
+            user.set_password('x')
+            db.session.add(user)
+        db.session.commit()
+        db.engine.dispose()
+
+
+def worker(database, profile, threads, duration, write_ratio, products, start_at, results):
+    _environment(database, profile)
+    from sqlalchemy.exc import OperationalError
+
+    from app import catalog, create_app, db
+    from app.models import Order, OrderItem, Product, ProductVisit
+
+    app = create_app()
+
+    def read(rng):
+        choice = rng.random()
+        if choice < 0.4:
+            catalog.active_products_page()
+        elif choice < 0.8:
+            db.session.get(Product, rng.randint(1, products))
+        else:
+            Order.query.filter_by(user_id=rng.randint(1, 50)).order_by(Order.created_at.desc()).limit(20).all()
+        db.session.rollback()
+
+    def write(rng):
+        if rng.random() < 0.5:
+            order = Order(user_id=rng.randint(1, 50), total_amount=250.0, payment_method='cash', status='Pending')
+            db.session.add(order)
+            db.session.flush()
+            for _ in range(2):
+                db.session.add(OrderItem(order_id=order.id, product_id=rng.randint(1, products), quantity=1,
+                                         unit_price=125.0))
+        else:
+            product_id = rng.randint(1, products)
+            updated = ProductVisit.query.filter_by(product_id=product_id) \
+                .update({'visit_count': ProductVisit.visit_count + 1})
+            if not updated:
+                db.session.add(ProductVisit(product_id=product_id, visit_count=1))
+        db.session.commit()
+
+    stats = {'reads': [], 'writes': [], 'locked': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def run(seed_value):
+        rng = random.Random(seed_value)
+        reads, writes, locked, errors = [], [], 0, 0
+        with app.app_context():
+            while time.time() < start_at:
+                time.sleep(0.001)
+            deadline = start_at + duration
+            while time.time() < deadline:
+                is_write = rng.random() < write_ratio
+                t0 = time.perf_counter()
+                try:
+                    (write if is_write else read)(rng)
+                except OperationalError as e:
+                    db.session.rollback()
+                    if 'locked' in str(e) or 'busy' in str(e):
+                        locked += 1
+                    else:
+                        errors += 1
+                    continue
+                except Exception:
+                    db.session.rollback()
+                    errors += 1
+                    continue
+                (writes if is_write else reads).append((time.perf_counter() - t0) * 1000)
+        with lock:
+            stats['reads'].extend(reads)
+            stats['writes'].extend(writes)
+            stats['locked'] += locked
+            stats['errors'] += errors
+
+    pool = [threading.Thread(target=run, args=(os.getpid() * 100 + i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(stats)
+
+
+def run_profile(profile, args):
+    database = os.path.join(tempfile.mkdtemp(), f'bench-{profile}.db')
+    ctx = multiprocessing.get_context('spawn')
+    setup = ctx.Process(target=seed, args=(database, profile, args.products))
+    setup.start()
+    setup.join()
+
+    results = ctx.Queue()
+    start_at = time.time() + 3.0  # let every process import the app before the clock starts
+    processes = [ctx.Process(target=worker, args=(database, profile, args.threads, args.duration, args.write_ratio,
+                                                  args.products, start_at, results))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    reads = [ms for stats in collected for ms in stats['reads']]
+    writes = [ms for stats in collected for ms in stats['writes']]
+    return {
+        'ops': (len(reads) + len(writes)) / args.duration,
+        'writes': len(writes) / args.duration,
+        'read_p50': percentile(reads, 50), 'read_p99': percentile(reads, 99),
+        'write_p50': percentile(writes, 50), 'write_p99': percentile(writes, 99),
+        'locked': sum(stats['locked'] for stats in collected),
+        'errors': sum(stats['errors'] for stats in collected),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--profile', choices=('both', 'default', 'tuned'), default='both')
+    args = parser.parse_args()
+
+    profiles = ['default', 'tuned'] if args.profile == 'both' else [args.profile]
+    print(f'{args.processes} processes x {args.threads} threads, {args.duration:.0f}s, '
+          f'{args.write_ratio:.0%} writes')
+    print(f'{"profile":<9} {"ops/s":>8} {"writes/s":>9} {"read p50":>9} {"read p99":>9} '
+          f'{"write p50":>10} {"write p99":>10} {"locked":>7} {"errors":>7}')
+    for profile in profiles:
+        r = run_profile(profile, args)
+        print(f'{profile:<9} {r["ops"]:>8.0f} {r["writes"]:>9.0f} {r["read_p50"]:>8.1f}ms {r["read_p99"]:>8.1f}ms '
+              f'{r["write_p50"]:>9.1f}ms {r["write_p99"]:>9.1f}ms {r["locked"]:>7} {r["errors"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+Check the query plans of the hot queries for full table scans.
+
+Usage:
+    python scripts/explain_audit.py [--verbose] [--strict]
+
+Each hot query below is run the way the app runs it (storefront, blog,
+checkout, profile, admin listings, background workers). Every SELECT it emits
+is captured and passed through EXPLAIN on the configured database:
+
+- SQLite: ``EXPLAIN QUERY PLAN``; a ``SCAN <table>`` step that does not use an
+  index is a full scan. ``USE TEMP B-TREE`` (a sort the index cannot provide)
+  is reported as a warning, except on the paginated listings (catalog and
+  admin orders), where it means every page sorts the whole filtered set and
+  fails the audit.
+- PostgreSQL: ``EXPLAIN`` with ``enable_seqscan`` off, so a ``Seq Scan`` in
+  the plan means no index can serve the query, however small the tables are.
+
+Exits with status 1 if any query does a full scan, so it can run in CI or
+before a deploy (after ``flask db upgrade``). With ``--strict`` every warning
+fails the audit. Queries that read whole tables
+on purpose (exports, search index rebuilds, rollup rebuilds) are not listed.
+"""
+import argparse
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+# Make sure project root is on sys.path so 'app' package can be imported when running this script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+from app import create_app, db
+
+
+def hot_queries():
+    """``(label, callable)`` pairs; each callable runs one code path's queries."""
+    from app import catalog, dashboard, sitemap
+    from app.campaigns import campaign_progress
+    from app.models import (BlogComment, BlogLike, BlogPost, BlogVisit, Cart, CartItem, CouponUsage, EmailOutbox,
+                            NewsletterSubscriber, OTPToken, Order, OrderItem, Product, ProductVisit, User)
+    from app.outbox import outbox
+    from app.search import search_engine
+
+    class _Cursor:
+        id = 1
+        created_at = datetime(2024, 1, 1)
+
+    class _Campaign:
+        last_subscriber_id = 100
+
+    # the FTS table is created and filled on first use; do that before any capture
+    search_engine.search('warm up')
+
+    now = datetime.utcnow()
+    return [
+        ('user_loader: user by id', lambda: db.session.get(User, 1)),
+        ('catalog: first page', lambda: catalog.active_products_page()),
+        ('catalog: next page', lambda: catalog.active_products_page(catalog.encode_cursor(_Cursor()))),
+        ('home: newest products', lambda: Product.query.options(joinedload(Product.primary_image))
+            .filter_by(status='active').order_by(Product.created_at.desc()).limit(4).all()),
+        ('product: other products', lambda: Product.query.options(joinedload(Product.primary_image))
+            .filter(Product.id != 1, Product.status == 'active').order_by(Product.created_at.desc()).limit(8).all()),
+        ('blog: popular products', lambda: ProductVisit.query.order_by(ProductVisit.visit_count.desc()).limit(4).all()),
+        ('visits: product counters', lambda: db.session.query(ProductVisit.product_id)
+            .filter(ProductVisit.product_id.in_([1, 2, 3])).all()),
+        ('visits: blog counters', lambda: db.session.query(BlogVisit.post_id).filter(BlogVisit.post_id.in_([1, 2, 3])).all()),
+        ('blog: comments', lambda: BlogComment.query.filter_by(post_id=1).order_by(BlogComment.created_at.asc()).all()),
+        ('blog: comment count', lambda: BlogComment.query.filter_by(post_id=1).count()),
+        ('blog: like count', lambda: BlogLike.query.filter_by(post_id=1).count()),
+        ('blog: liked by user', lambda: BlogLike.query.filter_by(post_id=1, user_id=1).first()),
+        ('blog: visit counter', lambda: BlogVisit.query.filter_by(post_id=1).first()),
+        ('cart: user cart', lambda: Cart.query.filter(Cart.user_id == 1, Cart.expires_at >= now)
+            .order_by(Cart.expires_at.desc()).first()),
+        ('cart: items', lambda: db.session.query(CartItem.item_key, CartItem.quantity).filter(CartItem.cart_id == 'x').all()),
+        ('coupon: uses by user', lambda: CouponUsage.query.filter_by(coupon_id=1, user_id=1).count()),
+        ('otp: verify', lambda: OTPToken.query.filter_by(email='a@example.com', otp_code='123456', used=False)
+            .order_by(OTPToken.created_at.desc()).first()),
+        ('profile: order history', lambda: Order.query.filter_by(user_id=1).order_by(Order.created_at.desc()).all()),
+        ('search: results', lambda: search_engine.search('lamp')),
+        ('search: suggestions', lambda: search_engine.suggest('la')),
+        ('search: product matches', lambda: search_engine.products('lamp')),
+        ('invoice: order items', lambda: OrderItem.query.filter_by(order_id=1).all()),
+        ('admin: recent comments', lambda: BlogComment.query.order_by(BlogComment.created_at.desc()).limit(200).all()),
+        ('admin: users', lambda: User.query.order_by(User.created_at.desc()).all()),
+        ('admin: subscribers', lambda: NewsletterSubscriber.query.order_by(NewsletterSubscriber.created_at.desc()).all()),
+        ('admin: blog posts', lambda: BlogPost.query.order_by(BlogPost.created_at.desc()).all()),
+        ('dashboard: recent orders', lambda: dashboard.recent_orders()),
+        ('dashboard: top products', lambda: dashboard.top_products()),
+        ('dashboard: recent signups', lambda: dashboard.recent_signups()),
+        ('admin orders: all', lambda: dashboard.orders_page()),
+        ('admin orders: by status', lambda: dashboard.orders_page(status='Pending')),
+        ('admin orders: by payment method', lambda: dashboard.orders_page(payment_method='bkash')),
+        ('admin orders: date range', lambda: dashboard.orders_page(date_from=date.today() - timedelta(days=30),
+                                                                   date_to=date.today())),
+        # run on a sitemap cache miss only (after a product or post write, or PAGE_CACHE_TTL)
+        ('sitemap index: product slices', lambda: sitemap.SECTIONS['products'].chunks()),
+        ('sitemap index: post slices', lambda: sitemap.SECTIONS['posts'].chunks()),
+        ('sitemap: products slice', lambda: list(sitemap.SECTIONS['products'].rows(0))),
+        ('sitemap: posts slice', lambda: list(sitemap.SECTIONS['posts'].rows(0))),
+        ('outbox: due messages', lambda: db.session.query(EmailOutbox.id).filter(outbox._due(now))
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(20).all()),
+        ('campaign: next recipients', lambda: db.session.query(NewsletterSubscriber.id, NewsletterSubscriber.email)
+            .filter(NewsletterSubscriber.id > 0).order_by(NewsletterSubscriber.id).limit(500).all()),
+        ('campaign: progress counts', lambda: campaign_progress(_Campaign())),
+    ]
+
+
+# a sort on these runs for every page a visitor or admin steps through
+PAGINATED = ('catalog:', 'admin orders:')
+
+
+class Capture:
+    """Collects the SELECT statements an engine executes while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+
+def sqlite_plan(conn, statement, parameters):
+    """Returns ``(plan lines, full scans, warnings)``."""
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    lines = [row[-1] for row in rows]
+    scans = [line for line in lines if line.startswith('SCAN ')
+             and 'USING INDEX' not in line and 'USING COVERING INDEX' not in line
+             and 'USING INTEGER PRIMARY KEY' not in line and 'USING PRIMARY KEY' not in line
+             and 'VIRTUAL TABLE INDEX' not in line
+             and not line.startswith(('SCAN CONSTANT ROW', 'SCAN (')) and not line.split()[1].startswith('anon_')]
+    warnings = [line for line in lines if line.startswith('USE TEMP B-TREE')]
+    return lines, scans, warnings
+
+
+def postgresql_plan(conn, statement, parameters):
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    lines = [row[0] for row in conn.exec_driver_sql('EXPLAIN ' + statement, parameters).fetchall()]
+    scans = [line.strip() for line in lines if 'Seq Scan on' in line]
+    warnings = [line.strip() for line in lines if line.strip().startswith('-> Sort') or line.strip().startswith('Sort')]
+    return lines, scans, warnings
+
+
+PLANNERS = {'sqlite': sqlite_plan, 'postgresql': postgresql_plan}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verbose', '-v', action='store_true', help='print every plan, not only problems')
+    parser.add_argument('--strict', action='store_true', help='fail on warnings (sorts) as well as full scans')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+        planner = PLANNERS.get(engine.dialect.name)
+        if planner is None:
+            print(f'EXPLAIN audit supports {", ".join(PLANNERS)}, not {engine.dialect.name}.')
+            sys.exit(2)
+
+        failures = 0
+        for label, run in hot_queries():
+            with Capture(engine) as capture:
+                try:
+                    run()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f'ERROR  {label}: {type(e).__name__}: {e}')
+                    failures += 1
+                    continue
+            db.session.rollback()
+            for statement, parameters in capture.statements:
+                with engine.connect() as conn:
+                    lines, scans, warnings = planner(conn, statement, parameters)
+                    conn.rollback()
+                failed = bool(scans) or (bool(warnings) and (args.strict or label.startswith(PAGINATED)))
+                status = 'FAIL ' if failed else ('WARN ' if warnings else 'ok   ')
+                failures += failed
+                print(f'{status}  {label}')
+                if failed or args.verbose:
+                    print('         ' + ' '.join(statement.split()))
+                if scans or warnings or args.verbose:
+                    for line in lines:
+                        print(f'         | {line}')
+
+        if failures:
+            print(f'\n{failures} query plan(s) with a full table scan, a disallowed sort, or an error.')
+            sys.exit(1)
+        print('\nNo full table scans in the hot queries.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Local stand-in for the Brevo transactional email endpoint (POST /v3/smtp/email).
+
+Usage:
+    python scripts/fake_brevo.py [--port 8025] [--latency-ms 80] [--jitter-ms 40]
+                                 [--error-rate 0.01] [--throttle-rate 0.02] [--retry-after 1]
+
+Then run the app with MAIL_PROVIDER=fake-brevo (or BREVO_API_HOST=http://127.0.0.1:8025/v3)
+and emails are accepted here instead of being sent. Nothing is delivered.
+
+- --latency-ms / --jitter-ms: response delay (uniformly latency +/- jitter)
+- --error-rate: fraction of requests answered with 502
+- --throttle-rate: fraction answered with 429 and a Retry-After header
+- requests without an api-key header get 401, like the real API
+
+Batch sends (``messageVersions``, at most 1000 per call) are accepted too.
+GET /stats returns counters as JSON; POST /stats/reset clears them.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeBrevo:
+    """Behaviour and counters shared by all request handler threads."""
+
+    def __init__(self, latency_ms=80.0, jitter_ms=40.0, error_rate=0.0, throttle_rate=0.0, retry_after=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {'requests': 0, 'accepted': 0, 'recipients': 0, 'errors': 0, 'throttled': 0,
+                          'unauthorized': 0, 'connections': 0}
+            self._connections = set()
+            self.delivered = {}
+
+    def record(self, addresses):
+        """Remember how often each batch recipient was sent to (duplicate checks in benchmarks)."""
+        with self._lock:
+            for address in addresses:
+                self.delivered[address] = self.delivered.get(address, 0) + 1
+
+    def count(self, key, amount=1, connection=None):
+        with self._lock:
+            self.stats[key] += amount
+            if connection is not None and connection not in self._connections:
+                self._connections.add(connection)
+                self.stats['connections'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['duplicates'] = sum(n - 1 for n in self.delivered.values() if n > 1)
+            return stats
+
+    def delay(self):
+        spread = random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + spread) / 1000.0
+
+
+def make_handler(fake):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+        def _reply(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                return self._reply(200, fake.snapshot())
+            self._reply(404, {'code': 'not_found', 'message': 'Not found'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            if self.path.rstrip('/') == '/stats/reset':
+                fake.reset()
+                return self._reply(200, {'ok': True})
+            if self.path.rstrip('/') != '/v3/smtp/email':
+                return self._reply(404, {'code': 'not_found', 'message': 'Not found'})
+            fake.count('requests', connection=self.client_address)
+            if not self.headers.get('api-key'):
+                fake.count('unauthorized')
+                return self._reply(401, {'code': 'unauthorized', 'message': 'Key not found'})
+            time.sleep(fake.delay())
+            roll = random.random()
+            if roll < fake.throttle_rate:
+                fake.count('throttled')
+                return self._reply(429, {'code': 'too_many_requests', 'message': 'Rate limit exceeded'},
+                                   {'Retry-After': str(fake.retry_after)})
+            if roll < fake.throttle_rate + fake.error_rate:
+                fake.count('errors')
+                return self._reply(502, {'code': 'bad_gateway', 'message': 'Upstream error'})
+            try:
+                message = json.loads(raw or b'{}')
+            except ValueError:
+                return self._reply(400, {'code': 'invalid_parameter', 'message': 'Invalid JSON'})
+            versions = message.get('messageVersions') or []
+            if not (message.get('to') or versions) or not message.get('sender') or not message.get('subject'):
+                return self._reply(400, {'code': 'missing_parameter', 'message': 'to, sender and subject are required'})
+            if len(versions) > 1000:
+                return self._reply(400, {'code': 'invalid_parameter', 'message': 'at most 1000 messageVersions'})
+            fake.count('accepted')
+            fake.count('recipients', sum(len(v.get('to') or []) for v in versions) if versions else len(message['to']))
+            if versions:
+                fake.record(v['to'][0]['email'] for v in versions if v.get('to'))
+            self._reply(201, {'messageId': f'<{uuid.uuid4().hex}@fake-brevo>'})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(fake, host='127.0.0.1', port=8025):
+    """Start the stand-in in a background thread and return the server (``server.server_port``)."""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-brevo', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency-ms', type=float, default=80.0)
+    parser.add_argument('--jitter-ms', type=float, default=40.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    args = parser.parse_args()
+
+    fake = FakeBrevo(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate, args.retry_after)
+    server = serve(fake, args.host, args.port)
+    print(f'Fake Brevo listening on http://{args.host}:{server.server_port}/v3 (Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(fake.snapshot()))
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Render WebP/JPEG derivatives for product and slider images that do not have them yet.
+
+Usage:
+    python scripts/generate_image_derivatives.py [--all]
+
+New uploads are processed automatically; run this once after deploying the
+image pipeline (or after changing IMAGE_DERIVATIVE_WIDTHS with --all) to cover
+images uploaded earlier. Requires Pillow.
+"""
+import os
+import sys
+
+# Make sure project root is on sys.path so 'app' package can be imported when running this script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.images import image_pipeline
+from app.models import ProductImage, HomeSliderImage
+
+
+def main():
+    redo_all = '--all' in sys.argv[1:]
+    app = create_app()
+    with app.app_context():
+        if not image_pipeline.enabled:
+            print('Pillow is not installed; nothing to do.')
+            return 1
+        total = 0
+        for model in (ProductImage, HomeSliderImage):
+            query = model.query
+            if not redo_all:
+                query = query.filter(model.derivatives.is_(None))
+            rows = query.order_by(model.id).all()
+            image_pipeline.process(rows)
+            total += len(rows)
+        image_pipeline.wait()
+        print(f'Processed {total} image(s).')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
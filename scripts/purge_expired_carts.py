@@ -0,0 +1,27 @@
+"""
+Delete server-side carts whose TTL (CART_TTL_DAYS since the last write) has passed.
+
+Usage:
+    python scripts/purge_expired_carts.py
+
+Safe to run from cron; expired carts already read as empty, this only reclaims the rows.
+"""
+import os
+import sys
+
+# Make sure project root is on sys.path so 'app' package can be imported when running this script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.cart_store import get_store
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        removed = get_store().purge_expired()
+        print(f'Removed {removed} expired cart(s).')
+
+
+if __name__ == '__main__':
+    main()
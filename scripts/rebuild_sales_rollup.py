@@ -0,0 +1,28 @@
+"""
+Rebuild the daily_sales rollup from the order table.
+
+Usage:
+    python scripts/rebuild_sales_rollup.py
+
+The rollup is kept current by checkout and the admin order routes; run this
+after importing or editing orders outside the app, or to check for drift.
+"""
+import os
+import sys
+
+# Make sure project root is on sys.path so 'app' package can be imported when running this script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.sales import rebuild
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        rows = rebuild()
+        print(f'Rebuilt daily sales rollup: {rows} row(s).')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""
+Rebuild the product/blog search index from the database.
+
+Usage:
+    python scripts/rebuild_search_index.py
+
+Run after bulk imports or edits made outside the admin routes. On SQLite this
+refills the FTS5 `search_index` table; with the in-memory backend it bumps the
+search version so every worker reloads its index on the next query.
+"""
+import os
+import sys
+
+# Make sure project root is on sys.path so 'app' package can be imported when running this script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.search import search_engine
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        search_engine.rebuild()
+        print(f'Search index rebuilt using {type(search_engine.backend).__name__}.')
+
+
+if __name__ == '__main__':
+    main()
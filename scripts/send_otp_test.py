@@ -29,7 +29,9 @@ def main():
         from app.email import send_otp
         print(f"Sending OTP {otp} to {recipient} using configured provider...")
         send_otp(recipient, otp, username=username)
-        print("OTP send task queued. Check your inbox and app logs for delivery status.")
+        from app.outbox import outbox
+        outbox.drain()
+        print("OTP processed through the outbox. Check your inbox, app logs and the email_outbox table for delivery status.")
 
 
 if __name__ == '__main__':
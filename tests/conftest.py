@@ -0,0 +1,93 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from flask.testing import FlaskClient
+
+# Make sure project root is on sys.path so 'app' package can be imported when running the tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# config.py reads the environment at import time
+_tmp = tempfile.mkdtemp(prefix='teamsobuy-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp, 'test.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(_tmp, 'uploads')
+os.environ['PAGE_CACHE_DIR'] = os.path.join(_tmp, 'cache')
+os.environ['METRICS_DIR'] = os.path.join(_tmp, 'metrics')
+os.environ['OUTBOX_WORKERS'] = '0'
+os.environ['CAMPAIGN_WORKERS'] = '0'
+os.environ['IMAGE_WORKERS'] = '0'
+
+from app import create_app, db as _db  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+class _Client(FlaskClient):
+    """Runs each request in its own app context.
+
+    A request reuses an app context that is already pushed, and the `db`
+    fixture keeps one pushed, so without this `g` (Flask-Login's current user,
+    the request's cart) would carry over from one request to the next.
+    """
+
+    def open(self, *args, **kwargs):
+        with self.application.app_context():
+            return super().open(*args, **kwargs)
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    app.test_client_class = _Client
+    return app
+
+
+def _reset_caches():
+    # ids restart at 1 in every test's fresh tables, so nothing cached may survive
+    from app.bans import ban_list
+    from app.cache import homepage_cache
+    from app.sitemap import sitemap_cache
+    from app.user_cache import user_cache
+    from app.visits import blog_visits, product_visits
+
+    user_cache.evict(list(user_cache._entries))
+    ban_list.stamp.bump()
+    for cache in (homepage_cache, sitemap_cache):
+        cache.invalidate()
+    for counter in (product_visits, blog_visits):
+        counter._drain()
+        counter._counts.clear()
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        _db.create_all()
+        _reset_caches()
+        yield _db
+        _db.session.remove()
+        _db.drop_all()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(db):
+    def make(username, role='customer', password='secret'):
+        user = User(username=username, email=f'{username}@example.com', role=role)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def login(client):
+    def log_in(username, password='secret'):
+        return client.post('/login', data={'username': username, 'password': password})
+    return log_in
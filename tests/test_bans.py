@@ -0,0 +1,58 @@
+from sqlalchemy import text
+
+from app.bans import ban_list
+
+
+def test_ban_logs_out_an_open_session_on_its_next_request(app, client, db, make_user, login):
+    make_user('admin', role='admin')
+    customer = make_user('buyer')
+    login('buyer')
+    assert client.get('/profile').status_code == 200
+
+    admin = app.test_client()
+    admin.post('/login', data={'username': 'admin', 'password': 'secret'})
+    admin.post(f'/admin/user/{customer.id}/ban')
+
+    response = client.get('/profile')
+    assert response.status_code == 302 and response.location.endswith('/banned')
+    # logged out, not just turned away once
+    assert '/login' in client.get('/profile').location
+
+
+def test_ban_answers_json_requests_with_403(client, db, make_user, login, monkeypatch):
+    customer = make_user('buyer')
+    login('buyer')
+    customer.is_banned = True
+    db.session.commit()
+    monkeypatch.setattr(ban_list, 'refresh_interval', 0)
+
+    response = client.post('/cart/set-delivery', json={'key': 'x'})
+    assert response.status_code == 403
+    assert response.get_json() == {'error': 'Your account has been banned.'}
+
+
+def test_bans_written_outside_the_app_apply_after_the_refresh_interval(client, db, make_user, login,
+                                                                      monkeypatch):
+    make_user('buyer')
+    login('buyer')
+    assert client.get('/profile').status_code == 200
+    db.session.execute(text("UPDATE user SET is_banned = 1 WHERE username = 'buyer'"))
+    db.session.commit()
+
+    monkeypatch.setattr(ban_list, 'refresh_interval', 3600)
+    assert client.get('/profile').status_code == 200
+    monkeypatch.setattr(ban_list, 'refresh_interval', 0)
+    assert client.get('/profile').location.endswith('/banned')
+
+
+def test_unbanned_user_can_log_in_again(app, client, db, make_user, login):
+    make_user('admin', role='admin')
+    customer = make_user('buyer')
+    admin = app.test_client()
+    admin.post('/login', data={'username': 'admin', 'password': 'secret'})
+    admin.post(f'/admin/user/{customer.id}/ban')
+    assert login('buyer').location.endswith('/banned')
+
+    admin.post(f'/admin/user/{customer.id}/unban')
+    login('buyer')
+    assert client.get('/profile').status_code == 200
@@ -0,0 +1,18 @@
+from app.cache import PageCache
+
+
+def test_page_cache_serves_until_invalidated(app):
+    cache = PageCache('test-pages')
+    cache.init_app(app)
+    cache.set('home', '<html>')
+    assert cache.get('home') == '<html>'
+    cache.invalidate()
+    assert cache.get('home') is None
+
+
+def test_page_cache_ttl_zero_disables_it(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PAGE_CACHE_TTL', 0)
+    cache = PageCache('test-pages')
+    cache.init_app(app)
+    cache.set('home', '<html>')
+    assert cache.get('home') is None
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import email
+from app.campaigns import campaign_progress, campaign_runner, pause_campaign, queue_campaign
+from app.models import NewsletterCampaign, NewsletterSubscriber
+
+
+class BrevoError(Exception):
+    status = 503
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    sent = []
+
+    def deliver_batch(app, subject, sender, recipients, text_body, html_body):
+        sent.append(list(recipients))
+
+    monkeypatch.setattr(email, 'deliver_batch', deliver_batch)
+    monkeypatch.setattr(campaign_runner, 'batch_size', 3)
+    monkeypatch.setattr(campaign_runner, 'rate_limit', 0)
+    return sent
+
+
+def _campaign(db, subscribers=7):
+    db.session.add_all(NewsletterSubscriber(email=f's{i}@example.com') for i in range(1, subscribers + 1))
+    campaign = NewsletterCampaign(subject='News', text_body='Hello', status='draft')
+    db.session.add(campaign)
+    queue_campaign(campaign)
+    db.session.commit()
+    return campaign.id
+
+
+def _reload(db, campaign_id):
+    db.session.expire_all()
+    return db.session.get(NewsletterCampaign, campaign_id)
+
+
+def test_campaign_is_sent_in_batches(db, batches):
+    campaign_id = _campaign(db)
+    assert campaign_runner.run_next()
+
+    campaign = _reload(db, campaign_id)
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert (campaign.status, campaign.sent_count, campaign.batch_count) == ('completed', 7, 3)
+    assert campaign.claimed_by is None
+    assert campaign_progress(campaign)['percent'] == 100.0
+    assert not campaign_runner.run_next()
+
+
+def test_resume_skips_the_unconfirmed_batch_of_a_dead_runner(db, batches):
+    campaign_id = _campaign(db)
+    # a runner confirmed ids 1-3, started 4-6 and died
+    campaign = _reload(db, campaign_id)
+    campaign.status, campaign.last_subscriber_id, campaign.inflight_last_id = 'sending', 3, 6
+    campaign.sent_count, campaign.claimed_by = 3, 'dead-runner'
+    campaign.locked_until = datetime.utcnow() + timedelta(minutes=1)
+    db.session.commit()
+    assert not campaign_runner.run_next()  # still leased
+
+    campaign.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert campaign_runner.run_next()
+
+    campaign = _reload(db, campaign_id)
+    assert batches == [['s7@example.com']]
+    assert (campaign.status, campaign.sent_count, campaign.skipped_count) == ('completed', 4, 3)
+    assert campaign.inflight_last_id is None
+
+
+def test_failing_batches_pause_the_campaign_at_the_checkpoint(db, batches, monkeypatch):
+    def deliver_batch(*args):
+        raise BrevoError('unavailable')
+
+    monkeypatch.setattr(email, 'deliver_batch', deliver_batch)
+    monkeypatch.setattr(campaign_runner, 'max_failures', 2)
+    monkeypatch.setattr(campaign_runner, 'backoff_base', 0.001)
+    monkeypatch.setattr(campaign_runner, 'backoff_max', 0.001)
+    campaign_id = _campaign(db)
+    campaign_runner.run_next()
+
+    campaign = _reload(db, campaign_id)
+    assert (campaign.status, campaign.failures, campaign.last_subscriber_id) == ('paused', 2, 0)
+    assert campaign.inflight_last_id is None and 'unavailable' in campaign.last_error
+
+    monkeypatch.setattr(email, 'deliver_batch', lambda app, subject, sender, recipients, *a: batches.append(recipients))
+    queue_campaign(campaign)
+    db.session.commit()
+    campaign_runner.run_next()
+    assert _reload(db, campaign_id).sent_count == 7
+
+
+def test_pausing_stops_after_the_current_batch(db, batches, monkeypatch):
+    campaign_id = _campaign(db)
+
+    def deliver_batch(app, subject, sender, recipients, text_body, html_body):
+        batches.append(recipients)
+        # an admin pauses from another session while the first batch is out
+        with app.app_context():
+            from app import db as other
+            pause_campaign(other.session.get(NewsletterCampaign, campaign_id))
+            other.session.commit()
+
+    monkeypatch.setattr(email, 'deliver_batch', deliver_batch)
+    campaign_runner.run_next()
+    campaign = _reload(db, campaign_id)
+    assert len(batches) == 1
+    assert (campaign.status, campaign.last_subscriber_id, campaign.claimed_by) == ('paused', 3, None)
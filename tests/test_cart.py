@@ -0,0 +1,41 @@
+from sqlalchemy import event
+
+from app.cart import parse_cart_key, price_cart
+from app.models import Product
+
+
+def _products(db, *prices):
+    products = [Product(name=f'P{i}', description='d', price=price, status='active') for i, price in enumerate(prices)]
+    db.session.add_all(products)
+    db.session.commit()
+    return products
+
+
+def test_parse_cart_key():
+    assert parse_cart_key('12:red') == (12, 'red')
+    assert parse_cart_key('12:') == (12, '')
+    assert parse_cart_key('x:red') is None
+    assert parse_cart_key('12') is None
+
+
+def test_price_cart_loads_every_product_in_one_query(db):
+    lamp, desk = _products(db, 10.0, 25.5)
+    cart = {f'{lamp.id}:red': 2, f'{desk.id}:': 1, f'{lamp.id}:blue': 1, '999:red': 4, 'broken': 1}
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    db.session.expire_all()
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        priced = price_cart(cart, delivery={'amount': 60}, coupon={'discount_amount': 5.5})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert len(statements) == 1
+    assert [(line['product_id'], line['color'], line['total']) for line in priced.lines] == [
+        (lamp.id, 'red', 20.0), (desk.id, None, 25.5), (lamp.id, 'blue', 10.0)]
+    assert priced.totals() == {'subtotal': 55.5, 'discount_amount': 5.5, 'delivery_amount': 60.0, 'grand_total': 110.0}
+
+
+def test_empty_cart_runs_no_query(db):
+    priced = price_cart({})
+    assert priced.is_empty and priced.grand_total == 0
@@ -0,0 +1,56 @@
+from app.models import Cart, CartItem, DeliveryFee, Product
+
+
+def _product(db):
+    product = Product(name='Lamp', description='d', price=10.0, status='active')
+    db.session.add(product)
+    db.session.commit()
+    return product
+
+
+def _cart_id(client):
+    with client.session_transaction() as session:
+        return session.get('cart_id')
+
+
+def test_anonymous_cart_follows_the_user_across_logins(app, client, db, make_user, login):
+    make_user('buyer')
+    lamp = _product(db)
+    client.post(f'/add-to-cart/{lamp.id}', data={'quantity': 2})
+    login('buyer')
+    client.get('/logout')
+
+    other = app.test_client()
+    other.post('/login', data={'username': 'buyer', 'password': 'secret'})
+    assert CartItem.query.filter_by(cart_id=_cart_id(other)).one().quantity == 2
+
+
+def test_delivery_chosen_before_any_item_is_saved_for_the_user(app, client, db, make_user, login):
+    user = make_user('buyer')
+    db.session.add(DeliveryFee(key='regular_inside', label='Inside city', amount=60.0))
+    db.session.commit()
+    login('buyer')
+    assert client.post('/cart/set-delivery', json={'key': 'regular_inside'}).get_json()['success']
+
+    cart = Cart.query.one()
+    assert cart.user_id == user.id
+
+    other = app.test_client()
+    other.post('/login', data={'username': 'buyer', 'password': 'secret'})
+    assert _cart_id(other) == cart.id
+
+
+def test_login_merges_the_anonymous_cart_into_the_saved_one(app, client, db, make_user, login):
+    make_user('buyer')
+    lamp = _product(db)
+    login('buyer')
+    client.post(f'/add-to-cart/{lamp.id}', data={'quantity': 1})
+    saved = _cart_id(client)
+
+    anonymous = app.test_client()
+    anonymous.post(f'/add-to-cart/{lamp.id}', data={'quantity': 3})
+    anonymous.post('/login', data={'username': 'buyer', 'password': 'secret'})
+
+    assert _cart_id(anonymous) == saved
+    assert CartItem.query.filter_by(cart_id=saved).one().quantity == 4
+    assert Cart.query.count() == 1
@@ -0,0 +1,13 @@
+from app.email import send_otp
+from app.models import EmailOutbox
+
+
+def test_send_otp_leaves_the_commit_to_the_caller(app, db):
+    with app.test_request_context():
+        send_otp('buyer@example.com', '123456', username='buyer')
+        db.session.rollback()
+        assert EmailOutbox.query.count() == 0
+
+        send_otp('buyer@example.com', '123456', username='buyer')
+        db.session.commit()
+        assert EmailOutbox.query.count() == 1
@@ -0,0 +1,32 @@
+import csv
+import io
+
+from app.exports import EXPORTS
+from app.models import NewsletterSubscriber
+
+
+def _subscribers(db, count):
+    db.session.add_all(NewsletterSubscriber(email=f's{i}@example.com') for i in range(count))
+    db.session.commit()
+
+
+def test_batches_cover_every_row_once(db):
+    _subscribers(db, 7)
+    batches = list(EXPORTS['subscribers'].batches(batch_size=3))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+
+
+def test_connection_is_released_between_batches(db):
+    _subscribers(db, 4)
+    pool = db.engine.pool
+    for _ in EXPORTS['subscribers'].batches(batch_size=2):
+        assert pool.checkedout() == 0
+
+
+def test_csv_download(app, client, db, make_user, login, monkeypatch):
+    monkeypatch.setitem(app.config, 'EXPORT_BATCH_SIZE', 2)
+    _subscribers(db, 5)
+    make_user('admin', role='admin')
+    login('admin')
+    rows = list(csv.reader(io.StringIO(client.get('/admin/export/subscribers?format=csv').get_data(as_text=True))))
+    assert len(rows) == 6
@@ -0,0 +1,47 @@
+import os
+
+from PIL import Image
+
+from app.images import image_pipeline, render_derivatives
+from app.models import Product, ProductImage
+
+
+def _photo(path, orientation=6):
+    # 40x20 pixels, stored sideways: orientation 6 means "rotate 90 degrees clockwise to display"
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    Image.new('RGB', (40, 20), (200, 30, 30)).save(path, format='JPEG', exif=exif)
+
+
+def test_original_is_kept_and_derivatives_are_upright(tmp_path):
+    src = tmp_path / 'photo.jpg'
+    _photo(src)
+    before = src.read_bytes()
+
+    result = render_derivatives(str(src), (10, 640), 80)
+
+    assert src.read_bytes() == before
+    assert (result['width'], result['height']) == (20, 40)
+    with Image.open(tmp_path / result['files']['jpeg']['10']) as small:
+        assert small.size == (10, 20)
+        assert not small.getexif()
+
+
+def test_deleting_a_product_removes_its_derivative_files(app, client, db, make_user, login):
+    folder = app.config['UPLOAD_FOLDER']
+    _photo(os.path.join(folder, 'lamp.jpg'))
+    product = Product(name='Lamp', description='d', price=5.0, status='active')
+    product.images.append(ProductImage(url='/static/uploads/lamp.jpg', position=0))
+    db.session.add(product)
+    db.session.commit()
+    image_pipeline.process(product.images)
+    derivatives = db.session.get(ProductImage, product.images[0].id).derivatives
+    paths = [image_pipeline.upload_path(url) for variants in derivatives.values() for url in variants.values()]
+    assert paths and all(os.path.exists(path) for path in paths)
+
+    make_user('admin', role='admin')
+    login('admin')
+    client.post(f'/admin/delete/{product.id}')
+
+    assert Product.query.count() == 0
+    assert not any(os.path.exists(path) for path in paths)
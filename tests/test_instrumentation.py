@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import text
+
+from app.instrumentation import QueryBudgetExceeded, RequestTiming
+
+
+def test_server_timing_header_is_opt_in(app, client, db, monkeypatch):
+    assert 'Server-Timing' not in client.get('/api/products').headers
+    monkeypatch.setitem(app.config, 'SERVER_TIMING', True)
+    assert 'db;dur=' in client.get('/api/products').headers['Server-Timing']
+
+
+def test_query_budget_raise_fails_chatty_requests(app, client, db, make_user, login, monkeypatch):
+    make_user('admin', role='admin')
+    login('admin')
+    monkeypatch.setitem(app.config, 'SQL_QUERY_BUDGET_RAISE', True)
+    monkeypatch.setitem(app.config, 'SQL_QUERY_BUDGET', 10)
+    assert client.get('/admin/orders').status_code == 200
+
+    # the orders page and the payment methods (the user comes from the user cache)
+    monkeypatch.setitem(app.config, 'SQL_QUERY_BUDGET', 1)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/admin/orders')
+
+
+def test_a_failing_statement_does_not_skew_later_timings(app, db):
+    with app.test_request_context():
+        from flask import g
+        g._request_timing = timing = RequestTiming()
+        with pytest.raises(Exception):
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+        assert timing.queries == 1
+        assert timing.db_ms < 1000
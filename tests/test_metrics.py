@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.metrics import Registry
+
+
+def test_metrics_need_the_token_or_an_admin(app, client, db, make_user, login, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 's3cret')
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200 and 'http_requests_total' in response.get_data(as_text=True)
+
+    make_user('admin', role='admin')
+    login('admin')
+    assert client.get('/metrics').status_code == 200
+
+
+def _worker_file(directory, pid, token, metrics):
+    with open(os.path.join(directory, f'{pid}-{token}.json'), 'w') as fh:
+        json.dump({'pid': pid, 'metrics': metrics}, fh)
+
+
+def test_collect_sums_live_workers_and_folds_exited_ones(tmp_path):
+    registry = Registry()
+    registry.directory = str(tmp_path)
+    requests = registry.counter('requests_total', 'Requests.', ('status',))
+    registry.gauge('pool_connections', 'Connections.')
+    registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+    requests.inc(status='200')
+
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    _worker_file(tmp_path, os.getpid(), 'other', {'requests_total': [[['200'], 2]], 'pool_connections': [[[], 3]],
+                                                  'latency_seconds': [[[], [1, 0, 0, 0.05, 1]]]})
+    _worker_file(tmp_path, exited.pid, 'gone', {'requests_total': [[['200'], 4], [['500'], 1]],
+                                                'pool_connections': [[[], 7]],
+                                                'latency_seconds': [[[], [0, 1, 0, 0.5, 1]]]})
+
+    merged = registry.collect()
+    assert merged['requests_total'] == {('200',): 7, ('500',): 1}
+    assert merged['latency_seconds'] == {(): [1, 1, 0, 0.55, 2]}
+    assert merged['pool_connections'] == {(): 3}  # an exited worker's gauges are dropped
+    assert not (tmp_path / f'{exited.pid}-gone.json').exists()
+    assert registry.collect()['requests_total'] == {('200',): 7, ('500',): 1}
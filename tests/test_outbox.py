@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import email
+from app.models import EmailOutbox
+from app.outbox import outbox, retry_delay
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    calls = []
+
+    def deliver(app, subject, sender, recipients, text_body, html_body):
+        calls.append(subject)
+
+    monkeypatch.setattr(email, 'deliver', deliver)
+    return calls
+
+
+def _queue(db, *subjects):
+    for subject in subjects:
+        outbox.enqueue(subject, ['buyer@example.com'], 'body')
+    db.session.commit()
+
+
+def test_claim_is_exclusive(db):
+    _queue(db, 'a', 'b', 'c')
+    first_token, first = outbox.claim(limit=2)
+    second_token, second = outbox.claim(limit=2)
+    assert [m.subject for m in first] == ['a', 'b']
+    assert [m.subject for m in second] == ['c']
+    assert outbox.claim()[1] == []
+    assert {m.claimed_by for m in first} == {first_token}
+
+
+def test_expired_lease_is_claimed_again_and_the_old_claim_cannot_finish(db):
+    _queue(db, 'a')
+    old_token, (message,) = outbox.claim()
+    EmailOutbox.query.update({'locked_until': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    new_token, (again,) = outbox.claim()
+    assert again.id == message.id and again.attempts == 2
+
+    outbox._finish(message, old_token, status='sent')
+    row = EmailOutbox.query.one()
+    assert row.status == 'sending' and row.claimed_by == new_token
+
+
+def test_process_batch_marks_messages_sent(db, sent):
+    _queue(db, 'a', 'b')
+    assert outbox.drain() == 2
+    assert sent == ['a', 'b']
+    assert {m.status for m in EmailOutbox.query} == {'sent'}
+    assert outbox.drain() == 0
+
+
+def test_failed_send_is_retried_with_backoff_then_given_up(db, monkeypatch):
+    def deliver(*args):
+        raise RuntimeError('brevo down')
+
+    monkeypatch.setattr(email, 'deliver', deliver)
+    monkeypatch.setattr(outbox, 'max_attempts', 2)
+    _queue(db, 'a')
+
+    outbox.process_batch()
+    row = EmailOutbox.query.one()
+    assert row.status == 'pending' and row.attempts == 1
+    assert row.next_attempt_at > datetime.utcnow()
+    assert 'brevo down' in row.last_error
+    assert outbox.claim()[1] == []
+
+    row.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    outbox.process_batch()
+    row = EmailOutbox.query.one()
+    assert row.status == 'failed' and row.attempts == 2
+
+
+def test_retry_after_is_honoured():
+    class TooManyRequests(Exception):
+        status = 429
+        headers = {'Retry-After': '120'}
+
+    assert retry_delay(TooManyRequests(), 1, base=1, cap=10) == 120
+    assert retry_delay(RuntimeError(), 1, base=1, cap=10) <= 1
@@ -0,0 +1,117 @@
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import catalog, dashboard
+from app.dashboard import ORDERS_PAGE_SIZE
+from app.models import Order, Product
+
+
+def _walk(fetch):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = fetch(cursor)
+        seen.extend(rows)
+        if cursor is None:
+            return seen
+
+
+def _add_products(db, count, status='active'):
+    db.session.add_all([Product(name=f'P{i}', description='d', price=10.0, status=status) for i in range(count)])
+    db.session.commit()
+
+
+def test_catalog_pages_rows_sharing_a_timestamp(db):
+    # inserted in one go, so current_timestamp gives most rows the same second
+    _add_products(db, 53)
+    ids = [p.id for p in _walk(lambda cursor: catalog.active_products_page(cursor, 10))]
+    assert len(ids) == len(set(ids)) == 53
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_catalog_pages_newest_first_across_timestamps(db):
+    _add_products(db, 30)
+    _add_products(db, 3, status='draft')
+    base = datetime(2024, 5, 1, 12, 0, 0)
+    for pid in range(1, 34):
+        # the format current_timestamp writes; a few rows share each second
+        stamp = (base + timedelta(seconds=pid // 4)).strftime('%Y-%m-%d %H:%M:%S')
+        db.session.execute(text('UPDATE product SET created_at = :c WHERE id = :id'), {'c': stamp, 'id': pid})
+    db.session.commit()
+    ids = [p.id for p in _walk(lambda cursor: catalog.active_products_page(cursor, 7))]
+    expected = [p.id for p in Product.query.filter_by(status='active').all()]
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(expected)
+    assert ids == sorted(ids, key=lambda pid: (pid // 4, pid), reverse=True)
+
+
+def test_catalog_pages_python_timestamps(db):
+    base = datetime(2024, 5, 1, 12, 0, 0, 250000)
+    db.session.add_all([Product(name=f'P{i}', description='d', price=1.0, status='active',
+                                created_at=base + timedelta(seconds=i // 3)) for i in range(20)])
+    db.session.commit()
+    ids = [p.id for p in _walk(lambda cursor: catalog.active_products_page(cursor, 4))]
+    assert len(ids) == len(set(ids)) == 20
+
+
+def test_catalog_api_follows_next_cursor(client, db):
+    _add_products(db, 12)
+    seen, after = [], None
+    while True:
+        body = client.get('/api/products', query_string={'limit': 5, **({'after': after} if after else {})}).get_json()
+        seen.extend(item['id'] for item in body['products'])
+        after = body.get('next_cursor')
+        if not after:
+            break
+    assert sorted(seen) == list(range(1, 13))
+    assert len(seen) == 12
+
+
+def test_catalog_rejects_bad_cursor(client, db):
+    assert client.get('/api/products?after=not-a-cursor').status_code == 400
+
+
+def _add_orders(db, user, count, status='Pending'):
+    db.session.add_all([Order(user_id=user.id, total_amount=100.0 + i, payment_method='cash', status=status)
+                        for i in range(count)])
+    db.session.commit()
+
+
+def test_orders_pages_rows_sharing_a_timestamp(db, make_user):
+    customer = make_user('customer')
+    _add_orders(db, customer, ORDERS_PAGE_SIZE * 2 + 7)
+    _add_orders(db, customer, 5, status='Shipped')
+
+    ids = [row['id'] for row in _walk(lambda cursor: dashboard.orders_page(cursor=cursor))]
+    assert len(ids) == len(set(ids)) == ORDERS_PAGE_SIZE * 2 + 12
+    assert ids == sorted(ids, reverse=True)
+
+    shipped = [row['id'] for row in _walk(lambda cursor: dashboard.orders_page(status='Shipped', cursor=cursor,
+                                                                                  limit=2))]
+    assert shipped == sorted((o.id for o in Order.query.filter_by(status='Shipped')), reverse=True)
+
+
+def test_admin_orders_older_link_reaches_every_order(client, db, make_user, login):
+    make_user('admin', role='admin')
+    customer = make_user('customer')
+    _add_orders(db, customer, ORDERS_PAGE_SIZE + 3)
+    login('admin')
+
+    seen, url = [], '/admin/orders'
+    for _ in range(5):
+        html = client.get(url).get_data(as_text=True)
+        seen.extend(int(oid) for oid in re.findall(r'<td class="px-4 py-2">#(\d+)</td>', html))
+        older = re.search(r'<a href="([^"]*)" class="text-blue-600">Older &rarr;</a>', html)
+        if older is None:
+            break
+        url = older.group(1).replace('&amp;', '&')
+    else:
+        raise AssertionError('"Older" link never ran out')
+    assert seen == list(range(ORDERS_PAGE_SIZE + 3, 0, -1))
+
+
+def test_cursor_round_trips(db):
+    _add_products(db, 1)
+    product = Product.query.one()
+    assert catalog.decode_cursor(catalog.encode_cursor(product)) == (product.created_at, product.id)
@@ -0,0 +1,91 @@
+from datetime import date, datetime, timedelta
+
+from app import sales
+from app.models import DailySales, Order
+
+
+def _order(db, user, total, payment_method='cash', status='Pending', created_at=None, discount=0.0):
+    order = Order(user_id=user.id, total_amount=total, payment_method=payment_method, status=status,
+                  discount_amount=discount, created_at=created_at or datetime.utcnow())
+    db.session.add(order)
+    db.session.flush()
+    sales.record_order(order)
+    db.session.commit()
+    return order
+
+
+def _rollup(db):
+    return sorted((row.day, row.payment_method, row.status, row.order_count, row.revenue, row.discount)
+                  for row in DailySales.query.filter(DailySales.order_count != 0).all())
+
+
+def test_new_orders_are_counted_per_day_method_and_status(db, make_user):
+    user = make_user('alice')
+    _order(db, user, 100.0)
+    _order(db, user, 50.0, discount=5.0)
+    _order(db, user, 20.0, payment_method='bkash')
+    today = datetime.utcnow().date()
+    assert _rollup(db) == [(today, 'bkash', 'Pending', 1, 20.0, 0.0), (today, 'cash', 'Pending', 2, 150.0, 5.0)]
+    summary = sales.sales_summary()
+    assert summary['total_orders'] == 3
+    assert summary['revenue_total'] == 170.0
+    assert summary['orders_by_status'] == {'Pending': 3}
+
+
+def test_status_change_and_delete_move_the_rollup(db, make_user):
+    user = make_user('alice')
+    kept = _order(db, user, 100.0)
+    gone = _order(db, user, 40.0)
+    kept.status = 'Shipped'
+    sales.record_status_change(kept, 'Pending')
+    sales.record_order_deleted(gone)
+    db.session.delete(gone)
+    db.session.commit()
+    assert sales.sales_summary()['orders_by_status'] == {'Shipped': 1}
+    assert sales.sales_summary()['revenue_total'] == 100.0
+
+
+def test_rebuild_matches_incremental_bookkeeping(db, make_user):
+    user = make_user('alice')
+    old = datetime.utcnow() - timedelta(days=40)
+    _order(db, user, 10.0, created_at=old)
+    _order(db, user, 30.0, status='Completed', discount=2.5)
+    _order(db, user, 15.0, payment_method='bkash')
+    incremental = _rollup(db)
+    DailySales.query.delete()
+    db.session.commit()
+    assert sales.rebuild() == 3
+    assert _rollup(db) == incremental
+    assert sales.sales_summary()['revenue_last_30'] == 45.0
+
+
+def test_series_fills_empty_buckets(db, make_user):
+    user = make_user('alice')
+    day = date(2026, 3, 4)
+    _order(db, user, 10.0, created_at=datetime(2026, 3, 2, 12))
+    _order(db, user, 30.0, created_at=datetime(2026, 3, 4, 9))
+    daily = sales.sales_series(date(2026, 3, 1), day)
+    assert [point['orders'] for point in daily['series']] == [0, 1, 0, 1]
+    assert daily['totals'] == {'orders': 2, 'revenue': 40.0, 'avg_order_value': 20.0, 'discount': 0.0}
+    weekly = sales.sales_series(date(2026, 3, 1), day, bucket='week')
+    assert [(point['start'], point['revenue']) for point in weekly['series']] == [('2026-02-23', 0.0),
+                                                                                   ('2026-03-02', 40.0)]
+
+
+def test_commit_with_rollup_change_empties_the_series_cache(db, make_user):
+    user = make_user('alice')
+    start, end = date.today() - timedelta(days=1), date.today()
+    assert sales.cached_sales_series(start, end)['totals']['orders'] == 0
+    _order(db, user, 25.0)
+    assert sales.cached_sales_series(start, end)['totals']['orders'] == 1
+
+
+def test_admin_status_update_keeps_dashboard_totals(client, db, make_user, login):
+    user = make_user('alice')
+    make_user('admin', role='admin')
+    order = _order(db, user, 60.0)
+    login('admin')
+    client.post(f'/admin/order/{order.id}/update-status', data={'status': 'Cancelled'})
+    assert sales.sales_summary()['orders_by_status'] == {'Cancelled': 1}
+    client.post(f'/admin/order/{order.id}/delete')
+    assert sales.sales_summary()['total_orders'] == 0
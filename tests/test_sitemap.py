@@ -0,0 +1,46 @@
+from sqlalchemy import event
+
+from app.models import Product
+from app.sitemap import sitemap_cache, sitemap_changed
+
+
+def _count_queries(db, fetch):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        body = fetch()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return body, [s for s in statements if 'product' in s or 'blog_post' in s]
+
+
+def test_cached_sitemaps_run_no_queries(client, db):
+    sitemap_cache.invalidate()
+    db.session.add(Product(name='Lamp', description='d', price=5.0, status='active'))
+    db.session.commit()
+
+    first, queries = _count_queries(db, lambda: client.get('/sitemap.xml').get_data(as_text=True))
+    assert 'sitemap-products-0.xml' in first and queries
+    again, queries = _count_queries(db, lambda: client.get('/sitemap.xml').get_data(as_text=True))
+    assert again == first and queries == []
+
+    child, _ = _count_queries(db, lambda: client.get('/sitemap-products-0.xml').get_data(as_text=True))
+    assert '/product/1' in child
+    _, queries = _count_queries(db, lambda: client.get('/sitemap-products-0.xml').get_data(as_text=True))
+    assert queries == []
+
+
+def test_product_writes_rebuild_the_sitemap(client, db):
+    sitemap_cache.invalidate()
+    db.session.add(Product(name='Lamp', description='d', price=5.0, status='active'))
+    db.session.commit()
+    assert '/product/2' not in client.get('/sitemap-products-0.xml').get_data(as_text=True)
+
+    db.session.add(Product(name='Desk', description='d', price=9.0, status='active'))
+    sitemap_changed()
+    db.session.commit()
+    assert '/product/2' in client.get('/sitemap-products-0.xml').get_data(as_text=True)
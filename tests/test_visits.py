@@ -0,0 +1,50 @@
+from app.models import BlogPost, Product, ProductVisit
+from app.visits import VisitCounter
+
+
+def _product(db):
+    product = Product(name='Lamp', description='d', price=5.0, status='active')
+    db.session.add(product)
+    db.session.commit()
+    return product
+
+
+def test_flush_inserts_then_adds_to_counts(app, db):
+    counter = VisitCounter('ProductVisit', 'product_id', app)
+    first, second = _product(db), _product(db)
+
+    counter.increment(first.id, 3)
+    counter.flush()
+    counter.increment(first.id, 2)
+    counter.increment(second.id)
+    counter.flush()
+
+    counts = dict(db.session.query(ProductVisit.product_id, ProductVisit.visit_count))
+    assert counts == {first.id: 5, second.id: 1}
+    assert counter.count(first.id) == 5
+
+
+def test_workers_flushing_a_new_key_both_count(app, db):
+    # two workers' counters, each unaware of the row the other inserts
+    worker_a = VisitCounter('ProductVisit', 'product_id', app)
+    worker_b = VisitCounter('ProductVisit', 'product_id', app)
+    product = _product(db)
+
+    worker_a.increment(product.id, 4)
+    worker_b.increment(product.id, 6)
+    worker_a.flush()
+    worker_b.flush()
+
+    assert ProductVisit.query.filter_by(product_id=product.id).one().visit_count == 10
+    assert not worker_b._pending
+
+
+def test_blog_counter_uses_its_key_column(app, db):
+    counter = VisitCounter('BlogVisit', 'post_id', app)
+    post = BlogPost(title='Hello', slug='hello', body='x', status='published')
+    db.session.add(post)
+    db.session.commit()
+    counter.increment(post.id)
+    counter.increment(post.id)
+    counter.flush()
+    assert counter.count(post.id) == 2